@@ -0,0 +1,253 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+import similarity
+from graph_tester_docx import load_chunks
+
+# Score weights from the bge-m3 paper: dense + sparse + colbert
+WEIGHTS = {"dense": 0.4, "sparse": 0.2, "colbert": 0.4}
+
+
+def encode_documents(model, texts, batch_size=16, max_length=512):
+    """BGEM3FlagModel → dense (n, dim), lexical weights [{token_id: weight}], colbert vectors [(tokens, dim)]."""
+    output = model.encode(texts, batch_size=batch_size, max_length=max_length,
+                          return_dense=True, return_sparse=True, return_colbert_vecs=True)
+    lexical = [{int(token): float(weight) for token, weight in weights.items()}
+               for weights in output["lexical_weights"]]
+    return np.asarray(output["dense_vecs"], dtype=np.float32), lexical, list(output["colbert_vecs"])
+
+
+class SparseIndex:
+    """
+    Inverted index of learned lexical weights, CSR-like: sorted term ids, postings offsets,
+    doc ids and weights of all postings in two flat arrays.
+    """
+
+    def __init__(self, terms, offsets, docs, weights, n_docs):
+        self.terms = terms        # (n_terms,) int64, sorted
+        self.offsets = offsets    # (n_terms + 1,) int64
+        self.docs = docs          # (n_postings,) int32
+        self.weights = weights    # (n_postings,) float32
+        self.n_docs = n_docs
+
+    @classmethod
+    def build(cls, lexical):
+        counts = [len(weights) for weights in lexical]
+        docs = np.repeat(np.arange(len(lexical), dtype=np.int32), counts)
+        terms = np.fromiter((t for weights in lexical for t in weights), dtype=np.int64, count=sum(counts))
+        values = np.fromiter((w for weights in lexical for w in weights.values()), dtype=np.float32, count=sum(counts))
+
+        order = np.argsort(terms, kind="stable")
+        unique_terms, term_counts = np.unique(terms[order], return_counts=True)
+        offsets = np.concatenate([[0], np.cumsum(term_counts)]).astype(np.int64)
+        return cls(unique_terms, offsets, docs[order], values[order], len(lexical))
+
+    def scores(self, query_weights, candidates=None):
+        """Sum over shared terms of query weight * document weight, for all docs (or only candidates)."""
+        if len(self.terms) == 0 or not query_weights:  # e.g. all documents have empty lexical weights
+            scores = np.zeros(self.n_docs, dtype=np.float32)
+            return scores if candidates is None else scores[candidates]
+
+        query_terms = np.fromiter(query_weights, dtype=np.int64)
+        query_values = np.fromiter(query_weights.values(), dtype=np.float32)
+
+        positions = np.searchsorted(self.terms, query_terms)
+        found = (positions < len(self.terms)) & (self.terms[np.minimum(positions, len(self.terms) - 1)] == query_terms)
+        positions, query_values = positions[found], query_values[found]
+
+        starts, ends = self.offsets[positions], self.offsets[positions + 1]
+        lengths = ends - starts
+        rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        scores = np.bincount(self.docs[rows], weights=self.weights[rows] * np.repeat(query_values, lengths),
+                             minlength=self.n_docs).astype(np.float32)
+        return scores if candidates is None else scores[candidates]
+
+
+class ColbertStore:
+    """
+    Per-token ColBERT vectors of all documents in one (total_tokens, dim) matrix, float16 or int8
+    (symmetric, one float32 scale per token), with per-document offsets.
+    """
+
+    def __init__(self, tokens, offsets, scales=None):
+        self.tokens = tokens      # (total_tokens, dim) float16 | int8
+        self.offsets = offsets    # (n_docs + 1,) int64
+        self.scales = scales      # (total_tokens,) float32 for int8, else None
+
+    @classmethod
+    def build(cls, colbert_vecs, dtype="float16"):
+        dim = next((len(v[0]) for v in colbert_vecs if len(v)), 1)
+        # A document without token vectors keeps one zero vector, so that every document owns a row range
+        matrices = [np.asarray(v, dtype=np.float32) if len(v) else np.zeros((1, dim), dtype=np.float32)
+                    for v in colbert_vecs]
+        offsets = np.concatenate([[0], np.cumsum([len(m) for m in matrices])]).astype(np.int64)
+        matrix = np.concatenate(matrices)
+
+        if dtype == "int8":
+            scales = np.clip(np.abs(matrix).max(axis=1), 1e-12, None) / 127
+            tokens = np.round(matrix / scales[:, None]).astype(np.int8)
+            return cls(tokens, offsets, scales.astype(np.float32))
+        return cls(matrix.astype(np.float16), offsets)
+
+    def gather(self, docs):
+        """Token vectors of the given documents (float32, concatenated) + start of every document in them."""
+        starts, ends = self.offsets[docs], self.offsets[np.asarray(docs) + 1]
+        lengths = ends - starts
+        local_starts = np.cumsum(lengths) - lengths
+        rows = np.repeat(starts - local_starts, lengths) + np.arange(lengths.sum())
+
+        vectors = self.tokens[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows, None]
+        return vectors, local_starts
+
+    def maxsim(self, query_vecs, docs):
+        """
+        ColBERT late interaction for each doc: mean over query tokens of the max similarity
+        to any document token. One matmul over all candidate tokens + np.maximum.reduceat per document.
+        """
+        vectors, local_starts = self.gather(docs)
+        sims = np.asarray(query_vecs, dtype=np.float32) @ vectors.T             # (query_tokens, candidate tokens)
+        per_doc = np.maximum.reduceat(sims, local_starts, axis=1)              # (query_tokens, docs)
+        return per_doc.mean(axis=0)
+
+    def nbytes(self):
+        return self.tokens.nbytes + self.offsets.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+
+class MultiVectorIndex:
+    """
+    bge-m3 dense + sparse + ColBERT index. Search: dense top-`shortlist` (similarity.query_topk),
+    then sparse and MaxSim scores only for the shortlist, combined with WEIGHTS.
+    """
+
+    def __init__(self, dense, sparse, colbert, chunks):
+        self.dense = dense
+        self.sparse = sparse
+        self.colbert = colbert
+        self.chunks = chunks
+
+    @classmethod
+    def build(cls, dense, lexical, colbert_vecs, chunks, colbert_dtype="float16"):
+        return cls(similarity.normalize(dense), SparseIndex.build(lexical),
+                   ColbertStore.build(colbert_vecs, colbert_dtype), chunks)
+
+    def search(self, query_dense, query_lexical, query_colbert, k=10, shortlist=100, weights=WEIGHTS):
+        shortlist = min(shortlist, len(self.dense))
+        dense_scores, candidates = similarity.query_topk(similarity.normalize(query_dense)[None], self.dense,
+                                                         shortlist, normalized=True)
+        dense_scores, candidates = dense_scores[0], candidates[0]
+
+        sparse_scores = self.sparse.scores(query_lexical, candidates)
+        colbert_scores = self.colbert.maxsim(query_colbert, candidates)
+
+        scores = (weights["dense"] * dense_scores + weights["sparse"] * sparse_scores
+                  + weights["colbert"] * colbert_scores)
+        best = np.argsort(-scores, kind="stable")[:k]
+        return [
+            {
+                "row": int(candidates[i]),
+                "score": float(scores[i]),
+                "dense": float(dense_scores[i]),
+                "sparse": float(sparse_scores[i]),
+                "colbert": float(colbert_scores[i]),
+            }
+            for i in best
+        ]
+
+    def save(self, index_dir: Path):
+        index_dir.mkdir(parents=True, exist_ok=True)
+        np.save(index_dir / "dense.npy", self.dense)
+        for name in ("terms", "offsets", "docs", "weights"):
+            np.save(index_dir / f"sparse_{name}.npy", getattr(self.sparse, name))
+        np.save(index_dir / "colbert_tokens.npy", self.colbert.tokens)
+        np.save(index_dir / "colbert_offsets.npy", self.colbert.offsets)
+        if self.colbert.scales is not None:
+            np.save(index_dir / "colbert_scales.npy", self.colbert.scales)
+        (index_dir / "chunks.json").write_text(json.dumps(self.chunks, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, index_dir: Path, mmap_mode="r"):
+        def load(name):
+            return np.load(index_dir / f"{name}.npy", mmap_mode=mmap_mode)
+
+        chunks = json.loads((index_dir / "chunks.json").read_text(encoding="utf-8"))
+        sparse = SparseIndex(*(load(f"sparse_{name}") for name in ("terms", "offsets", "docs", "weights")),
+                             n_docs=len(chunks))
+        scales = load("colbert_scales") if (index_dir / "colbert_scales.npy").exists() else None
+        colbert = ColbertStore(load("colbert_tokens"), np.asarray(load("colbert_offsets")), scales)
+        return cls(np.asarray(load("dense")), sparse, colbert, chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bge-m3 dense + sparse + ColBERT index with MaxSim re-ranking")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Encode chunks and save the index")
+    build.add_argument("chunks", help="Path to .chunks.txt file")
+    build.add_argument("index_dir")
+    build.add_argument("--colbert-dtype", choices=["float16", "int8"], default="float16")
+    build.add_argument("--batch-size", type=int, default=16)
+    build.add_argument("--max-length", type=int, default=512)
+
+    search = subparsers.add_parser("search", help="Query the index")
+    search.add_argument("index_dir")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    search.add_argument("--shortlist", type=int, default=100, help="Dense candidates re-ranked with sparse + MaxSim")
+
+    args = parser.parse_args()
+
+    from embedding_tester_bge_m3 import get_model
+
+    if args.command == "build":
+        chunks_path = Path(args.chunks)
+        if not chunks_path.exists():
+            print("[ERROR] File not found")
+            return
+
+        chunks = load_chunks(chunks_path)
+        print(f"[INFO] Encoding {len(chunks)} chunks (dense + sparse + colbert)...")
+        start_time = time.perf_counter()
+        dense, lexical, colbert_vecs = encode_documents(get_model(), [c["text"] for c in chunks],
+                                                        args.batch_size, args.max_length)
+        print(f"[INFO] Encoded in {time.perf_counter() - start_time:.2f} sec.")
+
+        index = MultiVectorIndex.build(dense, lexical, colbert_vecs, chunks, args.colbert_dtype)
+        index.save(Path(args.index_dir))
+
+        raw_mb = sum(np.asarray(v).size for v in colbert_vecs) * 4 / 1024 ** 2
+        print(f"[INFO] ColBERT tokens: {len(index.colbert.tokens)}, {raw_mb:.1f} MB float32 → "
+              f"{index.colbert.nbytes() / 1024 ** 2:.1f} MB {args.colbert_dtype}")
+        print(f"[INFO] Sparse postings: {len(index.sparse.docs)} for {len(index.sparse.terms)} terms")
+        print(f"[OK] Saved to: {args.index_dir}")
+        return
+
+    index = MultiVectorIndex.load(Path(args.index_dir))
+    dense, lexical, colbert_vecs = encode_documents(get_model(), [args.query])
+
+    start_time = time.perf_counter()
+    results = index.search(dense[0], lexical[0], colbert_vecs[0], args.k, args.shortlist)
+    print(f"[INFO] Search: {(time.perf_counter() - start_time) * 1000:.2f} ms\n")
+
+    for result in results:
+        chunk = index.chunks[result["row"]]
+        print(f"{result['score']:.4f} (dense {result['dense']:.4f}, sparse {result['sparse']:.4f}, "
+              f"colbert {result['colbert']:.4f})  [{chunk['section_index']}:{chunk['chunk_id']}] {chunk['section_path']}")
+        print(f"    {chunk['text'][:200]}")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python bge_m3_multivector.py build file.chunks.txt bge_m3_index
+    python bge_m3_multivector.py build file.chunks.txt bge_m3_index --colbert-dtype int8
+    python bge_m3_multivector.py search bge_m3_index "сколько человек можно взять в бизнес-зал" -k 5
+"""
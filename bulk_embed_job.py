@@ -0,0 +1,346 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from graph_tester_docx import load_chunks
+
+SHARD_SIZE = 1024
+STALE_SEC = 600  # a claim whose lock file was not refreshed for this long is considered dead
+EMBED_STEP = 256  # texts per embed() call in run(): the claim is checked between the calls
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Temporary file unique per host/process + fsync + os.replace: readers see the old file or the whole new one."""
+    tmp_path = path.with_name(f"{path.name}.{socket.gethostname()}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_corpus(inputs):
+    """All chunks of the input .chunks.txt files (directories are searched recursively), in a fixed order."""
+    paths = []
+    for item in inputs:
+        item = Path(item)
+        paths.extend(sorted(item.rglob("*.chunks.txt")) if item.is_dir() else [item])
+
+    records = []
+    for path in sorted(set(paths)):
+        for position, chunk in enumerate(load_chunks(path)):
+            records.append({"source": str(path), "position": position, "text": chunk["text"]})
+    return records
+
+
+def shard_fingerprint(texts):
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ShardClaim:
+    """
+    Exclusive claim of one shard on shared storage: a lock file created with O_CREAT | O_EXCL.
+    The owner refreshes its mtime (heartbeat); a lock older than stale_sec belongs to a dead worker
+    and may be taken over. Takeover renames the stale lock first, so only one of several
+    competing workers wins it.
+
+    The lock file carries a random token of its claim: after a takeover the path holds another
+    worker's lock, so a slow old owner neither refreshes nor deletes it (it only marks itself as lost).
+    Inodes are no proof of ownership: a new lock file may get the inode of the unlinked stale one.
+
+    Lock age is measured against the storage's clock (mtime of a freshly touched file next to
+    the locks), so worker clocks do not need to be in sync with each other.
+    """
+
+    def __init__(self, lock_path: Path, stale_sec=STALE_SEC):
+        self.lock_path = lock_path
+        self.stale_sec = stale_sec
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.lost = False
+        self.token = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _create(self):
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps({"owner": self.owner, "token": self.token, "claimed_at": time.time()}))
+        return True
+
+    def _owned(self):
+        """True while the lock file at lock_path is still the one this claim created."""
+        try:
+            return json.loads(self.lock_path.read_text(encoding="utf-8")).get("token") == self.token
+        except (FileNotFoundError, ValueError):
+            return False  # gone, or a new lock being written right now
+
+    def _storage_now(self):
+        """Current time of the storage server: mtime of a file touched right now."""
+        clock_path = self.lock_path.with_name(f".clock.{self.owner.replace(':', '.')}")
+        clock_path.touch()
+        try:
+            return clock_path.stat().st_mtime
+        finally:
+            clock_path.unlink(missing_ok=True)
+
+    def acquire(self):
+        if self._create():
+            self._start_heartbeat()
+            return True
+
+        try:
+            age = self._storage_now() - self.lock_path.stat().st_mtime
+        except FileNotFoundError:
+            age = None  # released meanwhile: the shard is probably finished, let the caller re-check
+        if age is None or age < self.stale_sec:
+            return False
+
+        stale_path = self.lock_path.with_name(f"{self.lock_path.name}.stale.{self.owner.replace(':', '.')}")
+        try:
+            os.rename(self.lock_path, stale_path)
+        except FileNotFoundError:
+            return False  # another worker took it over first
+        os.unlink(stale_path)
+        print(f"[WARNING] Took over stale claim {self.lock_path.name} ({age:.0f} sec. old)")
+        return self.acquire()
+
+    def _start_heartbeat(self):
+        def beat():
+            while not self._stop.wait(self.stale_sec / 4):
+                if not self._owned():
+                    self.lost = True
+                    print(f"[WARNING] Claim {self.lock_path.name} was taken over by another worker")
+                    return
+                os.utime(self.lock_path)
+
+        self._heartbeat = threading.Thread(target=beat, daemon=True)
+        self._heartbeat.start()
+
+    def held(self):
+        """False once the claim was taken over; checks the lock file itself, not only the heartbeat's flag."""
+        if not self.lost and not self._owned():
+            self.lost = True
+        return not self.lost
+
+    def release(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        if self._owned():
+            os.unlink(self.lock_path)
+        else:
+            self.lost = True
+
+
+class BulkEmbedJob:
+    """
+    job_dir/
+        job.json                      model, shard size, fingerprint of every shard
+        shards/shard-000001.npy       float32 vectors of the shard
+        shards/shard-000001.json      manifest entry, written last: the shard is done once it exists
+        locks/shard-000001.lock       claim of a worker currently embedding the shard
+
+    Shards are fixed ranges of the corpus in a deterministic order, so every worker on every
+    machine computes the same shards and only the manifest entries decide what is left.
+    """
+
+    def __init__(self, job_dir: Path, records, model, shard_size=SHARD_SIZE, stale_sec=STALE_SEC):
+        self.job_dir = Path(job_dir)
+        self.records = records
+        self.model = model
+        self.shard_size = shard_size
+        self.stale_sec = stale_sec
+        self.shards = [(start, min(start + shard_size, len(records))) for start in range(0, len(records), shard_size)]
+        self.fingerprints = [shard_fingerprint(r["text"] for r in records[start:end]) for start, end in self.shards]
+
+        (self.job_dir / "shards").mkdir(parents=True, exist_ok=True)
+        (self.job_dir / "locks").mkdir(parents=True, exist_ok=True)
+        self._check_job_file()
+
+    def _check_job_file(self):
+        job_path = self.job_dir / "job.json"
+        job = {"model": self.model, "shard_size": self.shard_size, "rows": len(self.records),
+               "fingerprints": self.fingerprints}
+        if not job_path.exists():
+            _write_atomic(job_path, json.dumps(job).encode("utf-8"))
+            return
+
+        existing = json.loads(job_path.read_text(encoding="utf-8"))
+        if (existing["model"], existing["shard_size"]) != (self.model, self.shard_size):
+            raise ValueError(f"{job_path} was created for model {existing['model']} with shard size "
+                             f"{existing['shard_size']}; use another job directory")
+        if existing["fingerprints"] != self.fingerprints:
+            # The corpus changed: unchanged shards keep their vectors, changed ones are redone (see is_done)
+            print("[WARNING] Corpus changed since the job was created, changed shards will be re-embedded")
+            _write_atomic(job_path, json.dumps(job).encode("utf-8"))
+
+    def _name(self, shard):
+        return f"shard-{shard + 1:06d}"
+
+    def entry(self, shard):
+        path = self.job_dir / "shards" / f"{self._name(shard)}.json"
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+    def is_done(self, shard):
+        entry = self.entry(shard)
+        return entry is not None and entry["fingerprint"] == self.fingerprints[shard] and entry["model"] == self.model
+
+    def pending(self):
+        return [shard for shard in range(len(self.shards)) if not self.is_done(shard)]
+
+    def _write_shard(self, shard, vectors, seconds):
+        name = self._name(shard)
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(vectors, dtype=np.float32))
+        _write_atomic(self.job_dir / "shards" / f"{name}.npy", buffer.getvalue())
+
+        start, end = self.shards[shard]
+        entry = {
+            "shard": shard, "start": start, "end": end, "rows": end - start,
+            "dim": int(vectors.shape[1]), "model": self.model, "fingerprint": self.fingerprints[shard],
+            "seconds": round(seconds, 3), "worker": f"{socket.gethostname()}:{os.getpid()}",
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        _write_atomic(self.job_dir / "shards" / f"{name}.json", json.dumps(entry).encode("utf-8"))
+
+    def run(self, embed, max_shards=None, step=EMBED_STEP):
+        """
+        Claims and embeds pending shards until none is left (or max_shards are done). Returns shards done.
+        A shard whose claim is lost (taken over as stale) is abandoned: only the new owner writes it.
+        """
+        done = 0
+        pending = self.pending()
+        finished = len(self.shards) - len(pending)  # as seen by this worker; others may be finishing shards too
+        for shard in pending:
+            if max_shards is not None and done >= max_shards:
+                break
+
+            claim = ShardClaim(self.job_dir / "locks" / f"{self._name(shard)}.lock", self.stale_sec)
+            if not claim.acquire():
+                continue
+            try:
+                if self.is_done(shard):  # finished by another worker between pending() and the claim
+                    continue
+                start, end = self.shards[shard]
+                start_time = time.perf_counter()
+                parts = []
+                for part_start in range(start, end, step):
+                    if not claim.held():
+                        break
+                    parts.append(embed([r["text"] for r in self.records[part_start:min(part_start + step, end)]]))
+                seconds = time.perf_counter() - start_time
+                if not claim.held():
+                    print(f"[WARNING] {self._name(shard)}: claim lost, leaving the shard to its new owner")
+                    continue
+                self._write_shard(shard, np.concatenate(parts), seconds)
+                done += 1
+                finished += 1
+                print(f"[INFO] {self._name(shard)}: {end - start} texts in {seconds:.2f} sec. "
+                      f"({finished}/{len(self.shards)} done)")
+            finally:
+                claim.release()
+        return done
+
+    def status(self):
+        pending = self.pending()
+        claimed = sorted(p.name for p in (self.job_dir / "locks").glob("*.lock"))
+        return {"shards": len(self.shards), "done": len(self.shards) - len(pending),
+                "pending": len(pending), "claimed": claimed}
+
+    def assemble(self):
+        """All vectors in corpus order (every shard must be done)."""
+        pending = self.pending()
+        if pending:
+            raise RuntimeError(f"{len(pending)} shard(s) not finished yet")
+        return np.concatenate([np.load(self.job_dir / "shards" / f"{self._name(shard)}.npy")
+                               for shard in range(len(self.shards))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable bulk embedding job over sharded chunk files")
+    parser.add_argument("command", choices=["run", "status", "assemble"])
+    parser.add_argument("job_dir", help="Job directory (on shared storage for several machines)")
+    parser.add_argument("inputs", nargs="+", help=".chunks.txt files or directories with them")
+    parser.add_argument("--model", default="intfloat/multilingual-e5-large", help="Backend spec (see embedding_backends.py)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="Texts per shard")
+    parser.add_argument("--stale-sec", type=int, default=STALE_SEC, help="Claims older than this are taken over")
+    parser.add_argument("--workers", type=int, help="Embed with a ShardedEmbeddingExecutor of N processes")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-shards", type=int, help="Stop after N shards (e.g. for a time-limited node)")
+    parser.add_argument("-o", "--output", help="assemble: output .npy file (default: job_dir/vectors.npy)")
+
+    args = parser.parse_args()
+
+    records = read_corpus(args.inputs)
+    if not records:
+        print("[ERROR] No chunks found")
+        return
+
+    job = BulkEmbedJob(Path(args.job_dir), records, args.model, args.shard_size, args.stale_sec)
+
+    if args.command == "status":
+        print(json.dumps(job.status(), indent=2))
+        return
+
+    if args.command == "assemble":
+        output_path = Path(args.output) if args.output else Path(args.job_dir) / "vectors.npy"
+        try:
+            vectors = job.assemble()
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
+            return
+        np.save(output_path, vectors)
+        (output_path.with_suffix(".records.json")).write_text(
+            json.dumps([{k: r[k] for k in ("source", "position")} for r in records], ensure_ascii=False),
+            encoding="utf-8")
+        print(f"[OK] {vectors.shape} saved to: {output_path}")
+        return
+
+    print(f"[INFO] {len(records)} chunks, {len(job.shards)} shards, {len(job.pending())} pending")
+    if args.workers:
+        from sharded_executor import ShardedEmbeddingExecutor
+
+        with ShardedEmbeddingExecutor(args.model, args.workers, batch_size=args.batch_size) as executor:
+            done = job.run(executor.embed, args.max_shards)
+    else:
+        from embedding_backends import load_backend
+
+        backend = load_backend(args.model, batch_size=args.batch_size)
+        done = job.run(backend.embed, args.max_shards)
+
+    status = job.status()
+    print(f"[OK] Embedded {done} shard(s) here; {status['done']}/{status['shards']} done in total")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python bulk_embed_job.py run /mnt/shared/jobs/nightly ingest/ --model intfloat/multilingual-e5-large
+    python bulk_embed_job.py run /mnt/shared/jobs/nightly ingest/ --workers 8 --max-shards 20
+    python bulk_embed_job.py status /mnt/shared/jobs/nightly ingest/
+    python bulk_embed_job.py assemble /mnt/shared/jobs/nightly ingest/ -o nightly.npy
+
+    Start the same "run" command on several machines: each claims free shards; after a crash just start it again.
+"""
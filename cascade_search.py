@@ -0,0 +1,318 @@
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+import similarity
+from graph_tester_docx import load_chunks
+from vector_search import VectorIndex
+
+CONFIDENCES = ("margin", "spread")
+
+
+def confidence(scores, kind="margin"):
+    """
+    Confidence of a ranking from its top scores, (n, k) sorted best first → (n,):
+        margin - top-1 minus top-2
+        spread - top-1 minus the mean of the other top-k scores (how far the winner stands out)
+    """
+    scores = np.atleast_2d(scores)
+    if scores.shape[1] < 2:
+        return np.full(len(scores), np.inf, dtype=np.float32)
+    if kind == "margin":
+        return scores[:, 0] - scores[:, 1]
+    return scores[:, 0] - scores[:, 1:].mean(axis=1)
+
+
+def top_k(query_vectors, index, k):
+    """Top-k rows and scores of many queries at once (blockwise, see similarity.query_topk), best first."""
+    scores, rows = similarity.query_topk(similarity.normalize(query_vectors), index.vectors, k, normalized=True)
+    return rows, scores
+
+
+def calibrate(small_confidence, small_top1, large_top1, target_agreement=0.95, labels=None):
+    """
+    Lowest threshold whose cascade answer (small model when confidence >= threshold, else large)
+    agrees with the large model's top-1 on at least target_agreement of the queries.
+    With labels (relevant rows) the target is top-1 accuracy instead: a query counts as correct when the
+    model that answers it (small or, if escalated, large) ranks the relevant row first.
+    If the target is out of reach, the threshold with the best result (and least escalation) is returned.
+
+    Vectorized over all candidate thresholds: with queries sorted by confidence, a threshold between
+    positions i-1 and i escalates the first i queries.
+    """
+    small_confidence = np.asarray(small_confidence, dtype=np.float64)
+    reference = np.asarray(large_top1 if labels is None else labels)
+    small_correct = np.asarray(small_top1) == reference
+    large_correct = np.asarray(large_top1) == reference
+    n = len(small_correct)
+    if n == 0:
+        raise ValueError("No calibration queries")
+
+    order = np.argsort(small_confidence, kind="stable")
+    sorted_confidence = small_confidence[order]
+    # escalated[i]: large-model hits among the first i (escalated) queries,
+    # kept[i]: small-model hits among the others
+    escalated = np.concatenate([[0], np.cumsum(large_correct[order])])
+    kept = np.concatenate([np.cumsum(small_correct[order][::-1])[::-1], [0]])
+    agreement = (escalated + kept) / n
+
+    # Only cut between distinct confidence values: equal confidences must share one decision
+    cut_ok = np.ones(n + 1, dtype=bool)
+    cut_ok[1:n] = sorted_confidence[1:] > sorted_confidence[:-1]
+    reached = np.flatnonzero(cut_ok & (agreement >= target_agreement))
+    if len(reached):
+        i = int(reached[0])
+    else:
+        i = int(np.argmax(np.where(cut_ok, agreement, -1.0)))
+
+    if i == 0:
+        threshold = -np.inf  # the small model alone is good enough
+    elif i == n:
+        threshold = float(np.nextafter(sorted_confidence[-1], np.inf))  # escalate everything
+    else:
+        threshold = float(sorted_confidence[i - 1] + sorted_confidence[i]) / 2
+    return {
+        "threshold": threshold,
+        "escalation_rate": i / n,
+        "agreement": float(agreement[i]),
+        "target_reached": bool(len(reached)),
+        "small_agreement": float(small_correct.mean()),
+        "large_agreement": float(large_correct.mean()),
+        "queries": n,
+    }
+
+
+class CascadeSearcher:
+    """
+    Small model first, large model only for the hard queries.
+
+    Both indexes are built over the same chunks (row i is the same chunk in both). A query is searched
+    in the small index; when the confidence of its ranking (see confidence()) is below the threshold,
+    it is re-embedded with the large model and answered from the large index.
+
+    Per-query latency is recorded, so stats() reports the escalation rate and the saving against
+    sending every query to the large model (baseline = measured cost of the escalated path).
+    """
+
+    def __init__(self, small_backend, small_index, large_backend, large_index, threshold=0.02,
+                 confidence="margin", confidence_k=5):
+        if small_index.size != large_index.size:
+            raise ValueError(f"Indexes differ in size: {small_index.size} vs {large_index.size}")
+        self.small_backend = small_backend
+        self.small_index = small_index
+        self.large_backend = large_backend
+        self.large_index = large_index
+        self.threshold = threshold
+        self.confidence = confidence
+        self.confidence_k = confidence_k
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.queries = 0
+        self.escalations = 0
+        self.small_sec = 0.0  # small path of all queries
+        self.large_sec = 0.0  # large path of escalated queries
+
+    def search(self, query, k=5, **filters):
+        """Returns (results, escalated): up to k (row, score) pairs, best first."""
+        start_time = time.perf_counter()
+        query_vec = self.small_backend.embed([query])[0]
+        results = self.small_index.search(query_vec, k=max(k, self.confidence_k), **filters)
+        scores = np.array([score for _, score in results[:self.confidence_k]], dtype=np.float32)
+        escalate = len(scores) > 1 and float(confidence(scores, self.confidence)[0]) < self.threshold
+        small_sec = time.perf_counter() - start_time
+
+        large_sec = 0.0
+        if escalate:
+            start_time = time.perf_counter()
+            query_vec = self.large_backend.embed([query])[0]
+            results = self.large_index.search(query_vec, k=k, **filters)
+            large_sec = time.perf_counter() - start_time
+
+        self.queries += 1
+        self.small_sec += small_sec
+        if escalate:
+            self.escalations += 1
+            self.large_sec += large_sec
+        return results[:k], escalate
+
+    def calibrate(self, queries, target_agreement=0.95, labels=None):
+        """Sets the threshold from sample queries (batch-embedded with both models), returns the calibration."""
+        rows, scores = top_k(self.small_backend.embed(queries), self.small_index, self.confidence_k)
+        large_top1 = top_k(self.large_backend.embed(queries), self.large_index, 1)[0][:, 0]
+        result = calibrate(confidence(scores, self.confidence), rows[:, 0], large_top1, target_agreement, labels)
+        self.threshold = result["threshold"]
+        return result
+
+    def stats(self):
+        if not self.queries:
+            return {"queries": 0}
+        large_per_query = self.large_sec / self.escalations if self.escalations else None
+        actual = self.small_sec + self.large_sec
+        stats = {
+            "queries": self.queries,
+            "escalations": self.escalations,
+            "escalation_rate": round(self.escalations / self.queries, 4),
+            "avg_ms": round(actual / self.queries * 1000, 3),
+            "small_avg_ms": round(self.small_sec / self.queries * 1000, 3),
+            "large_avg_ms": round(large_per_query * 1000, 3) if large_per_query else None,
+        }
+        if large_per_query:
+            baseline = large_per_query * self.queries
+            stats["latency_saving"] = round(1 - actual / baseline, 4)
+        return stats
+
+
+def read_queries(path: Path):
+    """One query per line (.txt) or {"query": ..., "row": ...} lines (.jsonl, row = relevant chunk, optional)."""
+    queries, labels = [], []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.suffix.lower() == ".jsonl":
+                item = json.loads(line)
+                queries.append(item["query"])
+                labels.append(item.get("row"))
+            else:
+                queries.append(line)
+                labels.append(None)
+    return queries, (np.array(labels) if all(label is not None for label in labels) else None)
+
+
+def index_cache_path(cache_dir: Path, input_path: Path, spec):
+    """<cache_dir>/<chunks file>.<spec>.index; VectorIndex.save replaces only the final ".index" by .npy/.json,
+    so the model name survives whatever dots it has (or has not)"""
+    return cache_dir / f"{input_path.name}.{spec.replace('/', '_').replace(':', '_')}.index"
+
+
+def chunks_fingerprint(chunks):
+    digest = hashlib.sha1()
+    for chunk in chunks:
+        digest.update(chunk["text"].encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def build_index(backend, chunks, cache_path=None):
+    """Embedded chunks, from the cache if it was built from the same chunks (fingerprint in <cache>.fingerprint)"""
+    fingerprint = chunks_fingerprint(chunks)
+    if cache_path is not None:
+        fingerprint_path = cache_path.with_suffix(".fingerprint")
+        if (cache_path.with_suffix(".npy").exists() and fingerprint_path.exists()
+                and fingerprint_path.read_text(encoding="utf-8").strip() == fingerprint):
+            return VectorIndex.load(cache_path)
+    index = VectorIndex(backend.embed([c["text"] for c in chunks]), chunks)
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        index.save(cache_path)
+        fingerprint_path.write_text(fingerprint, encoding="utf-8")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade retrieval: small model first, large model for hard queries")
+    parser.add_argument("input", help="Path to .chunks.txt file (see graph_tester_docx.py)")
+    parser.add_argument("queries", help="Queries: .txt (one per line) or .jsonl with optional relevant 'row'")
+    parser.add_argument("--small", default="BAAI/bge-small-en-v1.5", help="Backend spec (see embedding_backends.py)")
+    parser.add_argument("--large", default="BAAI/bge-large-en-v1.5", help="Backend spec")
+    parser.add_argument("--confidence", choices=CONFIDENCES, default="margin")
+    parser.add_argument("--threshold", type=float, help="Fixed threshold (default: calibrate)")
+    parser.add_argument("--target", type=float, default=0.95,
+                        help="Calibration: required top-1 agreement with the large model (or accuracy with labels)")
+    parser.add_argument("--calibration-fraction", type=float, default=0.5,
+                        help="Share of the queries used for calibration, the rest is evaluated")
+    parser.add_argument("--index-cache", metavar="DIR", help="Keep the embedded chunks of both models here")
+    parser.add_argument("-k", type=int, default=5)
+
+    args = parser.parse_args()
+
+    input_path, queries_path = Path(args.input), Path(args.queries)
+    for path in (input_path, queries_path):
+        if not path.exists():
+            print(f"[ERROR] File not found: {path}")
+            return
+
+    from embedding_backends import load_backend
+
+    chunks = load_chunks(input_path)
+    queries, labels = read_queries(queries_path)
+    if not chunks or len(queries) < 2:
+        print("[ERROR] Need chunks and at least 2 queries")
+        return
+
+    backends, indexes = {}, {}
+    for role, spec in (("small", args.small), ("large", args.large)):
+        print(f"[INFO] {role}: loading {spec} and embedding {len(chunks)} chunks...")
+        backends[role] = load_backend(spec)
+        cache_path = None
+        if args.index_cache:
+            cache_path = index_cache_path(Path(args.index_cache), input_path, spec)
+        indexes[role] = build_index(backends[role], chunks, cache_path)
+
+    cascade = CascadeSearcher(backends["small"], indexes["small"], backends["large"], indexes["large"],
+                              confidence=args.confidence)
+
+    split = int(len(queries) * args.calibration_fraction) if args.threshold is None else 0
+    if args.threshold is None:
+        result = cascade.calibrate(queries[:split], args.target, None if labels is None else labels[:split])
+        print(f"[INFO] Calibrated on {split} queries: threshold {result['threshold']:.4f}, "
+              f"escalation {result['escalation_rate']:.1%}, agreement {result['agreement']:.1%} "
+              f"(small model alone {result['small_agreement']:.1%}, large {result['large_agreement']:.1%})")
+        if not result["target_reached"]:
+            print(f"[WARNING] Target {args.target:.1%} not reachable, using the best threshold")
+    else:
+        cascade.threshold = args.threshold
+
+    evaluation = queries[split:]
+    for text in evaluation[:2]:  # warm-up of both models
+        cascade.search(text, args.k)
+        backends["large"].embed([text])
+    cascade.reset_stats()
+
+    cascade_top1 = []
+    for text in evaluation:
+        results, _ = cascade.search(text, args.k)
+        cascade_top1.append(results[0][0])
+
+    print("[INFO] Large model only...")
+    large_top1 = []
+    start_time = time.perf_counter()
+    for text in evaluation:
+        large_top1.append(indexes["large"].search(backends["large"].embed([text])[0], k=1)[0][0])
+    large_only_ms = (time.perf_counter() - start_time) / len(evaluation) * 1000
+
+    stats = cascade.stats()
+    agreement = float(np.mean(np.array(cascade_top1) == np.array(large_top1)))
+    print(f"\nQueries: {stats['queries']}, escalated {stats['escalations']} ({stats['escalation_rate']:.1%})")
+    print(f"Cascade:      {stats['avg_ms']:.2f} ms/query (small path {stats['small_avg_ms']:.2f} ms)")
+    print(f"Large only:   {large_only_ms:.2f} ms/query")
+    print(f"Saving:       {1 - stats['avg_ms'] / large_only_ms:.1%}")
+    print(f"Top-1 agreement with the large model: {agreement:.1%}")
+    if labels is not None:
+        expected = labels[split:]
+        print(f"Top-1 accuracy: cascade {np.mean(np.array(cascade_top1) == expected):.1%}, "
+              f"large {np.mean(np.array(large_top1) == expected):.1%}")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python cascade_search.py file.chunks.txt faq_queries.txt
+    python cascade_search.py file.chunks.txt faq_queries.jsonl --large mixedbread-ai/mxbai-embed-large-v1 --target 0.98
+    python cascade_search.py file.chunks.txt faq_queries.txt --threshold 0.03 --confidence spread --index-cache cascade_cache
+
+    from cascade_search import CascadeSearcher
+    cascade = CascadeSearcher(small_backend, small_index, large_backend, large_index)
+    cascade.calibrate(sample_queries, target_agreement=0.95)
+    results, escalated = cascade.search("How to transfer money by phone number?")
+    print(cascade.stats())
+"""
@@ -0,0 +1,156 @@
+import argparse
+import re
+from pathlib import Path
+
+import numpy as np
+
+from graph_tester_docx import load_chunks, save_chunks
+from subword_engine import fnv1a_hashes
+
+NUM_PERM = 128
+BANDS = 32  # 32 bands x 4 rows: pairs with Jaccard ~0.5+ almost always become LSH candidates
+
+_rng = np.random.default_rng(20240531)
+# Multiply-shift hash family: h(x) = (a * x + b) mod 2^64 >> 32, a odd
+_PERM_A = (_rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text, size=3):
+    """Word n-grams of the normalized text (the whole text if it is shorter than one shingle)."""
+    words = re.sub(r"\s+", " ", text.lower()).strip().split(" ")
+    if len(words) <= size:
+        return [" ".join(words)]
+    return list({" ".join(words[i:i + size]) for i in range(len(words) - size + 1)})
+
+
+def minhash_signatures(texts, shingle_size=3, block_shingles=50_000):
+    """
+    MinHash signatures (len(texts), NUM_PERM) for all texts.
+    Shingles of all texts are hashed in one pass, permuted with broadcasting
+    and reduced per text with np.minimum.reduceat.
+    """
+    shingle_lists = [shingles(t, shingle_size) for t in texts]
+    counts = np.array([len(s) for s in shingle_lists], dtype=np.int64)
+    hashes = fnv1a_hashes([s.encode("utf-8") for lst in shingle_lists for s in lst]).astype(np.uint64)
+
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint64)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+
+    # Whole texts per block, so that a reduceat segment never crosses a block boundary
+    first = 0
+    while first < len(texts):
+        last = int(np.searchsorted(ends, starts[first] + block_shingles, side="right"))
+        last = max(last, first + 1)
+        block = hashes[starts[first]:ends[last - 1]]
+        permuted = (block[:, None] * _PERM_A + _PERM_B) >> np.uint64(32)
+        signatures[first:last] = np.minimum.reduceat(permuted, starts[first:last] - starts[first], axis=0)
+        first = last
+
+    return signatures
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def near_duplicate_clusters(signatures, threshold=0.8, bands=BANDS):
+    """
+    LSH banding over MinHash signatures + verification of the estimated Jaccard similarity.
+    Returns an array with the cluster representative (lowest index) of every text.
+    """
+    n = len(signatures)
+    rows = signatures.shape[1] // bands
+    parent = np.arange(n)
+
+    for band in range(bands):
+        band_rows = signatures[:, band * rows:(band + 1) * rows]
+        keys = np.ascontiguousarray(band_rows).view(np.dtype((np.void, band_rows.dtype.itemsize * rows))).ravel()
+        _, groups, group_sizes = np.unique(keys, return_inverse=True, return_counts=True)
+
+        order = np.argsort(groups, kind="stable")
+        bucket_starts = np.cumsum(group_sizes) - group_sizes
+        for bucket in np.flatnonzero(group_sizes > 1):
+            members = order[bucket_starts[bucket]:bucket_starts[bucket] + group_sizes[bucket]]
+            head = members[0]
+            # Verify every candidate against the bucket head in one vectorized comparison
+            similarities = (signatures[members[1:]] == signatures[head]).mean(axis=1)
+            for member in members[1:][similarities >= threshold]:
+                root_a, root_b = _find(parent, head), _find(parent, member)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    return np.array([_find(parent, i) for i in range(n)])
+
+
+def dedup_chunks(chunks, threshold=0.8, shingle_size=3):
+    """
+    Keeps one representative chunk per near-duplicate cluster.
+    Every representative gets an "aliases" list with the provenance of the chunks it replaces.
+    """
+    if not chunks:
+        return []
+
+    signatures = minhash_signatures([c["text"] for c in chunks], shingle_size)
+    representatives = near_duplicate_clusters(signatures, threshold)
+
+    result = {}
+    for i, chunk in enumerate(chunks):
+        rep = int(representatives[i])
+        if rep == i:
+            result[i] = dict(chunk, aliases=list(chunk.get("aliases", [])))
+        else:
+            result[rep]["aliases"].append({
+                "chunk_id": chunk["chunk_id"],
+                "section_index": chunk["section_index"],
+                "section_path": chunk["section_path"],
+            })
+            result[rep]["aliases"].extend(chunk.get("aliases", []))
+
+    return list(result.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate chunk detection (MinHash + LSH)")
+    parser.add_argument("input", help="Path to .chunks.txt file")
+    parser.add_argument("-o", "--output", help="Output .chunks.txt file with representatives only")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum estimated Jaccard similarity")
+    parser.add_argument("--shingle-size", type=int, default=3, help="Words per shingle")
+
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print("[ERROR] File not found")
+        return
+
+    chunks = load_chunks(input_path)
+    unique_chunks = dedup_chunks(chunks, args.threshold, args.shingle_size)
+
+    print(f"[INFO] Chunks: {len(chunks)}, after dedup: {len(unique_chunks)}")
+    for chunk in unique_chunks:
+        if chunk["aliases"]:
+            print(f"[{chunk['section_index']}:{chunk['chunk_id']}] {chunk['section_path']}")
+            for alias in chunk["aliases"]:
+                print(f"    = [{alias['section_index']}:{alias['chunk_id']}] {alias['section_path']}")
+
+    output_path = Path(args.output) if args.output else input_path.with_name(
+        input_path.name.replace(".chunks.txt", ".dedup.chunks.txt")
+    )
+    save_chunks(output_path, unique_chunks)
+    print(f"[OK] Saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python chunk_dedup.py file.chunks.txt
+    python chunk_dedup.py file.chunks.txt --threshold 0.7 -o file.dedup.chunks.txt
+"""
@@ -0,0 +1,140 @@
+import functools
+import os
+
+import numpy as np
+
+FASTEMBED_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fastembed_cache')
+HF_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'huggingface_cache')
+
+
+class FastEmbedBackend:
+    """fastembed TextEmbedding (see embedding_tester.py)"""
+
+    def __init__(self, model_name, threads=None, batch_size=32):
+        os.environ.setdefault("FASTEMBED_CACHE_DIR", FASTEMBED_CACHE_DIR)
+        from fastembed.embedding import TextEmbedding
+
+        self.embedder = TextEmbedding(model_name=model_name, normalize=True,
+                                      cache_dir=os.environ["FASTEMBED_CACHE_DIR"], threads=threads)
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        return np.array(list(self.embedder.embed(texts, batch_size=self.batch_size)), dtype=np.float32)
+
+
+class OllamaBackend:
+    """Local Ollama server (see ollama_tester.py); /api/embed takes a whole batch in one request"""
+
+    def __init__(self, model_name, threads=None, batch_size=32):
+        from ollama_tester import OLLAMA_URL
+
+        self.model_name = model_name
+        self.url = OLLAMA_URL.rsplit("/api/", 1)[0] + "/api/embed"
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        import requests
+
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            response = requests.post(
+                self.url,
+                json={"model": self.model_name, "input": texts[start:start + self.batch_size]},
+                headers={"Content-Type": "application/json"}
+            )
+            response.raise_for_status()
+            batches.append(np.array(response.json()["embeddings"], dtype=np.float32))
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)  # the dimension is unknown without a request
+        return np.concatenate(batches)
+
+
+class HFMeanPoolingBackend:
+    """transformers AutoModel + masked mean pooling on CPU (see embedding_sberbank.py, torch_cpu_inference.py)"""
+
+    def __init__(self, model_name, threads=None, batch_size=32, quantize=False, bf16=False):
+        from torch_cpu_inference import load_torch_runner
+
+        self.runner = load_torch_runner(model_name, threads, quantize=quantize, bf16=bf16)
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        return self.runner.embed(texts, self.batch_size)
+
+
+class SentenceTransformerBackend:
+    """sentence-transformers (see embedding_tester_hface.py)"""
+
+    def __init__(self, model_name, threads=None, batch_size=32):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, cache_folder=HF_CACHE_DIR)
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        return self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True).astype(np.float32)
+
+
+class OnnxBackend:
+    """ONNX Runtime model + Hugging Face tokenizer through OnnxEmbeddingRunner (IO binding, preallocated buffers)"""
+
+    def __init__(self, model_name, threads=None, batch_size=32):
+        from transformers import AutoTokenizer
+        from onnx_runner import OnnxEmbeddingRunner, load_onnx_session
+
+        # 'models/e5-small-v2.onnx@intfloat/e5-small-v2': model path @ tokenizer
+        model_path, _, tokenizer_name = model_name.partition("@")
+        self.runner = OnnxEmbeddingRunner(load_onnx_session(model_path, threads),
+                                          AutoTokenizer.from_pretrained(tokenizer_name or model_path))
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        return self.runner.embed(texts, self.batch_size)
+
+
+class FastTextBackend:
+    """fastText sentence vectors from the mmap'd store of fasttext_store.py; spec 'fasttext:<dim>'"""
+
+    def __init__(self, model_name, threads=None, batch_size=32):
+        from fasttext_store import FastTextStore
+
+        self.store = FastTextStore(dim=int(model_name or 300))
+
+    def embed(self, texts):
+        return np.array([self.store.get_sentence_vector(text) for text in texts], dtype=np.float32)
+
+
+BACKENDS = {
+    "fastembed": FastEmbedBackend,
+    "ollama": OllamaBackend,
+    "hf": HFMeanPoolingBackend,
+    "hf-int8": functools.partial(HFMeanPoolingBackend, quantize=True),
+    "hf-bf16": functools.partial(HFMeanPoolingBackend, bf16=True),
+    "st": SentenceTransformerBackend,
+    "onnx": OnnxBackend,
+    "fasttext": FastTextBackend,
+}
+
+
+def parse_spec(spec):
+    """
+    'kind:model' → (kind, model). Without a known kind prefix the spec is a fastembed model name.
+    Examples: 'BAAI/bge-small-en-v1.5', 'ollama:bge-m3:latest', 'hf:ai-forever/sbert_large_nlu_ru',
+              'hf-int8:ai-forever/sbert_large_nlu_ru' (dynamic INT8 Linear layers),
+              'onnx:models/e5-small-v2.onnx@intfloat/e5-small-v2'
+    """
+    kind, sep, name = spec.partition(":")
+    if sep and kind in BACKENDS:
+        return kind, name
+    return "fastembed", spec
+
+
+def load_backend(spec, threads=None, batch_size=32):
+    """Creates a backend with an embed(texts) -> float32 array (len(texts), dim) method."""
+    kind, name = parse_spec(spec)
+    backend = BACKENDS[kind](name, threads=threads, batch_size=batch_size)
+    backend.spec = spec
+    return backend
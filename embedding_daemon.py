@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+CONNECT_TIMEOUT = 0.2
+REQUEST_TIMEOUT = 300.0
+
+
+def default_socket_path():
+    """Unix socket of the daemon; EMBEDDING_DAEMON_SOCKET="" disables the client (always in-process).
+    None where there are no Unix sockets (Windows)."""
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "getuid"):
+        return None
+    return os.environ.get("EMBEDDING_DAEMON_SOCKET", f"/tmp/embedding_daemon-{os.getuid()}.sock") or None
+
+
+def absolute_spec(spec):
+    """'onnx:<relative model path>@tokenizer' → absolute model path, so that a spec means the same model
+    whatever the working directory of the client or of the daemon is."""
+    if not spec.startswith("onnx:"):
+        return spec
+    model_path, sep, tokenizer = spec[len("onnx:"):].partition("@")
+    return f"onnx:{os.path.abspath(model_path)}{sep}{tokenizer}"
+
+
+def _request(payload, socket_path=None, timeout=REQUEST_TIMEOUT):
+    """One JSON line in, one JSON line out. None if the daemon is not running."""
+    socket_path = default_socket_path() if socket_path is None else socket_path
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(socket_path)
+            sock.settimeout(timeout)
+            sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                response = json.loads(f.readline())
+    except (OSError, ValueError):
+        # stale socket file, no access, a daemon that does not answer or died mid-response: run in-process
+        return None
+
+    if not isinstance(response, dict):
+        return None
+    if "error" in response:
+        raise RuntimeError(f"Embedding daemon: {response['error']}")
+    return response
+
+
+def embed(spec, texts, socket_path=None):
+    """
+    Embeddings of texts from the daemon, float32 (len(texts), dim), or None if the daemon is not running.
+    spec is an embedding_backends spec, e.g. 'hf:ai-forever/sbert_large_nlu_ru'.
+    """
+    response = _request({"model": absolute_spec(spec), "texts": list(texts)}, socket_path)
+    if response is None:
+        return None
+    return np.array(response["embeddings"], dtype=np.float32)
+
+
+def stats(socket_path=None):
+    return _request({"cmd": "stats"}, socket_path, timeout=5.0)
+
+
+class EmbeddingDaemon:
+    """Keeps backends loaded in a ModelZoo and answers line-JSON requests on a Unix socket."""
+
+    def __init__(self, zoo, socket_path=None):
+        self.zoo = zoo
+        self.socket_path = socket_path or default_socket_path()
+        self.started = time.time()
+        self.requests = 0
+        self.texts = 0
+        self._model_locks = {}  # spec -> lock: a backend is not assumed to be thread-safe
+        self._lock = threading.Lock()
+
+    def _model_lock(self, spec):
+        with self._lock:
+            return self._model_locks.setdefault(spec, threading.Lock())
+
+    def handle(self, request):
+        if request.get("cmd") == "stats":
+            return {
+                "uptime_sec": round(time.time() - self.started, 1),
+                "requests": self.requests,
+                "texts": self.texts,
+                "models": self.zoo.report(),
+                "memory": self.zoo.monitor.report() if self.zoo.monitor else None,
+            }
+
+        spec, texts = request.get("model"), request.get("texts")
+        if not spec or not isinstance(texts, list):
+            return {"error": "Expected {\"model\": spec, \"texts\": [...]}"}
+
+        with self._model_lock(spec):
+            model = self.zoo.get(spec)
+            if self.zoo.monitor is not None:
+                with self.zoo.monitor.stage(f"embed {spec}"):
+                    embeddings = model.embed(texts)
+            else:
+                embeddings = model.embed(texts)
+        with self._lock:
+            self.requests += 1
+            self.texts += len(texts)
+        return {"embeddings": np.asarray(embeddings, dtype=np.float32).tolist()}
+
+    def _serve_connection(self, conn):
+        with conn, conn.makefile("rwb") as f:
+            for line in f:
+                try:
+                    response = self.handle(json.loads(line))
+                except Exception as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                f.write(json.dumps(response).encode("utf-8") + b"\n")
+                f.flush()
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            if _request({"cmd": "stats"}, self.socket_path, timeout=1.0) is not None:
+                raise RuntimeError(f"Daemon already running on {self.socket_path}")
+            os.unlink(self.socket_path)  # left over from a killed daemon
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        server.listen(64)
+        try:
+            while True:
+                conn, _ = server.accept()
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            server.close()
+            os.unlink(self.socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident embedding daemon (Unix socket, models stay loaded)")
+    parser.add_argument("--model", action="append", default=[],
+                        help="Backend spec to preload and pin (see embedding_backends.py), can be repeated")
+    parser.add_argument("--socket", default=default_socket_path(), help="Unix socket path")
+    parser.add_argument("--budget-gb", type=float, default=float(os.environ.get("MODEL_ZOO_BUDGET_GB", 8)),
+                        help="RAM budget for loaded models")
+    parser.add_argument("--memory-budget-gb", type=float,
+                        help="Whole-process RSS limit: model loads that would exceed it are refused "
+                             "(default: 90%% of the container/RAM limit)")
+    parser.add_argument("--stats", action="store_true", help="Print stats of the running daemon and exit")
+
+    args = parser.parse_args()
+
+    if not args.socket or not hasattr(socket, "AF_UNIX"):
+        print("[ERROR] Unix sockets are not available on this platform")
+        return
+
+    if args.stats:
+        response = stats(args.socket)
+        if response is None:
+            print(f"[ERROR] Daemon is not running on {args.socket}")
+            return
+        print(json.dumps(response, indent=2, ensure_ascii=False))
+        return
+
+    from memory_monitor import MemoryMonitor
+    from model_zoo import GB, ModelZoo
+
+    monitor = MemoryMonitor(int(args.memory_budget_gb * GB) if args.memory_budget_gb else None)
+    zoo = ModelZoo(int(args.budget_gb * GB), monitor=monitor)
+    for spec in map(absolute_spec, args.model):
+        print(f"[INFO] Loading {spec}...")
+        zoo.pin(spec)
+
+    daemon = EmbeddingDaemon(zoo, args.socket)
+    print(f"[OK] Listening on {args.socket}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopped")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python embedding_daemon.py --model onnx:models/bge-m3/model.onnx@BAAI/bge-m3 --model hf:ai-forever/sbert_large_nlu_ru
+    python embedding_daemon.py --model st:mixedbread-ai/mxbai-embed-large-v1 --budget-gb 4 --memory-budget-gb 6
+    python embedding_daemon.py --stats
+
+    While the daemon runs, embedding_tester_onnx_bge_m3.py, embedding_tester_hface.py and embedding_sberbank.py
+    take embeddings from it (models not preloaded are loaded on the first request); otherwise they run in-process.
+"""
@@ -0,0 +1,278 @@
+import argparse
+import copy
+import queue
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+import similarity
+
+_DONE = object()
+
+
+class PipelineStage:
+    """
+    One stage of a Pipeline: `workers` threads take items from a bounded input queue,
+    call func(item) and pass the result to the next stage (None results are dropped).
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=4):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.input = queue.Queue(maxsize=queue_size)
+        self.next = None
+
+        self.items = 0
+        self.busy_sec = 0.0
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._puts = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        self.input.put(item)
+        depth = self.input.qsize()
+        with self._lock:  # several upstream workers put concurrently
+            self._depth_sum += depth
+            self._puts += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+    def _work(self, errors):
+        while True:
+            item = self.input.get()
+            if item is _DONE:
+                break
+            if errors:
+                continue  # keep draining, so that upstream stages never block on a full queue
+
+            start_time = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                errors.append((self.name, e))
+                continue
+            busy = time.perf_counter() - start_time
+
+            with self._lock:
+                self.items += 1
+                self.busy_sec += busy
+            if result is not None and self.next is not None:
+                self.next.put(result)
+
+        with self._lock:
+            self._active -= 1
+            last = self._active == 0
+        # The last worker to finish shuts the next stage down
+        if last and self.next is not None:
+            for _ in range(self.next.workers):
+                self.next.put(_DONE)
+
+    def start(self, errors):
+        self._active = self.workers
+        threads = [
+            threading.Thread(target=self._work, args=(errors,), name=f"{self.name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+
+class Pipeline:
+    """
+    Chain of PipelineStage's connected by bounded queues; every stage runs concurrently.
+    A slow stage fills its input queue and blocks the producers (backpressure) instead of buffering everything.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next = next_stage
+        self.errors = []
+        self._threads = []
+        self._start_time = None
+        self._wall_sec = None
+
+    def start(self):
+        self._start_time = time.perf_counter()
+        for stage in self.stages:
+            self._threads.extend(stage.start(self.errors))
+        return self
+
+    def put(self, item):
+        self.stages[0].put(item)
+
+    def close(self):
+        """No more input: waits for all stages to finish and re-raises the first stage error."""
+        for _ in range(self.stages[0].workers):
+            self.stages[0].put(_DONE)
+        for thread in self._threads:
+            thread.join()
+        self._wall_sec = time.perf_counter() - self._start_time
+
+        if self.errors:
+            name, error = self.errors[0]
+            raise RuntimeError(f"Pipeline stage '{name}' failed: {error}") from error
+
+    def stats(self):
+        """Per stage: items, throughput, queue depth (current/avg/max), utilization (busy / wall time per worker)."""
+        wall = self._wall_sec if self._wall_sec is not None else time.perf_counter() - self._start_time
+        return [
+            {
+                "stage": stage.name,
+                "workers": stage.workers,
+                "items": stage.items,
+                "queue_depth": stage.input.qsize(),
+                "avg_queue_depth": round(stage._depth_sum / stage._puts, 2) if stage._puts else 0.0,
+                "max_queue_depth": stage.max_depth,
+                "busy_sec": round(stage.busy_sec, 4),
+                "items_per_sec": round(stage.items / wall, 2) if wall > 0 else 0.0,
+                "utilization": round(stage.busy_sec / (wall * stage.workers), 3) if wall > 0 else 0.0,
+            }
+            for stage in self.stages
+        ]
+
+    def print_stats(self):
+        for row in self.stats():
+            print(f"  {row['stage']:<10} workers {row['workers']}, "
+                  f"items {row['items']} ({row['items_per_sec']:.1f}/sec.), "
+                  f"busy {row['busy_sec']:.3f} sec., utilization {row['utilization']:.0%}, queue avg {row['avg_queue_depth']:.1f} / max {row['max_queue_depth']}")
+
+
+class EmbeddingPipeline:
+    """
+    tokenize → infer → post, running concurrently:
+
+    - tokenize: fast (Rust) tokenizer batch encoding, releases the GIL, can use several workers;
+    - infer: runner.run_encoded(), one worker (the runner owns the ONNX Runtime buffers and
+      ORT itself uses all intra-op threads); pooling is fused here because it reads the
+      bound output buffer in place, before the next batch overwrites it;
+    - post: L2 normalization and writing the batch into its rows of the result matrix.
+
+    The runner is anything with tokenize(texts) and run_encoded(encoded), e.g. OnnxEmbeddingRunner.
+    Every tokenize worker uses its own copy of runner.tokenizer: a HF fast tokenizer switches its
+    padding/truncation state on each call and fails with "Already borrowed" when shared by threads.
+    The copies are kept between embed() calls (pipeline threads are not), so each is made only once.
+    """
+
+    def __init__(self, runner, batch_size=32, queue_size=4, tokenizer_workers=2, normalize=True):
+        self.runner = runner
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.tokenizer_workers = tokenizer_workers
+        self.normalize = normalize
+        self.pipeline = None
+        self._copies = []  # free runner copies with their own tokenizer
+        self._copies_lock = threading.Lock()
+
+    def _take_copy(self):
+        with self._copies_lock:
+            if self._copies:
+                return self._copies.pop()
+        runner = copy.copy(self.runner)
+        runner.tokenizer = copy.deepcopy(self.runner.tokenizer)
+        return runner
+
+    def embed(self, texts):
+        """Embeddings of texts (in input order), float32 (len(texts), hidden_size)."""
+        result = {}
+        local = threading.local()
+        taken = []
+
+        def tokenize(batch):
+            start, batch_texts = batch
+            if not hasattr(local, "runner"):
+                local.runner = self._take_copy()
+                taken.append(local.runner)
+            return start, local.runner.tokenize(batch_texts)
+
+        def infer(batch):
+            start, encoded = batch
+            return start, self.runner.run_encoded(encoded)
+
+        def post(batch):
+            start, pooled = batch
+            if self.normalize:
+                pooled = similarity.normalize(pooled)
+            if "matrix" not in result:
+                result["matrix"] = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            result["matrix"][start:start + len(pooled)] = pooled
+
+        pipeline = Pipeline([
+            PipelineStage("tokenize", tokenize, workers=self.tokenizer_workers, queue_size=self.queue_size),
+            PipelineStage("infer", infer, workers=1, queue_size=self.queue_size),
+            PipelineStage("post", post, workers=1, queue_size=self.queue_size),
+        ]).start()
+
+        try:
+            for start in range(0, len(texts), self.batch_size):
+                pipeline.put((start, texts[start:start + self.batch_size]))
+        finally:
+            pipeline.close()
+            self.pipeline = pipeline
+            with self._copies_lock:
+                self._copies.extend(taken)
+
+        return result.get("matrix", np.empty((0, 0), dtype=np.float32))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs pipelined (tokenize | infer | post) ONNX embedding")
+    parser.add_argument("model", help="Path to .onnx model")
+    parser.add_argument("--tokenizer", required=True, help="Hugging Face tokenizer, e.g. intfloat/e5-small-v2")
+    parser.add_argument("--chunks", default="file.chunks.txt", help="Chunks file with texts to embed")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--tokenizer-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat the chunk list N times")
+
+    args = parser.parse_args()
+
+    if not Path(args.model).exists():
+        print(f"[ERROR] File not found: {args.model}")
+        return
+
+    from transformers import AutoTokenizer
+    from graph_tester_docx import load_chunks
+    from onnx_runner import OnnxEmbeddingRunner, load_onnx_session
+
+    texts = [c["text"] for c in load_chunks(Path(args.chunks))] * args.repeat
+    if not texts:
+        print("[ERROR] No texts to embed")
+        return
+
+    runner = OnnxEmbeddingRunner(load_onnx_session(args.model), AutoTokenizer.from_pretrained(args.tokenizer))
+    runner.embed(texts[:args.batch_size], args.batch_size)  # warm-up
+
+    print(f"[INFO] Sequential: {len(texts)} texts...")
+    start_time = time.perf_counter()
+    sequential = similarity.normalize(runner.embed(texts, args.batch_size))
+    sequential_time = time.perf_counter() - start_time
+
+    print("[INFO] Pipelined...")
+    pipeline = EmbeddingPipeline(runner, args.batch_size, args.queue_size, args.tokenizer_workers)
+    start_time = time.perf_counter()
+    pipelined = pipeline.embed(texts)
+    pipelined_time = time.perf_counter() - start_time
+
+    print(f"\nSequential: {len(texts) / sequential_time:.1f} texts/sec ({sequential_time:.3f} sec.)")
+    print(f"Pipelined:  {len(texts) / pipelined_time:.1f} texts/sec ({pipelined_time:.3f} sec.)")
+    print(f"Max abs difference: {float(np.abs(sequential - pipelined).max()):.2e}")
+    print("Stages:")
+    pipeline.pipeline.print_stats()
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python embedding_pipeline.py models/e5-small-v2.onnx --tokenizer intfloat/e5-small-v2
+    python embedding_pipeline.py models/e5-small-v2.onnx --tokenizer intfloat/e5-small-v2 --repeat 20 --tokenizer-workers 4
+"""
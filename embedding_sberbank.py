@@ -1,33 +1,65 @@
 import time
-import torch
-from transformers import AutoTokenizer, AutoModel
-from sklearn.metrics.pairwise import cosine_similarity
+
+import numpy as np
+
+import embedding_daemon
+import similarity
 
 # Указываем модель для тестирования
 MODEL_NAME = "ai-forever/sbert_large_nlu_ru"
 
 
-def get_embedding(model, tokenizer, text):
-    """Получение эмбеддинга для текста"""
-    encoded_input = tokenizer(text, padding=True, truncation=True, return_tensors='pt')
+def get_runner(model, tokenizer):
+    """
+    TorchEmbeddingRunner для модели, создаётся один раз на модель. Хранится в самой модели
+    (model._embedding_runner): ссылка runner → model — цикл внутри модели, и она собирается GC вместе с ним
+    """
+    cached = getattr(model, "_embedding_runner", None)
+    if cached is None or cached[0] is not tokenizer:
+        from torch_cpu_inference import TorchEmbeddingRunner
+        cached = (tokenizer, TorchEmbeddingRunner(model, tokenizer))
+        model._embedding_runner = cached
+    return cached[1]
+
+
+def get_embeddings(model, tokenizer, texts, batch_size=32, optimized=True):
+    """
+    Получение эмбеддингов для списка текстов (батчами).
+    optimized: inference_mode, сортировка по длине и усреднение через bmm без расширенной маски
+    (см. torch_cpu_inference.py); False — исходная реализация, для сравнения
+    """
+    if optimized:
+        return get_runner(model, tokenizer).embed(texts, batch_size)
+
+    import torch
+
+    batches = []
+    for start in range(0, len(texts), batch_size):
+        encoded_input = tokenizer(texts[start:start + batch_size], padding=True, truncation=True, return_tensors='pt')
 
-    with torch.no_grad():
-        model_output = model(**encoded_input)
+        with torch.no_grad():
+            model_output = model(**encoded_input)
 
-    token_embeddings = model_output.last_hidden_state
-    attention_mask = encoded_input['attention_mask']
+        token_embeddings = model_output.last_hidden_state
+        attention_mask = encoded_input['attention_mask']
 
-    # Усреднение эмбеддингов с учетом маски внимания
-    input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-    mean_embedding = torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1),
-                                                                                        min=1e-9)
+        # Усреднение эмбеддингов с учетом маски внимания
+        input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
+        mean_embedding = torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1),
+                                                                                            min=1e-9)
+        batches.append(mean_embedding.cpu().numpy())
 
-    return mean_embedding.squeeze(0).cpu().numpy()
+    return np.concatenate(batches)
+
+
+def get_embedding(model, tokenizer, text):
+    """Получение эмбеддинга для текста"""
+    return get_embeddings(model, tokenizer, [text])[0]
 
 
 def cosine_similarity_score(vec1, vec2):
     """Вычисление косинусного сходства"""
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 
 def main():
@@ -39,14 +71,23 @@ def main():
     print(f"\nUsing model: {MODEL_NAME}\n")
 
     try:
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-        model = AutoModel.from_pretrained(MODEL_NAME)
-        print("Model loaded successfully.")
-
+        # Резидентный демон (embedding_daemon.py) держит модель загруженной: ни torch, ни модель не грузим
         start_time = time.perf_counter()
+        vectors = embedding_daemon.embed(f"hf:{MODEL_NAME}", [text1, text2])
+
+        if vectors is not None:
+            print("Using embedding daemon.")
+        else:
+            from transformers import AutoTokenizer, AutoModel
+
+            tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+            model = AutoModel.from_pretrained(MODEL_NAME)
+            print("Model loaded successfully.")
+
+            start_time = time.perf_counter()
+            vectors = get_embeddings(model, tokenizer, [text1, text2])  # оба текста одним батчем
 
-        vec1 = get_embedding(model, tokenizer, text1)
-        vec2 = get_embedding(model, tokenizer, text2)
+        vec1, vec2 = vectors[0], vectors[1]
         similarity = cosine_similarity_score(vec1, vec2)
 
         execution_time = time.perf_counter() - start_time
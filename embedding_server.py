@@ -0,0 +1,285 @@
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from embedding_backends import load_backend
+
+
+class QueueFull(Exception):
+    """The batcher queue is full: the client should retry later."""
+
+
+class RequestTooLarge(ValueError):
+    """One request has more texts than the whole queue holds: retrying never helps."""
+
+
+class _Request:
+    def __init__(self, texts):
+        self.texts = texts
+        self.created = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent embed requests into one backend call.
+
+    A batch is closed when it reaches max_batch texts or when the oldest request has waited
+    max_wait_ms. At most max_queue texts may wait; beyond that submit() raises QueueFull
+    (backpressure) instead of letting latency grow without bound.
+    """
+
+    def __init__(self, backend, max_batch=64, max_wait_ms=5.0, max_queue=2048):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+
+        self._queue = deque()
+        self._queued_texts = 0
+        self._cond = threading.Condition()
+
+        self.metrics = {
+            "requests": 0, "texts": 0, "batches": 0, "rejected": 0, "errors": 0,
+            "max_batch_texts": 0, "queue_wait_sec": 0.0, "inference_sec": 0.0,
+        }
+        self._worker = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts, timeout=60.0):
+        """Embeddings of texts, float32 (len(texts), dim); blocks until the batch containing them is done."""
+        if len(texts) > self.max_queue:
+            raise RequestTooLarge(f"{len(texts)} texts in one request, at most {self.max_queue} allowed; "
+                                  f"split the input into smaller requests")
+        request = _Request(texts)
+        with self._cond:
+            if self._queued_texts + len(texts) > self.max_queue:
+                self.metrics["rejected"] += 1
+                raise QueueFull(f"{self._queued_texts} texts already queued")
+            self._queue.append(request)
+            self._queued_texts += len(texts)
+            self.metrics["requests"] += 1
+            self._cond.notify()
+
+        if not request.done.wait(timeout):
+            raise TimeoutError(f"No result in {timeout} sec.")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            # Wait for more requests until the batch is full or the oldest request is too old
+            deadline = self._queue[0].created + self.max_wait
+            while self._queued_texts < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size = [], 0
+            # A request is never split; one request larger than max_batch forms its own batch
+            while self._queue and (not batch or size + len(self._queue[0].texts) <= self.max_batch):
+                request = self._queue.popleft()
+                batch.append(request)
+                size += len(request.texts)
+            self._queued_texts -= size
+            return batch, size
+
+    def _loop(self):
+        while True:
+            batch, size = self._next_batch()
+            start_time = time.perf_counter()
+            texts = [text for request in batch for text in request.texts]
+
+            try:
+                embeddings = self.backend.embed(texts)
+            except Exception as e:
+                with self._cond:
+                    self.metrics["errors"] += 1
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+
+            inference_time = time.perf_counter() - start_time
+            offset = 0
+            for request in batch:
+                request.result = embeddings[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+                request.done.set()
+
+            with self._cond:
+                self.metrics["batches"] += 1
+                self.metrics["texts"] += size
+                self.metrics["max_batch_texts"] = max(self.metrics["max_batch_texts"], size)
+                self.metrics["queue_wait_sec"] += sum(start_time - request.created for request in batch)
+                self.metrics["inference_sec"] += inference_time
+
+    def stats(self):
+        with self._cond:
+            metrics = dict(self.metrics)
+            metrics["queued_requests"] = len(self._queue)
+            metrics["queued_texts"] = self._queued_texts
+        batches = max(metrics["batches"], 1)
+        metrics["avg_batch_texts"] = round(metrics["texts"] / batches, 2)
+        metrics["avg_queue_wait_ms"] = round(metrics["queue_wait_sec"] / max(metrics["requests"], 1) * 1000, 3)
+        metrics["avg_inference_ms"] = round(metrics["inference_sec"] / batches * 1000, 3)
+        return metrics
+
+
+class EmbeddingHandler(BaseHTTPRequestHandler):
+    """
+    POST /v1/embeddings   OpenAI:  {"model", "input": str | [str]} → {"data": [{"embedding", "index"}], ...}
+    POST /api/embed       Ollama:  {"model", "input": str | [str]} → {"embeddings": [[...]]}
+    POST /api/embeddings  Ollama (legacy, as used by ollama_tester.py): {"model", "prompt"} → {"embedding": [...]}
+    GET  /metrics, /health
+    """
+
+    server_version = "EmbeddingServer/1.0"
+    batchers = {}        # model spec -> MicroBatcher
+    default_model = None
+    request_timeout = 60.0
+
+    def log_message(self, format, *args):
+        pass  # one line per request is too noisy under load; see /metrics
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=None):
+        self._send_json(status, {"error": {"message": message}}, headers)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(200, {model: batcher.stats() for model, batcher in self.batchers.items()})
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok", "models": list(self.batchers)})
+        else:
+            self._error(404, f"Unknown path: {self.path}")
+
+    def do_POST(self):
+        if self.path not in ("/v1/embeddings", "/api/embed", "/api/embeddings"):
+            self._error(404, f"Unknown path: {self.path}")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError) as e:
+            self._error(400, f"Invalid JSON: {e}")
+            return
+        if not isinstance(payload, dict):
+            self._error(400, "Expected a JSON object")
+            return
+
+        model = payload.get("model") or self.default_model
+        batcher = self.batchers.get(model)
+        if batcher is None:
+            self._error(404, f"Model not loaded: {model}")
+            return
+
+        texts = payload.get("prompt") if self.path == "/api/embeddings" else payload.get("input")
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts or not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            self._error(400, "Expected a non-empty string or list of strings")
+            return
+
+        try:
+            embeddings = batcher.submit(texts, self.request_timeout)
+        except RequestTooLarge as e:
+            self._error(413, str(e))
+            return
+        except QueueFull as e:
+            self._error(503, f"Server busy: {e}", {"Retry-After": "1"})
+            return
+        except TimeoutError as e:
+            self._error(504, str(e))
+            return
+        except Exception as e:
+            self._error(500, f"Embedding failed: {e}")
+            return
+
+        vectors = np.asarray(embeddings, dtype=np.float32).tolist()
+        if self.path == "/v1/embeddings":
+            self._send_json(200, {
+                "object": "list",
+                "model": model,
+                "data": [{"object": "embedding", "index": i, "embedding": v} for i, v in enumerate(vectors)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+        elif self.path == "/api/embed":
+            self._send_json(200, {"model": model, "embeddings": vectors})
+        else:
+            self._send_json(200, {"embedding": vectors[0]})
+
+
+class EmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # listen backlog; the default 5 resets bursts of concurrent clients
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local embedding server with dynamic micro-batching")
+    parser.add_argument("--model", action="append", required=True,
+                        help="Backend spec (see embedding_backends.py), can be repeated; the first one is the default")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=64, help="Max texts per backend call")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Max time to wait for a fuller batch")
+    parser.add_argument("--max-queue", type=int, default=2048, help="Max queued texts per model before 503")
+    parser.add_argument("--threads", type=int, help="Inference threads per backend")
+
+    args = parser.parse_args()
+
+    batchers = {}
+    for spec in args.model:
+        print(f"[INFO] Loading {spec}...")
+        backend = load_backend(spec, threads=args.threads, batch_size=args.max_batch)
+        batchers[spec] = MicroBatcher(backend, args.max_batch, args.max_wait_ms, args.max_queue)
+
+    EmbeddingHandler.batchers = batchers
+    EmbeddingHandler.default_model = args.model[0]
+
+    server = EmbeddingServer((args.host, args.port), EmbeddingHandler)
+    print(f"[OK] Serving {', '.join(batchers)} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python embedding_server.py --model BAAI/bge-small-en-v1.5
+    python embedding_server.py --model onnx:models/e5-small-v2.onnx@intfloat/e5-small-v2 --model st:all-MiniLM-L6-v2 --port 8080
+    python embedding_server.py --model BAAI/bge-small-en-v1.5 --max-batch 128 --max-wait-ms 10
+
+    curl -s localhost:8000/v1/embeddings -d '{"input": ["автомобиль", "машина"]}'
+    curl -s localhost:8000/api/embed -d '{"model": "BAAI/bge-small-en-v1.5", "input": "машина"}'
+    curl -s localhost:8000/metrics
+"""
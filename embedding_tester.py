@@ -4,8 +4,12 @@ os.environ["FASTEMBED_CACHE_DIR"] = os.path.join(os.path.dirname(os.path.abspath
 
 import time
 import numpy as np
-from fastembed.embedding import TextEmbedding
-from sklearn.metrics.pairwise import cosine_similarity
+
+import similarity
+from model_zoo import ModelZoo, GB
+
+# RAM budget for resident models (models are evicted in LRU order when a new one does not fit)
+MODEL_ZOO_BUDGET_GB = float(os.environ.get("MODEL_ZOO_BUDGET_GB", 4))
 
 # Available models for testing (the most promising ones have been added)
 # https://qdrant.github.io/fastembed/examples/Supported_Models/
@@ -25,7 +29,7 @@ def get_embedding(embedder, text):
 
 
 def cosine_similarity_score(vec1, vec2):
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 
 def main():
@@ -47,11 +51,13 @@ def main():
 
     print("\nTesting models...\n")
 
+    zoo = ModelZoo(int(MODEL_ZOO_BUDGET_GB * GB))
+
     for model_name in MODELS:
         print(f"Using model: {model_name}")
 
         try:
-            embedder = TextEmbedding(model_name=model_name, normalize=True, cache_dir=os.environ["FASTEMBED_CACHE_DIR"])
+            embedder = zoo.get(model_name).embedder
             print(f"Model cache path: {embedder.cache_dir}")
 
             start_time = time.perf_counter()
@@ -69,6 +75,8 @@ def main():
         except Exception as e:
             print(f"  Error: {e}\n")
 
+    zoo.print_report()
+
 
 if __name__ == "__main__":
     main()
@@ -1,17 +1,47 @@
 import time
+from functools import lru_cache
+
 import numpy as np
-from FlagEmbedding import BGEM3FlagModel
-from sklearn.metrics.pairwise import cosine_similarity
+
+import similarity
 
 # Указываем модель для тестирования
 MODEL_NAME = "BAAI/bge-m3"
 
+
+@lru_cache(maxsize=None)
+def get_model():
+    """Модель загружается один раз, при первом обращении (FlagEmbedding тянет за собой torch)"""
+    from FlagEmbedding import BGEM3FlagModel
+    return BGEM3FlagModel(MODEL_NAME, use_fp16=True)
+
 def get_embedding(model, text):
     embeddings = model.encode([text], batch_size=1, max_length=8192)['dense_vecs']
     return np.array(embeddings[0])
 
+def get_long_embedding(model, text, pooling="mean", window=512, overlap=64):
+    """
+    Эмбеддинг длинного текста без encode(max_length=8192): перекрывающиеся окна по window токенов
+    (стоимость растет линейно с длиной, а не квадратично), объединенные pooling'ом
+    ("mean", "weighted", "max"; "multi" — вектор на каждое окно). См. long_document.py
+    """
+    from long_document import LongDocumentEmbedder, flag_window_encoder
+
+    embedder = LongDocumentEmbedder(flag_window_encoder(model, window), model.tokenizer, window, overlap)
+    return embedder.embed([text], pooling)[0]
+
+def get_multi_embedding(model, text):
+    """
+    Все три представления bge-m3: dense-вектор, sparse-веса токенов {token_id: weight}
+    и ColBERT-векторы токенов (tokens, 1024). Хранение и поиск — см. bge_m3_multivector.py
+    """
+    from bge_m3_multivector import encode_documents
+
+    dense, lexical, colbert_vecs = encode_documents(model, [text], batch_size=1, max_length=8192)
+    return dense[0], lexical[0], colbert_vecs[0]
+
 def cosine_similarity_score(vec1, vec2):
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 def main():
     prefix = ''  # можно задать "query: " или "document: "
@@ -28,7 +58,7 @@ def main():
     print(f"\nUsing model: {MODEL_NAME}\n")
 
     try:
-        model = BGEM3FlagModel(MODEL_NAME, use_fp16=True)
+        model = get_model()
         print("Model loaded successfully.")
 
         start_time = time.perf_counter()
@@ -43,6 +73,14 @@ def main():
         print(f"  Cosine similarity: {similarity:.4f}")
         print(f"  Calculation time: {execution_time:.6f} sec.\n")
 
+        # Sparse (лексическое совпадение) и ColBERT (MaxSim по токенам) оценки той же пары
+        from bge_m3_multivector import ColbertStore, SparseIndex
+
+        _, lexical1, colbert1 = get_multi_embedding(model, text1)
+        _, lexical2, colbert2 = get_multi_embedding(model, text2)
+        print(f"  Sparse score: {SparseIndex.build([lexical2]).scores(lexical1)[0]:.4f}")
+        print(f"  ColBERT score: {ColbertStore.build([colbert2]).maxsim(colbert1, [0])[0]:.4f}\n")
+
     except Exception as e:
         print(f"  Error: {e}\n")
 
@@ -1,9 +1,9 @@
 import os
 import time
 import numpy as np
-import fasttext
-import fasttext.util
-from sklearn.metrics.pairwise import cosine_similarity
+
+from fasttext_store import FastTextStore, STORE_DIR, build_store
+import similarity
 
 # Доступные размеры моделей FastText
 MODEL_SIZES = [50, 100, 200, 300]  # Размерности векторов FastText
@@ -13,11 +13,19 @@ FASTTEXT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'f
 os.makedirs(FASTTEXT_CACHE_DIR, exist_ok=True)
 
 
-def load_fasttext_model(dim):
-    """Загружает модель FastText с указанной размерностью."""
+def prepare_store():
+    """Один раз скачивает cc.en.300.bin и строит матрицы всех размерностей (см. fasttext_store.py)."""
+    if os.path.exists(os.path.join(STORE_DIR, "meta.json")):
+        return
+    import fasttext.util
+
     fasttext.util.download_model('en', if_exists='ignore')  # Загружаем модель, если её нет
-    fasttext.util.reduce_model(fasttext.load_model(f"cc.en.300.bin"), dim)
-    return fasttext.load_model(f"cc.en.{dim}.bin")
+    build_store("cc.en.300.bin", STORE_DIR, MODEL_SIZES)
+
+
+def load_fasttext_model(dim):
+    """Загружает модель FastText с указанной размерностью (mmap, без чтения всей модели)."""
+    return FastTextStore(STORE_DIR, dim)
 
 
 def get_embedding(model, text):
@@ -27,7 +35,7 @@ def get_embedding(model, text):
 
 def cosine_similarity_score(vec1, vec2):
     """Вычисляет косинусное сходство между двумя векторами."""
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 
 def main():
@@ -37,6 +45,8 @@ def main():
     print(f"Phrase #1: {text1}")
     print(f"Phrase #2: {text2}\n")
 
+    prepare_store()
+
     print("Testing FastText models with different dimensions...\n")
 
     for dim in MODEL_SIZES:
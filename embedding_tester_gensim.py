@@ -1,8 +1,9 @@
 import os
 import time
 import numpy as np
-from gensim.models.fasttext import load_facebook_vectors
-from sklearn.metrics.pairwise import cosine_similarity
+
+from subword_engine import GensimSubwordVectors
+import similarity
 
 # Доступные размеры моделей FastText (должны быть заранее сохранены!)
 MODEL_SIZES = [50]   # [50, 100, 200, 300]
@@ -14,20 +15,27 @@ os.makedirs(FASTTEXT_CACHE_DIR, exist_ok=True)
 
 def load_fasttext_model(dim):
     """Загружает модель FastText с указанной размерностью."""
+    from gensim.models.fasttext import load_facebook_vectors
+
     path = os.path.join(FASTTEXT_CACHE_DIR, f"cc.en.{dim}.bin")
     if not os.path.exists(path):
         raise FileNotFoundError(f"Модель {path} отсутствует! Сначала уменьшите и сохраните её.")
-    return load_facebook_vectors(path)
+    return GensimSubwordVectors(load_facebook_vectors(path))
+
+
+def get_embeddings(model, texts):
+    """Эмбеддинги для списка текстов (n-граммы OOV хэшируются пачкой и кэшируются)."""
+    return model.word_vectors(texts)
 
 
 def get_embedding(model, text):
-    """Получает эмбеддинг для заданного текста."""
-    return np.array(model[text])
+    """Получает эмбеддинг для заданного текста (то же, что model[text] в gensim)."""
+    return get_embeddings(model, [text])[0]
 
 
 def cosine_similarity_score(vec1, vec2):
     """Вычисляет косинусное сходство между двумя векторами."""
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 
 def main():
@@ -45,8 +53,7 @@ def main():
         try:
             model = load_fasttext_model(dim)
             start_time = time.perf_counter()
-            vec1 = get_embedding(model, text1)
-            vec2 = get_embedding(model, text2)
+            vec1, vec2 = get_embeddings(model, [text1, text2])
             similarity = cosine_similarity_score(vec1, vec2)
             execution_time = time.perf_counter() - start_time
 
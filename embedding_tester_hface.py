@@ -1,21 +1,29 @@
 import os
 import time
+from functools import lru_cache
 # import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.preprocessing import normalize
-from sklearn.metrics.pairwise import cosine_similarity
+
+import embedding_daemon
+import similarity
 
 # Installing the Hugging Face cache folder
 CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'huggingface_cache')
 os.environ["HF_HOME"] = CACHE_DIR
 
-# Loading the model
 model_name = "mixedbread-ai/mxbai-embed-large-v1"
-model = SentenceTransformer(model_name, cache_folder=CACHE_DIR)
+
+@lru_cache(maxsize=None)
+def get_model():
+    # Loading the model (torch + sentence-transformers only when the daemon is not running)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, cache_folder=CACHE_DIR)
 
 def get_embedding(text, dim=1024, normalize_vectors=True):
-    # Getting Text Embedding
-    embedding = model.encode([text], convert_to_numpy=True)[0]
+    # Getting Text Embedding: from the resident daemon (embedding_daemon.py) if it is running
+    embeddings = embedding_daemon.embed(f"st:{model_name}", [text])
+    if embeddings is None:
+        embeddings = get_model().encode([text], convert_to_numpy=True)
+    embedding = embeddings[0]
 
     # If you need to reduce the dimensionality, we average
     if dim < embedding.shape[0]:
@@ -23,13 +31,13 @@ def get_embedding(text, dim=1024, normalize_vectors=True):
 
     # Normalization
     if normalize_vectors:
-        embedding = normalize([embedding])[0]
+        embedding = similarity.normalize(embedding)
 
     return embedding
 
 def cosine_similarity_score(vec1, vec2):
     # Calculates cosine similarity between vectors
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 def main():
     text1 = "Good day! Tell me how many people can I take with me to the Minsk1 airport business lounge with my card?"
@@ -1,47 +1,59 @@
-import onnxruntime as ort
-import numpy as np
 import time
-from transformers import AutoTokenizer
+from functools import lru_cache
+from pathlib import Path
+
+import embedding_daemon
+import similarity
 
 # Пути к файлам модели
 MODEL_PATH = "models/bge-m3/model.onnx"
 TOKENIZER_PATH = "BAAI/bge-m3"  # Hugging Face репозиторий
 
-# Загрузка ONNX модели
-ort_session = ort.InferenceSession(MODEL_PATH, providers=["CPUExecutionProvider"])
+# Та же модель в резидентном демоне (embedding_daemon.py), если он запущен.
+# Абсолютный путь: демон разрешает относительные пути от своего рабочего каталога
+DAEMON_SPEC = f"onnx:{(Path(__file__).resolve().parent / MODEL_PATH)}@{TOKENIZER_PATH}"
+
 
-# Загрузка токенизатора
-tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_PATH)
+@lru_cache(maxsize=None)
+def get_runner():
+    """ONNX-сессия и токенизатор загружаются только при первом эмбеддинге без демона"""
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+    from onnx_runner import OnnxEmbeddingRunner
 
-def encode_text(text, max_length=512):
-    """Токенизация текста и создание входных данных для модели"""
-    tokens = tokenizer(text, padding="max_length", truncation=True, max_length=max_length, return_tensors="np")
+    # Загрузка ONNX модели
+    ort_session = ort.InferenceSession(MODEL_PATH, providers=["CPUExecutionProvider"])
 
-    input_ids = tokens["input_ids"].astype(np.int64)
-    attention_mask = tokens["attention_mask"].astype(np.int64)
+    # Загрузка токенизатора
+    tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_PATH)
 
-    return input_ids, attention_mask
+    # Токенизация в преаллоцированные буферы, только нужный выход модели (IO binding)
+    return OnnxEmbeddingRunner(ort_session, tokenizer, max_length=512)
 
 
 def get_embedding(text):
     """Получение усреднённого эмбеддинга для текста"""
-    input_ids, attention_mask = encode_text(text)
+    embeddings = embedding_daemon.embed(DAEMON_SPEC, [text])
+    if embeddings is not None:
+        return embeddings[0]
 
-    # Запуск ONNX модели
-    outputs = ort_session.run(None, {"input_ids": input_ids, "attention_mask": attention_mask})
+    # Усредняем эмбеддинги токенов (1, N, 1024) с учетом маски внимания прямо в выходном буфере:
+    # паддинг до 512 токенов больше не нужен и не попадает в среднее
+    return get_runner().embed([text])[0]  # (1024,)
 
-    # Первый выход модели — это эмбеддинги (1, 512, 1024)
-    embedding = outputs[0]
 
-    # Усредняем эмбеддинги по токенам и убираем лишнюю размерность (1, 1024)
-    mean_embedding = embedding.mean(axis=1).squeeze(0)
+def get_long_embedding(text, pooling="mean", window=512, overlap=64):
+    """Эмбеддинг длинного текста: окна по 512 токенов с перекрытием вместо обрезки (см. long_document.py)"""
+    from long_document import LongDocumentEmbedder, runner_window_encoder
 
-    return mean_embedding
+    runner = get_runner()
+    embedder = LongDocumentEmbedder(runner_window_encoder(runner), runner.tokenizer, window, overlap)
+    return embedder.embed([text], pooling)[0]
 
 
 def cosine_similarity(vec1, vec2):
     """Вычисление косинусного сходства"""
-    return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 
 if __name__ == "__main__":
@@ -60,6 +72,6 @@ if __name__ == "__main__":
     print(f"Эмбеддинг 2: {emb2[:5]}...")
 
     # Косинусное сходство
-    similarity = cosine_similarity(emb1, emb2)
-    print(f"Косинусное сходство: {similarity:.4f}")
+    score = cosine_similarity(emb1, emb2)
+    print(f"Косинусное сходство: {score:.4f}")
     print(f"  ⚡ Время расчета: {execution_time:.6f} сек.\n")
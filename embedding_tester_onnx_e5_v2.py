@@ -1,7 +1,7 @@
 import time
-import numpy as np
-import onnxruntime as ort
-from transformers import AutoTokenizer
+from functools import lru_cache
+
+import similarity
 
 # Пути к ONNX-моделям
 # e5-small-v2.onnx                       FP32 - more precisely
@@ -10,41 +10,39 @@ ONNX_MODELS = {
     "e5-small-v2": "models/e5-small-v2_opt2_QInt8.onnx",  # Укажи правильный путь
 }
 
-# Загружаем токенизатор
-tokenizer = AutoTokenizer.from_pretrained("intfloat/e5-small-v2")
+TOKENIZER_NAME = "intfloat/e5-small-v2"
 
 
-def get_embedding_onnx(onnx_session, text):
-    """Получение эмбеддинга через ONNX-модель (e5-small-v2)"""
-    # Добавляем "query: " перед текстом, как рекомендует автор модели
-    formatted_text = f"{text}"
-    tokens = tokenizer(formatted_text, return_tensors="np", padding=True, truncation=True)
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    """Загружаем токенизатор (при первом обращении, а не при импорте модуля)"""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(TOKENIZER_NAME)
 
-    input_feed = {
-        "input_ids": tokens["input_ids"].astype(np.int64),
-        "attention_mask": tokens["attention_mask"].astype(np.int64)
-    }
 
-    # 🔥 [ИСПРАВЛЕНО]: Не передаем `token_type_ids`, если его нет
-    if "token_type_ids" in tokens:
-        input_feed["token_type_ids"] = tokens["token_type_ids"].astype(np.int64)
+@lru_cache(maxsize=None)
+def get_runner(model_name):
+    """ONNX-сессия модели + буферы для инференса, создаются один раз на модель"""
+    import onnxruntime as ort
+    from onnx_runner import OnnxEmbeddingRunner
 
-    # Запуск ONNX-модели
-    outputs = onnx_session.run(None, input_feed)
+    onnx_session = ort.InferenceSession(ONNX_MODELS[model_name], providers=["CPUExecutionProvider"])
+    return OnnxEmbeddingRunner(onnx_session, get_tokenizer())
 
-    # 🔍 Отладка: смотрим размерности
-    print(f"🔎 Model outputs: {[o.shape for o in outputs]}")
 
-    embeddings = outputs[0]  # Это (1, N, 256), где N — число токенов
-    embeddings = embeddings[0]  # Убираем размерность батча (N, 256)
+def get_embedding_onnx(runner, text):
+    """Получение эмбеддинга через ONNX-модель (e5-small-v2)"""
+    # Добавляем "query: " перед текстом, как рекомендует автор модели
+    formatted_text = f"{text}"
 
-    # Усредняем по токенам
-    return embeddings.mean(axis=0)  # Теперь всегда (256,)
+    # Токенизация, запуск ONNX-модели (только нужный выход, через IO binding)
+    # и усреднение по токенам с учетом маски внимания
+    return runner.embed([formatted_text])[0]  # Всегда (hidden_size,)
 
 
 def cosine_similarity_score(vec1, vec2):
     """Расчет косинусного сходства"""
-    return float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 
 def test_model(model_name):
@@ -52,11 +50,11 @@ def test_model(model_name):
     print(f"🔹 Тест модели: {model_name} [ONNX]")
 
     try:
-        onnx_session = ort.InferenceSession(ONNX_MODELS[model_name], providers=["CPUExecutionProvider"])
+        runner = get_runner(model_name)
         start_time = time.perf_counter()
 
-        vec1 = get_embedding_onnx(onnx_session, TEXT1)
-        vec2 = get_embedding_onnx(onnx_session, TEXT2)
+        vec1 = get_embedding_onnx(runner, TEXT1)
+        vec2 = get_embedding_onnx(runner, TEXT2)
 
         similarity = cosine_similarity_score(vec1, vec2)
         execution_time = time.perf_counter() - start_time
@@ -1,8 +1,8 @@
 import os
 import time
-import numpy as np
-import onnxruntime as ort
-from transformers import AutoTokenizer
+from functools import lru_cache
+
+import similarity
 
 # Пути к ONNX-моделям
 # wget https://huggingface.co/Xenova/all-MiniLM-L6-v2-onnx/resolve/main/model.onnx -O all-MiniLM-L6-v2.onnx
@@ -12,38 +12,36 @@ ONNX_MODELS = {
     "all-MiniLM-L6-v2": "models/all-MiniLM-L6-v2_quantized.onnx",
 }
 
-# Загружаем токенизатор
-tokenizer = AutoTokenizer.from_pretrained("nixiesearch/all-MiniLM-L6-v2-onnx")
-
+TOKENIZER_NAME = "nixiesearch/all-MiniLM-L6-v2-onnx"
 
-def get_embedding_onnx(onnx_session, text):
-    """Получение эмбеддинга через ONNX-модель"""
-    tokens = tokenizer(text, return_tensors="np", padding=True, truncation=True)
 
-    input_feed = {
-        "input_ids": tokens["input_ids"].astype(np.int64),
-        "attention_mask": tokens["attention_mask"].astype(np.int64)
-    }
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    """Загружаем токенизатор (при первом обращении, а не при импорте модуля)"""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(TOKENIZER_NAME)
 
-    if "token_type_ids" in tokens:
-        input_feed["token_type_ids"] = tokens["token_type_ids"].astype(np.int64)
 
-    # Запуск ONNX-модели
-    outputs = onnx_session.run(None, input_feed)
+@lru_cache(maxsize=None)
+def get_runner(model_name):
+    """ONNX-сессия модели + буферы для инференса, создаются один раз на модель"""
+    import onnxruntime as ort
+    from onnx_runner import OnnxEmbeddingRunner
 
-    # 🔍 Отладка: смотрим размерности
-    print(f"🔎 Model outputs: {[o.shape for o in outputs]}")
+    onnx_session = ort.InferenceSession(ONNX_MODELS[model_name], providers=["CPUExecutionProvider"])
+    return OnnxEmbeddingRunner(onnx_session, get_tokenizer())
 
-    embeddings = outputs[0]  # Это (1, N, 384), где N — число токенов
-    embeddings = embeddings[0]  # Убираем размерность батча (N, 384)
 
-    # Усредняем по токенам
-    return embeddings.mean(axis=0)  # Теперь всегда (384,)
+def get_embedding_onnx(runner, text):
+    """Получение эмбеддинга через ONNX-модель"""
+    # Токенизация, запуск ONNX-модели (только нужный выход, через IO binding)
+    # и усреднение по токенам с учетом маски внимания
+    return runner.embed([text])[0]  # Всегда (384,)
 
 
 def cosine_similarity_score(vec1, vec2):
     """Расчет косинусного сходства"""
-    return float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 
 def test_model(model_name):
@@ -51,11 +49,11 @@ def test_model(model_name):
     print(f"🔹 Тест модели: {model_name} [ONNX]")
 
     try:
-        onnx_session = ort.InferenceSession(ONNX_MODELS[model_name], providers=["CPUExecutionProvider"])
+        runner = get_runner(model_name)
         start_time = time.perf_counter()
 
-        vec1 = get_embedding_onnx(onnx_session, TEXT1)
-        vec2 = get_embedding_onnx(onnx_session, TEXT2)
+        vec1 = get_embedding_onnx(runner, TEXT1)
+        vec2 = get_embedding_onnx(runner, TEXT2)
 
         similarity = cosine_similarity_score(vec1, vec2)
         execution_time = time.perf_counter() - start_time
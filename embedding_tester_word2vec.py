@@ -1,8 +1,9 @@
 import os
 import time
 import numpy as np
-from gensim.models import KeyedVectors
-from sklearn.metrics.pairwise import cosine_similarity
+
+from word_vectors import WordVectors
+import similarity
 
 # Папка для кэша моделей Word2Vec
 WORD2VEC_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "word2vec_cache")
@@ -23,25 +24,29 @@ def download_word2vec_model():
 
 
 def load_word2vec_model():
-    """Загружает предобученную модель Word2Vec"""
+    """Загружает предобученную модель Word2Vec (матрица векторов через mmap, общая для всех процессов)"""
     print("Loading Word2Vec model...")
-    return KeyedVectors.load(MODEL_PATH)
+    return WordVectors(MODEL_PATH, mmap="r")
+
+
+def get_embeddings(model, texts):
+    """Эмбеддинги для списка фраз за один проход + число слов вне словаря для каждой фразы"""
+    return model.embed_phrases(texts)
 
 
 def get_embedding(model, text):
     """Извлекает эмбеддинг из модели (усредняет слова, если их несколько)"""
-    words = text.split()
-    vectors = [model[word] for word in words if word in model]
+    embeddings, oov_counts = get_embeddings(model, [text])
 
-    if not vectors:
+    if oov_counts[0] == len(model.tokenize(text)):
         raise ValueError(f"⚠️ No words from '{text}' found in the model!")
 
-    return np.mean(vectors, axis=0)  # Усредняем векторы слов
+    return embeddings[0]  # Усреднённый вектор слов
 
 
 def cosine_similarity_score(vec1, vec2):
     """Вычисляет косинусное сходство"""
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 
 def main():
@@ -56,11 +61,13 @@ def main():
         model = load_word2vec_model()
 
         start_time = time.perf_counter()
-        vec1 = get_embedding(model, text1)
-        vec2 = get_embedding(model, text2)
+        (vec1, vec2), oov_counts = get_embeddings(model, [text1, text2])
+        if (oov_counts == [len(text1.split()), len(text2.split())]).any():
+            raise ValueError("⚠️ No words from one of the phrases found in the model!")
         similarity = cosine_similarity_score(vec1, vec2)
         execution_time = time.perf_counter() - start_time
 
+        print(f"  OOV words: {oov_counts.tolist()}")
         print(f"  Cosine similarity: {similarity:.4f}")
         print(f"  Calculation time: {execution_time:.6f} sec.\n")
 
@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from subword_engine import SubwordEngine
+
+# Папка для кэша моделей FastText
+FASTTEXT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fasttext_cache")
+
+# Папка с уменьшенными матрицами (все размерности из одного прохода PCA)
+STORE_DIR = os.path.join(FASTTEXT_CACHE_DIR, "store")
+
+MODEL_SIZES = [50, 100, 200, 300]
+
+
+def word_key(word):
+    """64-битный ключ слова для поиска в отсортированном словаре (без построения dict на 2M слов)"""
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def fit_pca(matrix, block_rows=200_000):
+    """
+    Считает базис PCA один раз: ковариация по всем строкам матрицы, накопленная блоками во float64.
+    Первые d столбцов базиса дают модель размерности d, поэтому все размерности
+    получаются из одной матрицы проекций.
+    """
+    n, dim = matrix.shape
+    total = np.zeros(dim, dtype=np.float64)
+    gram = np.zeros((dim, dim), dtype=np.float64)
+
+    for start in range(0, n, block_rows):
+        block = np.asarray(matrix[start:start + block_rows], dtype=np.float64)
+        total += block.sum(axis=0)
+        gram += block.T @ block
+
+    mean = total / n
+    cov = (gram - n * np.outer(mean, mean)) / (n - 1)
+    eigv, _, _ = np.linalg.svd(cov)
+    return eigv.astype(np.float32)
+
+
+def project(matrix, eigv, dim, block_rows=200_000, out=None):
+    """Проецирует матрицу на первые dim компонент блоками (без копии всей матрицы во float64)"""
+    if out is None:
+        out = np.empty((matrix.shape[0], dim), dtype=np.float32)
+    basis = eigv[:, :dim]
+    for start in range(0, matrix.shape[0], block_rows):
+        out[start:start + block_rows] = matrix[start:start + block_rows] @ basis
+    return out
+
+
+def build_store(model_path, store_dir=STORE_DIR, dims=MODEL_SIZES, dtype="float16", block_rows=200_000):
+    """
+    Один раз загружает cc.en.300.bin, считает PCA и пишет для каждой размерности:
+        words.{dim}.npy   - векторы слов (nwords, dim)
+        ngrams.{dim}.npy  - векторы n-грамм (bucket, dim)
+    Общие для всех размерностей файлы: words.txt, vocab_keys.npy, vocab_rows.npy, meta.json
+    """
+    import fasttext
+
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"[INFO] Loading {model_path}...")
+    model = fasttext.load_model(str(model_path))
+    words = model.words
+    matrix = model.get_input_matrix()  # (nwords + bucket, 300)
+    args = model.f.getArgs()
+    nwords = len(words)
+
+    print("[INFO] Fitting PCA once...")
+    eigv = fit_pca(matrix, block_rows)
+
+    max_dim = max(dims)
+    outputs = {}
+    for dim in dims:
+        outputs[dim] = (
+            np.lib.format.open_memmap(store_dir / f"words.{dim}.tmp.npy", mode="w+", dtype=dtype, shape=(nwords, dim)),
+            np.lib.format.open_memmap(store_dir / f"ngrams.{dim}.tmp.npy", mode="w+", dtype=dtype,
+                                      shape=(matrix.shape[0] - nwords, dim)),
+        )
+
+    print(f"[INFO] Projecting {matrix.shape[0]} rows to {dims} dimensions...")
+    for start in range(0, matrix.shape[0], block_rows):
+        projected = matrix[start:start + block_rows] @ eigv[:, :max_dim]
+        stop = start + len(projected)
+        for dim, (words_out, ngrams_out) in outputs.items():
+            if start < nwords:
+                words_out[start:min(stop, nwords)] = projected[:nwords - start, :dim]
+            if stop > nwords:
+                offset = max(start, nwords)
+                ngrams_out[offset - nwords:stop - nwords] = projected[offset - start:, :dim]
+
+    for words_out, ngrams_out in outputs.values():
+        words_out.flush()
+        ngrams_out.flush()
+    outputs.clear()  # закрываем memmap до переименования
+
+    for dim in dims:
+        os.replace(store_dir / f"words.{dim}.tmp.npy", store_dir / f"words.{dim}.npy")
+        os.replace(store_dir / f"ngrams.{dim}.tmp.npy", store_dir / f"ngrams.{dim}.npy")
+
+    # Общий словарь: отсортированные 64-битные ключи слов + номера строк
+    keys = np.array([word_key(w) for w in words], dtype=np.uint64)
+    order = np.argsort(keys)
+    np.save(store_dir / "vocab_keys.npy", keys[order])
+    np.save(store_dir / "vocab_rows.npy", order.astype(np.int64))
+    (store_dir / "words.txt").write_text("\n".join(words), encoding="utf-8")
+
+    meta = {
+        "source": str(model_path),
+        "nwords": nwords,
+        "bucket": args.bucket,
+        "minn": args.minn,
+        "maxn": args.maxn,
+        "dims": list(dims),
+        "dtype": dtype,
+    }
+    (store_dir / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    print(f"[OK] Store saved to: {store_dir}")
+
+
+class FastTextStore:
+    """
+    Модель FastText выбранной размерности поверх mmap-матриц из build_store().
+    Загрузка не читает матрицы целиком, поэтому смена размерности занимает миллисекунды.
+    """
+
+    def __init__(self, store_dir=STORE_DIR, dim=300):
+        store_dir = Path(store_dir)
+        meta = json.loads((store_dir / "meta.json").read_text(encoding="utf-8"))
+        if dim not in meta["dims"]:
+            raise ValueError(f"Dimension {dim} not in store (available: {meta['dims']})")
+
+        self.dim = dim
+        self.minn = meta["minn"]
+        self.maxn = meta["maxn"]
+        self.bucket = meta["bucket"]
+        self.words = np.load(store_dir / f"words.{dim}.npy", mmap_mode="r")
+        self.ngrams = np.load(store_dir / f"ngrams.{dim}.npy", mmap_mode="r")
+        self.vocab_keys = np.load(store_dir / "vocab_keys.npy", mmap_mode="r")
+        self.vocab_rows = np.load(store_dir / "vocab_rows.npy", mmap_mode="r")
+        self.engine = SubwordEngine(self.ngrams, self.minn, self.maxn, self.bucket, word_vectors=self.words)
+
+    def word_ids(self, words):
+        """Номера слов в словаре (-1 для слов вне словаря)"""
+        keys = np.fromiter((word_key(w) for w in words), dtype=np.uint64, count=len(words))
+        pos = np.searchsorted(self.vocab_keys, keys)
+        pos = np.minimum(pos, len(self.vocab_keys) - 1)
+        found = self.vocab_keys[pos] == keys
+        return np.where(found, self.vocab_rows[pos], -1)
+
+    def get_word_vectors(self, words):
+        """Векторы слов пачкой: среднее вектора слова (если оно в словаре) и векторов его n-грамм"""
+        return self.engine.compose(words, self.word_ids(words))
+
+    def get_word_vector(self, word):
+        return self.get_word_vectors([word])[0]
+
+    def get_sentence_vector(self, text):
+        """Как model.get_sentence_vector(): среднее нормированных векторов слов"""
+        vectors = self.get_word_vectors(text.split())
+        norms = np.linalg.norm(vectors, axis=1)
+        vectors = vectors[norms > 0] / norms[norms > 0, None]
+        if not len(vectors):
+            return np.zeros(self.dim, dtype=np.float32)
+        return vectors.mean(axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build reduced-dimension FastText matrices in one pass")
+    parser.add_argument("model", nargs="?", default=os.path.join(FASTTEXT_CACHE_DIR, "cc.en.300.bin"),
+                        help="Path to the original 300-dim FastText .bin model")
+    parser.add_argument("-o", "--output", default=STORE_DIR, help="Store directory")
+    parser.add_argument("--dims", nargs="+", type=int, default=MODEL_SIZES, help="Target dimensions")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"[ERROR] File not found: {args.model}")
+        return
+
+    start_time = time.perf_counter()
+    build_store(args.model, args.output, args.dims, args.dtype)
+    print(f"  Build time: {time.perf_counter() - start_time:.2f} sec.")
+
+
+if __name__ == "__main__":
+    main()
+
+
+'''
+    EXAMPLE OF USAGE:
+        python fasttext_store.py
+        python fasttext_store.py fasttext_cache/cc.en.300.bin --dims 50 100 200 300 --dtype float16
+'''
@@ -1,8 +1,11 @@
 import fasttext
 import fasttext.util
+import numpy as np
 import os
 import shutil
 
+from fasttext_store import fit_pca, project
+
 # Указываем папку для кэша моделей
 FASTTEXT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fasttext_cache")
 os.makedirs(FASTTEXT_CACHE_DIR, exist_ok=True)
@@ -24,10 +27,24 @@ if not os.path.exists(MODEL_300_PATH):
 print("Loading original model...")
 model = fasttext.load_model(MODEL_300_PATH)
 
-# Уменьшаем размерность и сохраняем новые модели
-for dim in [50, 100, 200]:
+# PCA считается один раз по исходным матрицам: модель размерности dim —
+# это первые dim компонент одной проекции (раньше каждая размерность
+# получалась из уже уменьшенной на прошлом шаге модели)
+DIMS = [50, 100, 200]
+print("Fitting PCA...")
+input_matrix = model.get_input_matrix()
+output_matrix = model.get_output_matrix()
+# Выходная матрица проецируется на базис входной (как в fasttext.util.reduce_model),
+# иначе пространства входных и выходных векторов сохранённых моделей не соответствуют друг другу
+eigv = fit_pca(input_matrix)
+input_reduced = project(input_matrix, eigv, max(DIMS))
+output_reduced = project(output_matrix, eigv, max(DIMS))
+del input_matrix, output_matrix
+
+# Сохраняем модели всех размерностей
+for dim in DIMS:
     print(f"Reducing model to {dim} dimensions...")
-    fasttext.util.reduce_model(model, dim)
+    model.set_matrices(np.ascontiguousarray(input_reduced[:, :dim]), np.ascontiguousarray(output_reduced[:, :dim]))
     reduced_model_path = os.path.join(FASTTEXT_CACHE_DIR, f"cc.en.{dim}.bin")
     model.save_model(reduced_model_path)
     print(f"Model with {dim} dimensions saved to {reduced_model_path}")
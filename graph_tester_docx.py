@@ -1,14 +1,10 @@
 import argparse
 from pathlib import Path
-from markitdown import MarkItDown
-
-from langchain_text_splitters import (
-    MarkdownHeaderTextSplitter,
-    RecursiveCharacterTextSplitter
-)
 
 
 def convert_docx_to_markdown(input_path: Path) -> str:
+    from markitdown import MarkItDown
+
     md = MarkItDown(enable_plugins=False)
     result = md.convert(str(input_path))
     return result.text_content
@@ -43,6 +39,11 @@ def hierarchical_split(markdown_text: str, chunk_size=800, chunk_overlap=150):
     Returns:
         list[dict]: List of chunk dictionaries with structural metadata.
     """
+    # Imported here: load_chunks()/save_chunks() users should not pay for langchain
+    from langchain_text_splitters import (
+        MarkdownHeaderTextSplitter,
+        RecursiveCharacterTextSplitter
+    )
 
     # Final result container
     all_chunks = []
@@ -190,10 +191,52 @@ def save_chunks(output_path: Path, chunks):
             f.write(f"CHUNK_ID: {chunk['chunk_id']}\n")
             f.write(f"SECTION_INDEX: {chunk['section_index']}\n")
             f.write(f"SECTION_PATH: {chunk['section_path']}\n")
+            for alias in chunk.get("aliases", []):
+                f.write(f"ALIAS: {alias['section_index']} | {alias['chunk_id']} | {alias['section_path']}\n")
             f.write("-" * 80 + "\n")
             f.write(chunk["text"].strip() + "\n\n")
 
 
+def load_chunks(input_path: Path):
+    """
+    Reads chunks back from a file written by save_chunks().
+    """
+    chunks = []
+    separator = "=" * 80
+    text = input_path.read_text(encoding="utf-8")
+
+    for block in text.split(separator + "\n"):
+        if not block.strip():
+            continue
+
+        header, _, body = block.partition("-" * 80 + "\n")
+        fields = {}
+        aliases = []
+        for line in header.splitlines():
+            key, _, value = line.partition(": ")
+            if key == "ALIAS":
+                section_index, chunk_id, section_path = value.split(" | ", 2)
+                aliases.append({
+                    "chunk_id": int(chunk_id),
+                    "section_index": int(section_index),
+                    "section_path": section_path
+                })
+            else:
+                fields[key] = value
+
+        chunk = {
+            "chunk_id": int(fields.get("CHUNK_ID", 0)),
+            "section_index": int(fields.get("SECTION_INDEX", 0)),
+            "section_path": fields.get("SECTION_PATH", ""),
+            "text": body.strip()
+        }
+        if aliases:
+            chunk["aliases"] = aliases
+        chunks.append(chunk)
+
+    return chunks
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="DOCX → Markdown → Hierarchical Chunk Tester"
@@ -201,6 +244,8 @@ def main():
     parser.add_argument("input", help="Path to DOCX file")
     parser.add_argument("-o", "--output", help="Output txt file")
     parser.add_argument("--preview", action="store_true")
+    parser.add_argument("--dedup", type=float, nargs="?", const=0.8, metavar="THRESHOLD",
+                        help="Drop near-duplicate chunks (MinHash, default threshold 0.8), keeping them as aliases")
 
     args = parser.parse_args()
 
@@ -228,6 +273,12 @@ def main():
 
     print(f"[INFO] Total chunks: {len(chunks)}")
 
+    if args.dedup is not None:
+        from chunk_dedup import dedup_chunks
+
+        chunks = dedup_chunks(chunks, threshold=args.dedup)
+        print(f"[INFO] Chunks after dedup: {len(chunks)}")
+
     save_chunks(output_path, chunks)
 
     print(f"[OK] Saved to: {output_path}")
@@ -249,4 +300,5 @@ USAGE:
     python graph_tester_docx.py file.docx
     python graph_tester_docx.py file.docx --preview
     python graph_tester_docx.py file.docx -o result.txt
+    python graph_tester_docx.py file.docx --dedup 0.8
 """
\ No newline at end of file
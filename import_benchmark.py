@@ -0,0 +1,102 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Standalone scripts: never imported by other modules, their top-level imports are their job
+SCRIPTS = {"import_benchmark", "gensim_models_load", "models_list", "ocr_lighton_png", "ocr_ligthon_pdf",
+           "parsing_pdf_md", "parsing_pdf_ocr_md"}
+
+# Every other module of the repo is imported for its helpers (by other modules, worker processes,
+# the daemon/server), so new modules are checked without being listed here
+MODULES = sorted(path.stem for path in Path(__file__).resolve().parent.glob("*.py") if path.stem not in SCRIPTS)
+
+# Heavy packages that must not be imported by just importing one of MODULES
+HEAVY_PACKAGES = ["torch", "transformers", "onnxruntime", "sentence_transformers", "sklearn",
+                  "fastembed", "gensim", "fasttext", "FlagEmbedding", "markitdown", "langchain_text_splitters",
+                  "openpyxl", "pandas", "olefile"]
+
+
+def parse_importtime(stderr):
+    """'import time: self [us] | cumulative | imported package' lines → list of (package, self_us, cumulative_us)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, package = line[len("import time:"):].split("|", 2)
+        rows.append((package.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_module(module, python=sys.executable, cwd=None):
+    """Imports a module in a fresh interpreter with -X importtime."""
+    start_time = time.perf_counter()
+    result = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=cwd)
+    wall_ms = (time.perf_counter() - start_time) * 1000
+
+    rows = parse_importtime(result.stderr)
+    total = next((cumulative for package, _, cumulative in rows if package.strip() == module), None)
+    top_level = {package.strip().split(".")[0] for package, _, _ in rows}
+
+    return {
+        "module": module,
+        "ok": result.returncode == 0,
+        "error": result.stderr.strip().splitlines()[-1] if result.returncode != 0 and result.stderr.strip() else None,
+        "import_ms": round(total / 1000, 2) if total is not None else None,
+        "wall_ms": round(wall_ms, 1),
+        "heavy": sorted(package for package in HEAVY_PACKAGES if package in top_level),
+        # Direct children of the module with the largest cumulative time
+        "top": sorted(
+            ((package.strip(), round(cumulative / 1000, 2)) for package, _, cumulative in rows
+             if package.startswith("  ") and not package.startswith("    ")),
+            key=lambda item: -item[1],
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark of the repo modules (python -X importtime)")
+    parser.add_argument("modules", nargs="*", help=f"Modules to measure (default: {len(MODULES)} repo modules)")
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="Flag modules importing slower than this")
+    parser.add_argument("--top", type=int, default=3, help="Heaviest direct imports to show per module")
+    parser.add_argument("--json", help="Save results to a JSON file")
+
+    args = parser.parse_args()
+
+    cwd = Path(__file__).resolve().parent
+    results = [measure_module(module, cwd=cwd) for module in (args.modules or MODULES)]
+
+    print(f"{'module':<32} {'import ms':>10} {'wall ms':>9}  heaviest imports")
+    slow = 0
+    for result in results:
+        if not result["ok"]:
+            print(f"{result['module']:<32} {'-':>10} {result['wall_ms']:>9.1f}  [ERROR] {result['error']}")
+            continue
+
+        over_budget = result["import_ms"] > args.budget_ms or result["heavy"]
+        slow += bool(over_budget)
+        top = ", ".join(f"{package} {ms:.1f}" for package, ms in result["top"][:args.top])
+        flag = "  [SLOW]" if over_budget else ""
+        heavy = f"  heavy: {', '.join(result['heavy'])}" if result["heavy"] else ""
+        print(f"{result['module']:<32} {result['import_ms']:>10.1f} {result['wall_ms']:>9.1f}  {top}{heavy}{flag}")
+
+    print(f"\n[INFO] {slow} module(s) over {args.budget_ms:.0f} ms or importing heavy packages")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"[OK] Saved to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python import_benchmark.py
+    python import_benchmark.py embedding_tester_onnx_bge_m3 embedding_tester_hface --top 5
+    python import_benchmark.py --budget-ms 100 --json import_times.json
+"""
@@ -0,0 +1,256 @@
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from embedding_pipeline import Pipeline, PipelineStage
+from graph_tester_docx import hierarchical_split, save_chunks
+from memory_monitor import GB, MemoryMonitor, embed_within_budget
+from parsing_excel_md import EXCEL_EXTENSIONS, iter_markdown
+
+# File types converted to Markdown (see parsing_*_md.py); .md / .txt are read as is
+CONVERTIBLE = {".docx", ".pdf", ".xlsx", ".xltm", ".xls", ".msg", ".eml", ".pptx", ".html", ".htm"}
+TEXT = {".md", ".txt"}
+
+
+def convert_to_markdown(path):
+    """Any supported file → Markdown. Runs in a worker process (CPU-bound, holds the GIL)."""
+    path = Path(path)
+    if path.suffix.lower() in TEXT:
+        return path.read_text(encoding="utf-8", errors="replace")
+    if path.suffix.lower() in EXCEL_EXTENSIONS:
+        # openpyxl read-only rows instead of MarkItDown's pandas DataFrame of every sheet
+        return "".join(iter_markdown(path))
+
+    from markitdown import MarkItDown
+
+    return MarkItDown(enable_plugins=False).convert(str(path)).text_content
+
+
+def output_name(path):
+    """File name for the Markdown / chunks of path, unique per input path (same names in different directories)."""
+    parts = Path(path).parts
+    if Path(path).is_absolute():
+        parts = parts[1:]
+    return "__".join(part for part in parts if part not in ("", ".", ".."))
+
+
+def collect_inputs(inputs):
+    paths = []
+    for item in inputs:
+        item = Path(item)
+        if item.is_dir():
+            paths.extend(p for p in sorted(item.rglob("*")) if p.suffix.lower() in CONVERTIBLE | TEXT)
+        else:
+            paths.append(item)
+    return paths
+
+
+class IngestPipeline:
+    """
+    convert → split → dedup → embed → index, every stage on its own workers with bounded queues
+    (a slow stage blocks the ones before it instead of piling documents up in memory):
+
+    - convert: threads that hand files to a process pool (MarkItDown is CPU-bound);
+    - split:   hierarchical_split() of graph_tester_docx.py;
+    - dedup:   near-duplicate chunks inside the document (chunk_dedup.py), optional;
+    - embed:   one backend (embedding_backends.py), batches of the document's chunks;
+    - index:   IndexWriter.add_document() of segmented_index.py (one segment per document).
+
+    Markdown and chunks go to disk only if markdown_dir / chunks_dir are given.
+    With a MemoryMonitor every stage is accounted (peak RSS, top allocators) and the embed batches
+    shrink to what fits into the memory budget (memory_monitor.embed_within_budget).
+    """
+
+    def __init__(self, backend, writer, convert_workers=4, split_workers=2, embed_workers=1,
+                 queue_size=8, dedup_threshold=None, markdown_dir=None, chunks_dir=None,
+                 chunk_size=800, chunk_overlap=150, monitor=None, batch_size=32):
+        self.backend = backend
+        self.writer = writer
+        self.convert_workers = convert_workers
+        self.split_workers = split_workers
+        self.embed_workers = embed_workers
+        self.queue_size = queue_size
+        self.dedup_threshold = dedup_threshold
+        self.markdown_dir = Path(markdown_dir) if markdown_dir else None
+        self.chunks_dir = Path(chunks_dir) if chunks_dir else None
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.monitor = monitor
+        self.batch_size = batch_size
+        self.pipeline = None
+        self.failed = []
+        self.empty = []  # converted, but no chunks: nothing indexed
+
+    def _convert(self, path):
+        try:
+            markdown = self._process_pool.submit(convert_to_markdown, str(path)).result()
+        except Exception as e:
+            # One broken file must not stop the whole ingest
+            self.failed.append((str(path), f"{type(e).__name__}: {e}"))
+            print(f"[ERROR] {path}: {e}")
+            return None
+
+        if self.markdown_dir:
+            (self.markdown_dir / f"{output_name(path)}.md").write_text(markdown, encoding="utf-8")
+        return path, markdown
+
+    def _split(self, item):
+        path, markdown = item
+        chunks = hierarchical_split(markdown, self.chunk_size, self.chunk_overlap)
+        for chunk in chunks:
+            chunk["source"] = path.name
+            chunk["file_type"] = path.suffix.lower().lstrip(".")
+        if not chunks:
+            self.empty.append(str(path))
+            return None
+        return path, chunks
+
+    def _dedup(self, item):
+        from chunk_dedup import dedup_chunks
+
+        path, chunks = item
+        chunks = dedup_chunks(chunks, threshold=self.dedup_threshold)
+        if self.chunks_dir:
+            save_chunks(self.chunks_dir / f"{output_name(path)}.chunks.txt", chunks)
+        return path, chunks
+
+    def _save_chunks(self, item):
+        path, chunks = item
+        save_chunks(self.chunks_dir / f"{output_name(path)}.chunks.txt", chunks)
+        return item
+
+    def _embed(self, item):
+        path, chunks = item
+        texts = [c["text"] for c in chunks]
+        if self.monitor is None:
+            return path, chunks, self.backend.embed(texts)
+        # embed_within_budget does its own accounting in the "embed" stage
+        return path, chunks, embed_within_budget(self.backend.embed, texts, self.monitor, self.batch_size)
+
+    def _index(self, item):
+        path, chunks, vectors = item
+        self.writer.add_document(str(path), chunks, vectors)
+
+    def _stage(self, name, func, workers):
+        if self.monitor is not None and name != "embed":
+            monitor = self.monitor
+
+            def monitored(item):
+                with monitor.stage(name):
+                    return func(item)
+
+            return PipelineStage(name, monitored, workers, self.queue_size)
+        return PipelineStage(name, func, workers, self.queue_size)
+
+    def run(self, paths):
+        for directory in (self.markdown_dir, self.chunks_dir):
+            if directory:
+                directory.mkdir(parents=True, exist_ok=True)
+
+        stages = [
+            self._stage("convert", self._convert, self.convert_workers),
+            self._stage("split", self._split, self.split_workers),
+        ]
+        if self.dedup_threshold is not None or self.chunks_dir:
+            if self.dedup_threshold is None:
+                stages.append(self._stage("save", self._save_chunks, 1))
+            else:
+                stages.append(self._stage("dedup", self._dedup, 1))
+        stages += [
+            self._stage("embed", self._embed, self.embed_workers),
+            self._stage("index", self._index, 1),
+        ]
+
+        # spawn: the pool starts its processes lazily from convert threads, after the pipeline threads,
+        # the backend's thread pools and the model exist; forking then can deadlock and copies the model's RSS
+        with ProcessPoolExecutor(self.convert_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as self._process_pool:
+            self.pipeline = Pipeline(stages).start()
+            try:
+                for path in paths:
+                    self.pipeline.put(path)
+            finally:
+                self.pipeline.close()
+        return self.pipeline.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Files → Markdown → chunks → embeddings → segmented index")
+    parser.add_argument("inputs", nargs="+", help="Files or directories (docx, pdf, xlsx, msg, eml, md, ...)")
+    parser.add_argument("--index", required=True, help="Segmented index directory (see segmented_index.py)")
+    parser.add_argument("--model", default="BAAI/bge-small-en-v1.5", help="Backend spec (see embedding_backends.py)")
+    parser.add_argument("--convert-workers", type=int, default=4, help="Conversion processes")
+    parser.add_argument("--split-workers", type=int, default=2)
+    parser.add_argument("--embed-workers", type=int, default=1, help="Threads calling the backend")
+    parser.add_argument("--threads", type=int, help="Inference threads of the backend")
+    parser.add_argument("--queue-size", type=int, default=8, help="Max documents waiting in front of every stage")
+    parser.add_argument("--dedup", type=float, nargs="?", const=0.8, metavar="THRESHOLD",
+                        help="Drop near-duplicate chunks inside each document (MinHash, default threshold 0.8)")
+    parser.add_argument("--save-markdown", metavar="DIR", help="Also write the converted Markdown files")
+    parser.add_argument("--save-chunks", metavar="DIR", help="Also write .chunks.txt files")
+    parser.add_argument("--batch-size", type=int, default=32, help="Max chunks per backend call")
+    parser.add_argument("--memory-budget-gb", type=float,
+                        help="Account memory per stage and shrink embed batches to stay under this RSS")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record the top Python allocators of every stage (tracemalloc, slower)")
+
+    args = parser.parse_args()
+
+    paths = collect_inputs(args.inputs)
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        print(f"[ERROR] File not found: {missing[0]}")
+        return
+    if not paths:
+        print("[ERROR] No supported files")
+        return
+
+    from embedding_backends import load_backend
+    from segmented_index import IndexWriter
+
+    monitor = None
+    if args.memory_budget_gb or args.trace_memory:
+        budget = int(args.memory_budget_gb * GB) if args.memory_budget_gb else None
+        monitor = MemoryMonitor(budget, trace=args.trace_memory)
+
+    print(f"[INFO] Loading {args.model}...")
+    if monitor is not None:
+        with monitor.stage("load model"):
+            backend = load_backend(args.model, threads=args.threads, batch_size=args.batch_size)
+    else:
+        backend = load_backend(args.model, threads=args.threads, batch_size=args.batch_size)
+
+    ingest = IngestPipeline(backend, IndexWriter(Path(args.index)), args.convert_workers, args.split_workers,
+                            args.embed_workers, args.queue_size, args.dedup, args.save_markdown, args.save_chunks,
+                            monitor=monitor, batch_size=args.batch_size)
+
+    print(f"[INFO] Ingesting {len(paths)} file(s)...")
+    start_time = time.perf_counter()
+    ingest.run(paths)
+    execution_time = time.perf_counter() - start_time
+
+    print(f"\n[OK] {len(paths) - len(ingest.failed) - len(ingest.empty)} file(s) indexed in {execution_time:.2f} sec.")
+    if ingest.failed:
+        print(f"[WARNING] {len(ingest.failed)} file(s) failed to convert")
+    if ingest.empty:
+        print(f"[WARNING] {len(ingest.empty)} file(s) produced no chunks")
+    print("Stages:")
+    ingest.pipeline.print_stats()
+    if monitor is not None:
+        monitor.print_report()
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python ingest_pipeline.py docs/ --index search_index
+    python ingest_pipeline.py file.docx test_order.pdf test3.xlsx --index search_index --dedup
+    python ingest_pipeline.py docs/ --index search_index --model onnx:models/e5-small-v2.onnx@intfloat/e5-small-v2 \
+        --convert-workers 8 --embed-workers 2 --save-chunks chunks/
+    python ingest_pipeline.py docs/ --index search_index --memory-budget-gb 4 --trace-memory
+"""
@@ -0,0 +1,184 @@
+import argparse
+import time
+
+import numpy as np
+
+import similarity
+
+POOLINGS = ("mean", "weighted", "max", "multi")
+
+
+def window_spans(length, window, overlap):
+    """(start, end) token spans of overlapping windows covering `length` tokens."""
+    if length <= window:
+        return [(0, length)]
+    stride = window - overlap
+    return [(start, min(start + window, length)) for start in range(0, length - overlap, stride)]
+
+
+def split_windows(tokenizer, texts, window=512, overlap=64):
+    """
+    Tokenizes all texts in one batch call and cuts them into windows of at most `window`
+    tokens (special tokens included). Returns (windows token ids, doc index per window).
+    """
+    content = window - tokenizer.num_special_tokens_to_add()
+    overlap = min(overlap, content // 2)
+    ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+
+    windows, doc_ids = [], []
+    for doc, tokens in enumerate(ids):
+        for start, end in window_spans(len(tokens), content, overlap):
+            windows.append(tokenizer.build_inputs_with_special_tokens(tokens[start:end]))
+            doc_ids.append(doc)
+    return windows, np.array(doc_ids, dtype=np.int64)
+
+
+def runner_window_encoder(runner):
+    """Window encoder over an OnnxEmbeddingRunner: token ids are padded directly, no re-tokenization."""
+    def encode(windows):
+        encoded = runner.tokenizer.pad({"input_ids": windows}, return_tensors="np",
+                                       pad_to_multiple_of=runner.pad_to_multiple_of)
+        return runner.run_encoded(encoded)
+    return encode
+
+
+def flag_window_encoder(model, max_length=512):
+    """Window encoder over BGEM3FlagModel: windows are decoded back to text (encode() takes strings only)."""
+    def encode(windows):
+        texts = model.tokenizer.batch_decode(windows, skip_special_tokens=True)
+        return np.asarray(model.encode(texts, batch_size=len(texts), max_length=max_length)["dense_vecs"],
+                          dtype=np.float32)
+    return encode
+
+
+def combine(window_vectors, doc_ids, lengths, n_docs, pooling="mean", normalize=True):
+    """
+    Window vectors (grouped by document, in document order) → one vector per document:
+    mean, length-weighted mean, element-wise max; or "multi": list of (windows, dim) arrays.
+    """
+    if pooling == "multi":
+        bounds = np.searchsorted(doc_ids, np.arange(1, n_docs))
+        return np.split(window_vectors, bounds)
+
+    starts = np.searchsorted(doc_ids, np.arange(n_docs))
+    if pooling == "max":
+        pooled = np.maximum.reduceat(window_vectors, starts, axis=0)
+    else:
+        weights = lengths.astype(np.float32) if pooling == "weighted" else np.ones(len(doc_ids), dtype=np.float32)
+        pooled = np.add.reduceat(window_vectors * weights[:, None], starts, axis=0)
+        pooled /= np.add.reduceat(weights, starts)[:, None]
+
+    return similarity.normalize(pooled) if normalize else pooled
+
+
+class LongDocumentEmbedder:
+    """
+    Embeds documents of any length with cost linear in their length: every document is cut into
+    overlapping windows, windows of all documents are sorted by length and encoded in shared batches,
+    then pooled back per document.
+    """
+
+    def __init__(self, encode_windows, tokenizer, window=512, overlap=64, batch_size=16, pooling="mean"):
+        if pooling not in POOLINGS:
+            raise ValueError(f"pooling must be one of {POOLINGS}")
+        self.encode_windows = encode_windows
+        self.tokenizer = tokenizer
+        self.window = window
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.pooling = pooling
+
+    def embed(self, texts, pooling=None):
+        windows, doc_ids = split_windows(self.tokenizer, texts, self.window, self.overlap)
+        lengths = np.array([len(w) for w in windows], dtype=np.int64)
+
+        # Similar lengths in one batch → almost no padding
+        order = np.argsort(-lengths, kind="stable")
+        window_vectors = None
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors = self.encode_windows([windows[i] for i in batch])
+            if window_vectors is None:
+                window_vectors = np.empty((len(windows), vectors.shape[1]), dtype=np.float32)
+            window_vectors[batch] = vectors
+
+        return combine(window_vectors, doc_ids, lengths, len(texts), pooling or self.pooling)
+
+
+def make_text(tokenizer, base_text, n_tokens):
+    """A text of ~n_tokens tokens made of repeated base_text."""
+    base_tokens = max(len(tokenizer(base_text, add_special_tokens=False)["input_ids"]), 1)
+    return " ".join([base_text] * (n_tokens // base_tokens + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long documents: sliding windows vs full-length encoding (bge-m3)")
+    parser.add_argument("--backend", choices=["onnx", "flag"], default="onnx",
+                        help="onnx: models/bge-m3/model.onnx (embedding_tester_onnx_bge_m3), flag: BGEM3FlagModel")
+    parser.add_argument("--lengths", default="256,512,1024,2048,4096,8192", help="Document lengths in tokens")
+    parser.add_argument("--docs", type=int, default=4, help="Documents per length")
+    parser.add_argument("--window", type=int, default=512)
+    parser.add_argument("--overlap", type=int, default=64)
+    parser.add_argument("--pooling", choices=POOLINGS[:-1], default="mean")
+
+    args = parser.parse_args()
+    lengths = [int(n) for n in args.lengths.split(",")]
+
+    if args.backend == "onnx":
+        from embedding_tester_onnx_bge_m3 import get_runner
+
+        runner = get_runner()
+        tokenizer = runner.tokenizer
+        encode_windows = runner_window_encoder(runner)
+
+        def encode_full(texts, max_length):
+            encoded = tokenizer(texts, padding=True, truncation=True, max_length=max_length, return_tensors="np")
+            return runner.run_encoded(encoded)
+    else:
+        from embedding_tester_bge_m3 import get_model
+
+        model = get_model()
+        tokenizer = model.tokenizer
+        encode_windows = flag_window_encoder(model, args.window)
+
+        def encode_full(texts, max_length):
+            return model.encode(texts, batch_size=len(texts), max_length=max_length)["dense_vecs"]
+
+    embedder = LongDocumentEmbedder(encode_windows, tokenizer, args.window, args.overlap, pooling=args.pooling)
+    base_text = "Добрый день! Подскажите, сколько человек я могу взять с собой в бизнес-зал аэропорта по моей карте?"
+    embedder.embed([base_text])  # warm-up
+
+    print(f"{'tokens':>7} {'full, sec':>10} {'windows, sec':>13} {'speedup':>8} {'cosine':>7}")
+    crossover = None
+    for n_tokens in lengths:
+        texts = [make_text(tokenizer, base_text, n_tokens)] * args.docs
+
+        start_time = time.perf_counter()
+        full = similarity.normalize(encode_full(texts, n_tokens + 2))
+        full_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        windowed = embedder.embed(texts)
+        windowed_time = time.perf_counter() - start_time
+
+        cosine = float(similarity.rowwise(full, windowed).mean())
+        if crossover is None and windowed_time < full_time:
+            crossover = n_tokens
+        print(f"{n_tokens:>7} {full_time:>10.3f} {windowed_time:>13.3f} {full_time / windowed_time:>7.2f}x {cosine:>7.4f}")
+
+    if crossover:
+        print(f"\n[INFO] Windows are faster from ~{crossover} tokens")
+    else:
+        print("\n[INFO] Full-length encoding was faster at all measured lengths")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python long_document.py
+    python long_document.py --backend flag --lengths 512,2048,8192 --docs 2
+    python long_document.py --window 256 --overlap 32 --pooling weighted
+"""
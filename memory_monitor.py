@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+GB = 1024 ** 3
+MB = 1024 ** 2
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """An allocation (model load, batch) would take the process over its memory budget."""
+
+
+def rss_bytes():
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import psutil
+        return psutil.Process().memory_info().rss
+
+
+def peak_rss_bytes():
+    """Peak RSS of this process since start (kernel high-water mark)."""
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on Linux
+
+
+def memory_limit_bytes():
+    """Container (cgroup v2 / v1) memory limit, or the physical RAM size if there is none."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:  # v1 reports "no limit" as a huge number
+            return int(value)
+    return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+class MemoryMonitor:
+    """
+    Memory accounting per named stage + a process RSS budget.
+
+    with monitor.stage("convert"):  ...   records RSS at start/end, sampled peak RSS during the stage
+                                          and (trace=True) the top Python/numpy allocators of the stage
+    monitor.check(extra_bytes)            raises MemoryBudgetExceeded if RSS + extra_bytes > budget
+    monitor.fit_batch_size(...)           largest batch that fits into the remaining budget
+
+    RSS is sampled by one background thread every `interval` seconds, so short spikes between
+    samples can be missed; peak_rss_bytes() gives the exact process-wide high-water mark.
+    """
+
+    def __init__(self, budget_bytes=None, interval=0.05, trace=False, top=5, safety=0.9):
+        self.budget_bytes = budget_bytes if budget_bytes is not None else int(memory_limit_bytes() * safety)
+        self.interval = interval
+        self.trace = trace
+        self.top = top
+        self.stages = {}     # name -> aggregated stats
+        self._active = {}    # token -> [name, peak rss]
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = rss_bytes()
+            with self._lock:
+                for active in self._active.values():
+                    active[1] = max(active[1], rss)
+
+    def _ensure_sampler(self):
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample, name="memory-monitor", daemon=True)
+            self._sampler.start()
+
+    @contextmanager
+    def stage(self, name):
+        self._ensure_sampler()
+        token = object()
+        rss_start = rss_bytes()
+        snapshot = tracemalloc.take_snapshot() if self.trace else None
+        with self._lock:
+            self._active[token] = [name, rss_start]
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            rss_end = rss_bytes()
+            with self._lock:
+                _, peak = self._active.pop(token)
+            peak = max(peak, rss_end)
+
+            top = []
+            if snapshot is not None:
+                own = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+                diff = tracemalloc.take_snapshot().filter_traces(own).compare_to(snapshot.filter_traces(own), "lineno")
+                top = [(str(s.traceback), s.size_diff) for s in diff[:self.top] if s.size_diff > 0]
+
+            with self._lock:
+                stats = self.stages.setdefault(name, {
+                    "calls": 0, "seconds": 0.0, "rss_delta": 0, "peak_rss": 0, "peak_growth": 0, "top": [],
+                })
+                stats["calls"] += 1
+                stats["seconds"] += seconds
+                stats["rss_delta"] += rss_end - rss_start
+                stats["peak_rss"] = max(stats["peak_rss"], peak)
+                stats["peak_growth"] = max(stats["peak_growth"], peak - rss_start)
+                if top:
+                    stats["top"] = top
+
+    def headroom(self):
+        return self.budget_bytes - rss_bytes()
+
+    def check(self, extra_bytes=0, what="allocation"):
+        rss = rss_bytes()
+        if rss + extra_bytes > self.budget_bytes:
+            raise MemoryBudgetExceeded(
+                f"{what} needs ~{extra_bytes / MB:.0f} MB, RSS is {rss / MB:.0f} MB, "
+                f"budget {self.budget_bytes / MB:.0f} MB"
+            )
+
+    def fit_batch_size(self, batch_size, bytes_per_item, min_batch=1):
+        """Halves batch_size until batch_size * bytes_per_item fits into the remaining budget."""
+        headroom = self.headroom()
+        while batch_size > min_batch and batch_size * bytes_per_item > headroom:
+            batch_size //= 2
+        return max(batch_size, min_batch)
+
+    def report(self):
+        with self._lock:
+            return {
+                "rss_mb": round(rss_bytes() / MB, 1),
+                "peak_rss_mb": round(peak_rss_bytes() / MB, 1),
+                "budget_mb": round(self.budget_bytes / MB, 1),
+                "stages": {
+                    name: {
+                        "calls": stats["calls"],
+                        "seconds": round(stats["seconds"], 3),
+                        "rss_delta_mb": round(stats["rss_delta"] / MB, 1),
+                        "peak_rss_mb": round(stats["peak_rss"] / MB, 1),
+                        "peak_growth_mb": round(stats["peak_growth"] / MB, 1),
+                        "top_allocators": [(where, round(size / MB, 2)) for where, size in stats["top"]],
+                    }
+                    for name, stats in self.stages.items()
+                },
+            }
+
+    def print_report(self):
+        report = self.report()
+        print(f"Memory: RSS {report['rss_mb']:.0f} MB, peak {report['peak_rss_mb']:.0f} MB, "
+              f"budget {report['budget_mb']:.0f} MB")
+        for name, stats in report["stages"].items():
+            print(f"  {name:<16} calls {stats['calls']}, peak {stats['peak_rss_mb']:.0f} MB "
+                  f"(+{stats['peak_growth_mb']:.0f} MB), retained {stats['rss_delta_mb']:+.0f} MB")
+            for where, size_mb in stats["top_allocators"]:
+                print(f"      {size_mb:>8.2f} MB  {where}")
+
+    def close(self):
+        self._stop.set()
+
+
+def embed_within_budget(embed, texts, monitor, batch_size=32, stage="embed"):
+    """
+    embed(texts) in batches that fit the monitor budget: the peak RSS growth of the first batch gives
+    the cost per text, later batches are sized to the remaining headroom; a batch that still fails
+    with MemoryError is retried at half the size.
+    """
+    import numpy as np
+
+    results = []
+    bytes_per_item = None
+    start = 0
+    while start < len(texts):
+        size = batch_size if bytes_per_item is None else monitor.fit_batch_size(batch_size, bytes_per_item)
+        batch = texts[start:start + size]
+        rss_before = rss_bytes()
+        try:
+            with monitor.stage(stage):
+                vectors = embed(batch)
+        except MemoryError:
+            if size == 1:
+                raise
+            batch_size = max(size // 2, 1)
+            print(f"[WARNING] MemoryError at batch {size}, retrying with {batch_size}")
+            continue
+
+        growth = max(monitor.stages[stage]["peak_growth"], rss_bytes() - rss_before)
+        bytes_per_item = max(bytes_per_item or 0, growth // max(len(batch), 1))
+        results.append(np.asarray(vectors, dtype=np.float32))
+        start += len(batch)
+
+    return np.concatenate(results) if results else np.empty((0, 0), dtype=np.float32)
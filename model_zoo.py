@@ -0,0 +1,160 @@
+import gc
+import threading
+import time
+from collections import OrderedDict
+
+from embedding_backends import load_backend, parse_spec
+from memory_monitor import GB, rss_bytes
+
+
+def fastembed_size_estimate(spec):
+    """Model size from fastembed's registry (size_in_GB), used before the first load is measured."""
+    kind, name = parse_spec(spec)
+    if kind != "fastembed":
+        return None
+    try:
+        from fastembed.embedding import TextEmbedding
+        for model in TextEmbedding.list_supported_models():
+            if model["model"].lower() == name.lower():
+                return int(model["size_in_GB"] * GB)
+    except Exception:
+        pass
+    return None
+
+
+class ModelZoo:
+    """
+    Keeps embedding backends resident under a RAM budget.
+
+    Models are loaded lazily on first use. The footprint of every load is measured as the RSS growth
+    of the process and remembered, so the next load of the same model can be planned exactly.
+    When a model does not fit, least recently used unpinned models are evicted first.
+
+    With a MemoryMonitor the load is also checked against the whole-process budget (after eviction)
+    and refused with MemoryBudgetExceeded before it starts, instead of running into the OOM killer.
+    """
+
+    def __init__(self, budget_bytes, loader=load_backend, estimate=fastembed_size_estimate, monitor=None):
+        self.budget_bytes = budget_bytes
+        self.loader = loader
+        self.estimate = estimate
+        self.monitor = monitor
+        self._models = OrderedDict()  # spec -> {"model", "footprint", "pinned", "hits"}; LRU first
+        self._footprints = {}         # spec -> last measured footprint, kept after eviction
+        self._loads = {}              # spec -> number of loads
+        self._lock = threading.RLock()       # model table; never held during a load
+        self._load_lock = threading.Lock()   # one load at a time
+
+    def used_bytes(self):
+        return sum(entry["footprint"] for entry in self._models.values())
+
+    def _hit(self, spec):
+        entry = self._models.get(spec)
+        if entry is None:
+            return None
+        self._models.move_to_end(spec)
+        entry["hits"] += 1
+        return entry
+
+    def get(self, spec):
+        """Returns a loaded model, loading (and evicting others) if needed."""
+        with self._lock:
+            entry = self._hit(spec)
+            if entry is not None:
+                return entry["model"]
+
+        # Loads run outside self._lock, so hits on resident models never wait for a load. They are
+        # serialized by _load_lock: footprints are measured as process RSS growth, which concurrent
+        # loads would mix up; a second request for the same spec waits here and finds it loaded.
+        with self._load_lock:
+            with self._lock:
+                entry = self._hit(spec)
+                if entry is not None:
+                    return entry["model"]
+
+                estimate = (self.estimate(spec) if self.estimate else None) or 0
+                expected = self._footprints.get(spec) or estimate
+                if expected > self.budget_bytes:
+                    raise MemoryError(f"Model {spec} needs ~{expected / GB:.2f} GB, budget is {self.budget_bytes / GB:.2f} GB")
+                self._evict_until(self.budget_bytes - expected)
+                if self.monitor is not None:
+                    self.monitor.check(expected, what=f"Model {spec}")
+
+            rss_before = rss_bytes()
+            start_time = time.perf_counter()
+            if self.monitor is not None:
+                with self.monitor.stage(f"load {spec}"):
+                    model = self.loader(spec)
+            else:
+                model = self.loader(spec)
+            load_time = time.perf_counter() - start_time
+            # A reload after eviction often measures ~0 (the allocator keeps the freed pages), and an
+            # underestimate overcommits the budget: keep the largest measurement, the estimate as a floor
+            footprint = max(rss_bytes() - rss_before, self._footprints.get(spec, 0), estimate)
+
+            with self._lock:
+                self._footprints[spec] = footprint
+                self._loads[spec] = self._loads.get(spec, 0) + 1
+                self._models[spec] = {"model": model, "footprint": footprint, "pinned": False, "hits": 1,
+                                      "load_sec": load_time}
+                print(f"[INFO] Loaded {spec}: {footprint / GB:.2f} GB in {load_time:.2f} sec.")
+
+                # The estimate may have been too low: make room again, keeping the new model
+                self._evict_until(self.budget_bytes, keep=spec)
+            return model
+
+    def _evict_until(self, limit_bytes, keep=None):
+        for spec in list(self._models):
+            if self.used_bytes() <= limit_bytes:
+                break
+            if spec == keep or self._models[spec]["pinned"]:
+                continue
+            self.evict(spec)
+
+        if self.used_bytes() > limit_bytes:
+            print(f"[WARNING] Pinned models use {self.used_bytes() / GB:.2f} GB, over the budget")
+
+    def evict(self, spec):
+        with self._lock:
+            entry = self._models.pop(spec, None)
+            if entry is None:
+                return
+            print(f"[INFO] Evicted {spec} ({entry['footprint'] / GB:.2f} GB)")
+            del entry
+            gc.collect()
+
+    def pin(self, spec):
+        """Loads the model (if needed) and protects it from eviction."""
+        while True:
+            self.get(spec)
+            with self._lock:
+                if spec in self._models:  # not evicted by another load in between
+                    self._models[spec]["pinned"] = True
+                    return
+
+    def unpin(self, spec):
+        with self._lock:
+            if spec in self._models:
+                self._models[spec]["pinned"] = False
+
+    def report(self):
+        """Footprint and usage of every model seen so far."""
+        with self._lock:
+            rows = []
+            for spec, footprint in self._footprints.items():
+                entry = self._models.get(spec)
+                rows.append({
+                    "model": spec,
+                    "resident": entry is not None,
+                    "pinned": bool(entry and entry["pinned"]),
+                    "footprint_gb": round(footprint / GB, 3),
+                    "loads": self._loads.get(spec, 0),
+                    "hits": entry["hits"] if entry else 0,
+                })
+            return rows
+
+    def print_report(self):
+        print(f"Model zoo: {self.used_bytes() / GB:.2f} / {self.budget_bytes / GB:.2f} GB used")
+        for row in self.report():
+            flags = ("resident" if row["resident"] else "evicted") + (", pinned" if row["pinned"] else "")
+            print(f"  {row['model']}: {row['footprint_gb']:.2f} GB, loads {row['loads']}, hits {row['hits']} ({flags})")
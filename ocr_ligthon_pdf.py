@@ -2,7 +2,7 @@ import base64
 import requests
 import io
 import sys
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 from timing_decorator import measure_time
 
@@ -49,15 +49,19 @@ def ocr_image_markdown(image_base64: str) -> str:
 @measure_time
 def ocr_pdf(pdf_path: str):
     print(f"Loading PDF: {pdf_path}")
-    pages = convert_from_path(pdf_path, dpi=300)
+    # Pages are rendered one at a time: a 300 dpi A4 page is ~25 MB as a bitmap,
+    # rendering the whole document up front costs that much RAM for every page.
+    total_pages = pdfinfo_from_path(pdf_path)["Pages"]
 
-    print(f"Total pages: {len(pages)}")
+    print(f"Total pages: {total_pages}")
     print("=" * 60)
 
-    for i, page in enumerate(pages, start=1):
+    for i in range(1, total_pages + 1):
         print(f"\n📄 Processing page {i}...\n")
 
+        page = convert_from_path(pdf_path, dpi=300, first_page=i, last_page=i)[0]
         image_base64 = image_to_base64(page)
+        del page
         markdown_text = ocr_image_markdown(image_base64)
 
         print(f"\n----- PAGE {i} -----\n")
@@ -1,7 +1,8 @@
 import time
 import numpy as np
 import requests
-from sklearn.metrics.pairwise import cosine_similarity
+
+import similarity
 
 OLLAMA_URL = "http://localhost:11434/api/embeddings"
 MODELS = ["paraphrase-multilingual:latest", "bge-m3:latest"]  # Список моделей
@@ -19,7 +20,7 @@ def get_embedding(model, text):
 
 def cosine_similarity_score(vec1, vec2):
     """Вычисляет косинусное сходство между двумя эмбеддингами."""
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+    return similarity.cosine_similarity_score(vec1, vec2)
 
 def vector_norm(vec):
     """Вычисляет норму (модуль) вектора."""
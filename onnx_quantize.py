@@ -0,0 +1,183 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+import similarity
+from graph_tester_docx import load_chunks
+from onnx_runner import OnnxEmbeddingRunner
+
+
+def embed_texts(session, tokenizer, texts, batch_size=16, max_length=512):
+    """
+    Mean-pooled (by attention mask) embeddings of texts through an ONNX encoder.
+    One-off helper: for repeated calls keep one OnnxEmbeddingRunner, it owns the bound buffers.
+    """
+    return OnnxEmbeddingRunner(session, tokenizer, max_length=max_length).embed(texts, batch_size)
+
+
+class ChunkCalibrationReader:
+    """Feeds tokenized chunks to onnxruntime static quantization (activation range calibration)."""
+
+    def __init__(self, session, tokenizer, texts, batch_size=8, max_length=512):
+        input_names = {i.name for i in session.get_inputs()}
+        self._feeds = []
+        for start in range(0, len(texts), batch_size):
+            tokens = tokenizer(texts[start:start + batch_size], return_tensors="np", padding=True,
+                               truncation=True, max_length=max_length)
+            self._feeds.append({name: tokens[name].astype(np.int64) for name in tokens if name in input_names})
+        self._iter = iter(self._feeds)
+
+    def get_next(self):
+        return next(self._iter, None)
+
+    def rewind(self):
+        self._iter = iter(self._feeds)
+
+
+def quantize_dynamic_int8(fp32_path: Path, output_path: Path):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(str(fp32_path), str(output_path), weight_type=QuantType.QInt8)
+    return output_path
+
+
+def quantize_static_int8(fp32_path: Path, output_path: Path, tokenizer, calibration_texts):
+    import onnxruntime as ort
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType
+
+    session = ort.InferenceSession(str(fp32_path), providers=["CPUExecutionProvider"])
+    reader = ChunkCalibrationReader(session, tokenizer, calibration_texts)
+    quantize_static(
+        str(fp32_path), str(output_path), reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return output_path
+
+
+def measure_variant(model_path: Path, tokenizer, texts, batch_size=16):
+    """Latency (single text), throughput (batched) and embeddings of one model file."""
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+    # One runner for all measurements: its IO-binding buffers are allocated once per shape, not per call
+    runner = OnnxEmbeddingRunner(session, tokenizer)
+    runner.embed(texts[:2], batch_size)  # warm-up
+
+    single_texts = texts[:min(len(texts), 50)]
+    runner.embed(single_texts[:1], 1)  # warm-up of the single-text shape
+    start_time = time.perf_counter()
+    for text in single_texts:
+        runner.embed([text], 1)
+    latency_ms = (time.perf_counter() - start_time) / len(single_texts) * 1000
+
+    start_time = time.perf_counter()
+    embeddings = runner.embed(texts, batch_size)
+    throughput = len(texts) / (time.perf_counter() - start_time)
+
+    return {
+        "model": str(model_path),
+        "size_mb": round(model_path.stat().st_size / 1024 ** 2, 2),
+        "latency_ms": round(latency_ms, 3),
+        "throughput_per_sec": round(throughput, 1),
+    }, embeddings
+
+
+def drift_report(reference, embeddings, k=10):
+    """Cosine to the FP32 embedding of the same text and overlap of top-k neighbour sets."""
+    cosines = similarity.rowwise(reference, embeddings)
+
+    k = min(k, len(reference) - 1)
+    if k < 1:
+        return {"cosine_mean": float(cosines.mean()), "cosine_min": float(cosines.min())}
+
+    # k + 1 neighbours: the text itself is always the first match
+    _, reference_ids = similarity.query_topk(reference, reference, k + 1)
+    _, variant_ids = similarity.query_topk(embeddings, embeddings, k + 1)
+    overlap = [
+        len(set(ref[1:]) & set(var[1:])) / k
+        for ref, var in zip(reference_ids.tolist(), variant_ids.tolist())
+    ]
+
+    return {
+        "cosine_mean": round(float(cosines.mean()), 5),
+        "cosine_min": round(float(cosines.min()), 5),
+        f"top{k}_overlap": round(float(np.mean(overlap)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FP32 ONNX embedding model → INT8 + accuracy/speed report")
+    parser.add_argument("model", help="Path to FP32 .onnx model")
+    parser.add_argument("--tokenizer", required=True, help="Hugging Face tokenizer, e.g. intfloat/e5-small-v2")
+    parser.add_argument("--chunks", default="file.chunks.txt", help="Chunks file for calibration and evaluation")
+    parser.add_argument("--static", action="store_true", help="Also produce static INT8 (calibrated on chunks)")
+    parser.add_argument("-o", "--output-dir", help="Output directory (default: next to the model)")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours for top-k overlap")
+
+    args = parser.parse_args()
+
+    fp32_path = Path(args.model)
+    if not fp32_path.exists():
+        print(f"[ERROR] File not found: {fp32_path}")
+        return
+
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    texts = [c["text"] for c in load_chunks(Path(args.chunks))]
+    if not texts:
+        print("[ERROR] No chunks for calibration/evaluation")
+        return
+
+    output_dir = Path(args.output_dir) if args.output_dir else fp32_path.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    variants = {"fp32": fp32_path}
+
+    print("[INFO] Dynamic INT8 quantization...")
+    variants["dynamic_int8"] = quantize_dynamic_int8(fp32_path, output_dir / f"{fp32_path.stem}_dynamic_QInt8.onnx")
+
+    if args.static:
+        print(f"[INFO] Static INT8 quantization (calibration on {len(texts)} chunks)...")
+        variants["static_int8"] = quantize_static_int8(
+            fp32_path, output_dir / f"{fp32_path.stem}_static_QInt8.onnx", tokenizer, texts
+        )
+
+    report = {}
+    reference = None
+    for name, path in variants.items():
+        print(f"[INFO] Measuring {name}...")
+        stats, embeddings = measure_variant(path, tokenizer, texts)
+        if reference is None:
+            reference = embeddings
+        stats.update(drift_report(reference, embeddings, args.k))
+        report[name] = stats
+
+    print("\n===== QUANTIZATION REPORT =====\n")
+    for name, stats in report.items():
+        print(f"{name}:")
+        for key, value in stats.items():
+            print(f"  {key}: {value}")
+        print()
+
+    report_path = output_dir / f"{fp32_path.stem}.quantization.json"
+    report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"[OK] Report saved to: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
+
+
+'''
+    EXAMPLE OF USAGE:
+        python onnx_quantize.py models/e5-small-v2.onnx --tokenizer intfloat/e5-small-v2
+        python onnx_quantize.py models/all-MiniLM-L6-v2.onnx --tokenizer nixiesearch/all-MiniLM-L6-v2-onnx --static
+        python onnx_quantize.py models/e5-small-v2.onnx --tokenizer intfloat/e5-small-v2 --chunks file.chunks.txt -o models/
+'''
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+import numpy as np
+
+ORT_TYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+}
+
+
+class _ShapeBuffers:
+    """Preallocated inputs/output for one (batch, seq_len) shape, bound once to an ORT IO binding."""
+
+    def __init__(self, session, input_names, output_name, output_dtype, shape, hidden_size):
+        self.inputs = {name: np.zeros(shape, dtype=np.int64) for name in input_names}
+        self.output = np.empty(shape + (hidden_size,), dtype=output_dtype)
+
+        self.binding = session.io_binding()
+        for name, array in self.inputs.items():
+            self.binding.bind_input(name, "cpu", 0, np.int64, array.shape, array.ctypes.data)
+        self.binding.bind_output(output_name, "cpu", 0, output_dtype, self.output.shape, self.output.ctypes.data)
+
+
+class OnnxEmbeddingRunner:
+    """
+    ONNX Runtime embedding inference without per-call allocations.
+
+    - tokenizer output is copied into preallocated int64 buffers (one set per batch shape),
+      instead of .astype(np.int64) creating new arrays on every call;
+    - only the hidden-state output is requested, through IO binding into a preallocated array;
+    - pooling reads that array in place (einsum over the attention mask), the (batch, seq, dim)
+      tensor is never copied again.
+
+    Sequence lengths are padded to a multiple of pad_to_multiple_of, so only a few shapes
+    (and buffer sets) exist. A runner is not thread-safe: use one per inference thread.
+    """
+
+    def __init__(self, session, tokenizer, output_name=None, max_length=512, pooling="mean",
+                 pad_to_multiple_of=8, max_shapes=32):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.pooling = pooling
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.max_shapes = max_shapes
+
+        self.input_names = [i.name for i in session.get_inputs()]
+        output = next(o for o in session.get_outputs() if output_name in (None, o.name))
+        self.output_name = output.name
+        self.output_dtype = ORT_TYPES.get(output.type, np.float32)
+        self.hidden_size = output.shape[-1] if isinstance(output.shape[-1], int) else None
+
+        self._buffers = OrderedDict()
+
+    def tokenize(self, texts):
+        return self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                              pad_to_multiple_of=self.pad_to_multiple_of, return_tensors="np")
+
+    def _discover_hidden_size(self, feed):
+        """Runs once with an ORT-allocated output when the model has a symbolic hidden size."""
+        binding = self.session.io_binding()
+        for name, array in feed.items():
+            binding.bind_cpu_input(name, np.ascontiguousarray(array, dtype=np.int64))
+        binding.bind_output(self.output_name, "cpu")
+        self.session.run_with_iobinding(binding)
+        self.hidden_size = binding.copy_outputs_to_cpu()[0].shape[-1]
+
+    def _shape_buffers(self, shape):
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            buffers = _ShapeBuffers(self.session, self.input_names, self.output_name,
+                                    self.output_dtype, shape, self.hidden_size)
+            self._buffers[shape] = buffers
+            if len(self._buffers) > self.max_shapes:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(shape)
+        return buffers
+
+    def run_encoded(self, encoded):
+        """Inference + pooling for one tokenized batch. Returns float32 (batch, hidden_size)."""
+        shape = tuple(encoded["input_ids"].shape)
+        if self.hidden_size is None:
+            self._discover_hidden_size({name: encoded[name] for name in self.input_names if name in encoded})
+
+        buffers = self._shape_buffers(shape)
+        for name, array in buffers.inputs.items():
+            if name in encoded:
+                np.copyto(array, encoded[name], casting="unsafe")
+            else:
+                array.fill(0)  # e.g. token_type_ids required by the model but not returned by the tokenizer
+
+        self.session.run_with_iobinding(buffers.binding)
+        hidden = buffers.output
+
+        if self.pooling == "cls":
+            return hidden[:, 0].astype(np.float32)
+
+        mask = buffers.inputs["attention_mask"].astype(np.float32) if "attention_mask" in buffers.inputs \
+            else np.asarray(encoded["attention_mask"], dtype=np.float32)
+        summed = np.einsum("bs,bsd->bd", mask, hidden, dtype=np.float32)
+        return summed / np.clip(mask.sum(axis=1, keepdims=True), 1e-9, None)
+
+    def embed(self, texts, batch_size=32):
+        """Embeddings of texts, float32 (len(texts), hidden_size)."""
+        batches = [
+            self.run_encoded(self.tokenize(texts[start:start + batch_size]))
+            for start in range(0, len(texts), batch_size)
+        ]
+        return np.concatenate(batches) if batches else np.empty((0, self.hidden_size or 0), dtype=np.float32)
+
+
+def load_onnx_session(model_path, threads=None):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return ort.InferenceSession(str(model_path), sess_options=options, providers=["CPUExecutionProvider"])
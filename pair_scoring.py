@@ -0,0 +1,172 @@
+import argparse
+import csv
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+import similarity
+from embedding_backends import load_backend
+
+
+def read_pairs(input_path: Path):
+    """
+    Reads (text_a, text_b, label) pairs from:
+        .tsv   - text_a <TAB> text_b [<TAB> label], an optional 'text_a' header line
+        .jsonl - {"text_a": ..., "text_b": ..., "label": ...}
+    label is None when missing.
+    """
+    pairs = []
+
+    if input_path.suffix.lower() == ".jsonl":
+        with input_path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    pairs.append((item["text_a"], item["text_b"], item.get("label")))
+        return pairs
+
+    with input_path.open(encoding="utf-8", newline="") as f:
+        for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if not row or (not pairs and row[0] == "text_a"):
+                continue
+            if len(row) < 2:
+                raise ValueError(f"Expected at least 2 columns, got: {row}")
+            pairs.append((row[0], row[1], row[2] if len(row) > 2 else None))
+
+    return pairs
+
+
+def score_pairs(pairs, model_specs, batch_size=32):
+    """
+    Embeds every unique text once per model and scores all pairs with one row-wise cosine.
+    Returns (scores, timings): scores is a (models x pairs) float32 matrix.
+    """
+    texts = list(dict.fromkeys(t for a, b, _ in pairs for t in (a, b)))
+    position = {text: i for i, text in enumerate(texts)}
+    index_a = np.array([position[a] for a, _, _ in pairs], dtype=np.int64)
+    index_b = np.array([position[b] for _, b, _ in pairs], dtype=np.int64)
+
+    print(f"[INFO] {len(pairs)} pairs, {len(texts)} unique texts")
+
+    scores = np.full((len(model_specs), len(pairs)), np.nan, dtype=np.float32)
+    timings = []
+
+    for row, spec in enumerate(model_specs):
+        print(f"Using model: {spec}")
+        timing = {"model": spec, "load_sec": None, "embed_sec": None, "score_sec": None}
+        timings.append(timing)
+
+        try:
+            start_time = time.perf_counter()
+            backend = load_backend(spec, batch_size=batch_size)
+            timing["load_sec"] = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            embeddings = similarity.normalize(backend.embed(texts))
+            timing["embed_sec"] = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            scores[row] = similarity.rowwise(embeddings[index_a], embeddings[index_b], normalized=True)
+            timing["score_sec"] = time.perf_counter() - start_time
+
+            print(f"  Embedding time: {timing['embed_sec']:.3f} sec. ({len(texts) / timing['embed_sec']:.1f} texts/sec)")
+            print(f"  Scoring time: {timing['score_sec']:.6f} sec.\n")
+
+        except Exception as e:
+            print(f"  Error: {e}\n")
+
+    return scores, timings
+
+
+def label_correlation(pairs, model_scores):
+    """Pearson correlation of scores with numeric labels, or None if labels are missing/non-numeric."""
+    try:
+        labels = np.array([float(label) for _, _, label in pairs])
+    except (TypeError, ValueError):
+        return None
+    valid = ~np.isnan(model_scores)
+    if valid.sum() < 2 or np.std(labels[valid]) == 0 or np.std(model_scores[valid]) == 0:
+        return None
+    return float(np.corrcoef(labels[valid], model_scores[valid])[0, 1])
+
+
+def save_scores(output_path: Path, pairs, model_specs, scores):
+    """One row per pair, one score column per model."""
+    with output_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(["text_a", "text_b", "label"] + list(model_specs))
+        for i, (a, b, label) in enumerate(pairs):
+            writer.writerow([a, b, "" if label is None else label] + [f"{s:.4f}" for s in scores[:, i]])
+
+
+def save_timings(output_path: Path, timings):
+    with output_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["model", "load_sec", "embed_sec", "score_sec"], delimiter="\t")
+        writer.writeheader()
+        writer.writerows(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score all text pairs with all models in one run")
+    parser.add_argument("input", help="Pairs file (.tsv or .jsonl)")
+    parser.add_argument("-o", "--output", help="Output scores file (.tsv)")
+    parser.add_argument("-m", "--models", nargs="+",
+                        help="Model specs, e.g. BAAI/bge-small-en-v1.5 ollama:bge-m3:latest hf:ai-forever/sbert_large_nlu_ru "
+                             "(default: MODELS from embedding_tester.py)")
+    parser.add_argument("--batch-size", type=int, default=32)
+
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"[ERROR] File not found: {input_path}")
+        return
+
+    if args.models:
+        model_specs = args.models
+    else:
+        from embedding_tester import MODELS
+        model_specs = MODELS
+
+    output_path = Path(args.output) if args.output else input_path.with_suffix(".scores.tsv")
+
+    pairs = read_pairs(input_path)
+    if not pairs:
+        print("[ERROR] No pairs found")
+        return
+
+    scores, timings = score_pairs(pairs, model_specs, args.batch_size)
+
+    save_scores(output_path, pairs, model_specs, scores)
+    timings_path = output_path.with_name(output_path.name.replace(".tsv", "") + ".timings.tsv")
+    save_timings(timings_path, timings)
+
+    print("===== SUMMARY =====")
+    for spec, model_scores, timing in zip(model_specs, scores, timings):
+        correlation = label_correlation(pairs, model_scores)
+        line = f"{spec}: mean score {np.nanmean(model_scores):.4f}" if not np.isnan(model_scores).all() else f"{spec}: failed"
+        if correlation is not None:
+            line += f", label correlation {correlation:.4f}"
+        print(line)
+
+    print(f"\n[OK] Scores saved to: {output_path}")
+    print(f"[OK] Timings saved to: {timings_path}")
+
+
+if __name__ == "__main__":
+    main()
+
+
+'''
+    EXAMPLE OF USAGE:
+        python pair_scoring.py pairs.tsv
+        python pair_scoring.py pairs.jsonl -m BAAI/bge-small-en-v1.5 intfloat/multilingual-e5-large -o scores.tsv
+        python pair_scoring.py pairs.tsv -m ollama:bge-m3:latest hf:ai-forever/sbert_large_nlu_ru
+
+    pairs.tsv:
+        text_a	text_b	label
+        Хочу кредит	Не хочу кредит	0
+        Где мой автомобиль?	Where is my car?	1
+'''
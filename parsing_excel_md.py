@@ -1,6 +1,12 @@
 import argparse
+import datetime
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from markitdown import MarkItDown
+
+EXCEL_EXTENSIONS = [".xlsx", ".xltm"]
 
 
 def convert_file(input_path: Path, output_path: Path | None = None, preview: bool = False):
@@ -12,11 +18,13 @@ def convert_file(input_path: Path, output_path: Path | None = None, preview: boo
         print(f"[ERROR] File not found: {input_path}")
         return
 
-    if input_path.suffix.lower() not in [".xlsx", ".xltm"]:
+    if input_path.suffix.lower() not in EXCEL_EXTENSIONS:
         print(f"[ERROR] Unsupported extension: {input_path.suffix}")
         return
 
     try:
+        from markitdown import MarkItDown
+
         md = MarkItDown(enable_plugins=False)
         result = md.convert(str(input_path))
 
@@ -35,11 +43,139 @@ def convert_file(input_path: Path, output_path: Path | None = None, preview: boo
         print(f"[ERROR] Conversion failed: {e}")
 
 
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, datetime.datetime):
+        value = value.isoformat(sep=" ", timespec="seconds").removesuffix(" 00:00:00")
+    return str(value).replace("|", "\\|").replace("\r\n", "<br>").replace("\n", "<br>").strip()
+
+
+def _open_sheet(input_path, sheet_name):
+    """Лист в режиме read-only: строки читаются потоком из xml, книга целиком в память не грузится"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(input_path, read_only=True, data_only=True)
+    return workbook, workbook[sheet_name]
+
+
+def _scan_columns(input_path, sheet_name):
+    """Первый проход по листу: номера непустых столбцов (используемый диапазон) и ширина самой длинной строки"""
+    workbook, sheet = _open_sheet(input_path, sheet_name)
+    try:
+        used = set()
+        width = 0
+        for row in sheet.iter_rows(values_only=True):
+            width = max(width, len(row))
+            used.update(i for i, value in enumerate(row) if value is not None and str(value).strip())
+        return sorted(used), width
+    finally:
+        workbook.close()
+
+
+def rows_to_markdown(rows, columns=None, skip_empty=True):
+    """
+    Строки листа (кортежи значений) → строки Markdown-таблицы, по одной.
+    Первая (непустая) строка — заголовок. columns — номера выводимых столбцов; без них ширина таблицы
+    задаётся заголовком, остальные строки дополняются или обрезаются до неё.
+    """
+    header = True
+    for row in rows:
+        if columns is None:
+            columns = range(len(row))
+        cells = [_cell_text(row[i]) if i < len(row) else "" for i in columns]
+        if skip_empty and not any(cells):
+            continue
+        yield "| " + " | ".join(cells) + " |\n"
+        if header:
+            yield "|" + " --- |" * len(cells) + "\n"
+            header = False
+
+
+def iter_sheet_markdown(input_path: Path, sheet_name, skip_empty=True):
+    """
+    Markdown одного листа, построчно: память не зависит от размера листа.
+    skip_empty: пропускать пустые строки и столбцы (столбцы — за отдельный первый проход по листу).
+    Ширина таблицы одна для всех строк: столбцы листа по его размерам, а если они не записаны
+    в файл — по самой длинной строке (тоже первым проходом).
+    """
+    columns = None
+    if skip_empty:
+        columns, _ = _scan_columns(input_path, sheet_name)
+        if not columns:
+            return
+
+    workbook, sheet = _open_sheet(input_path, sheet_name)
+    try:
+        if columns is None:
+            width = sheet.max_column or _scan_columns(input_path, sheet_name)[1]
+            columns = range(width)
+        yield f"## {sheet_name}\n\n"
+        yield from rows_to_markdown(sheet.iter_rows(values_only=True), columns, skip_empty)
+        yield "\n"
+    finally:
+        workbook.close()
+
+
+def iter_markdown(input_path: Path, skip_empty=True):
+    """Markdown всей книги построчно, лист за листом (например, для чанкера)"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(input_path, read_only=True)
+    sheet_names = workbook.sheetnames
+    workbook.close()
+    for sheet_name in sheet_names:
+        yield from iter_sheet_markdown(input_path, sheet_name, skip_empty)
+
+
+def _convert_sheet(input_path, sheet_name, part_path, skip_empty):
+    """Воркер: один лист → временный .md файл. Возвращает число строк"""
+    lines = 0
+    with open(part_path, "w", encoding="utf-8") as f:
+        for line in iter_sheet_markdown(Path(input_path), sheet_name, skip_empty):
+            f.write(line)
+            lines += 1
+    return lines
+
+
+def convert_file_streaming(input_path: Path, output_path: Path, workers=None, skip_empty=True):
+    """
+    Потоковая конвертация Excel → Markdown: листы конвертируются параллельно в отдельных процессах,
+    каждый пишет свои строки во временный файл, затем файлы склеиваются в порядке листов.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(input_path, read_only=True)
+    sheet_names = workbook.sheetnames
+    workbook.close()
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(sheet_names)))
+    with tempfile.TemporaryDirectory(dir=output_path.parent) as tmp_dir:
+        part_paths = [Path(tmp_dir) / f"sheet-{i}.md" for i in range(len(sheet_names))]
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_convert_sheet, str(input_path), name, str(part), skip_empty)
+                       for name, part in zip(sheet_names, part_paths)]
+            lines = [future.result() for future in futures]
+
+        with output_path.open("w", encoding="utf-8") as output:
+            for part_path in part_paths:
+                with part_path.open(encoding="utf-8") as part:
+                    shutil.copyfileobj(part, output)
+
+    return dict(zip(sheet_names, lines))
+
+
 def main():
     parser = argparse.ArgumentParser(description="Excel (.xlsx/.xltm) → Markdown tester using MarkItDown")
     parser.add_argument("input", help="Path to Excel file (.xlsx or .xltm)")
     parser.add_argument("-o", "--output", help="Output markdown file (.md)")
     parser.add_argument("--preview", action="store_true", help="Print preview to console")
+    parser.add_argument("--stream", action="store_true",
+                        help="Streaming openpyxl conversion (read-only, sheets in parallel processes) for big workbooks")
+    parser.add_argument("--workers", type=int, help="--stream: parallel sheet processes (default: CPU count)")
+    parser.add_argument("--keep-empty", action="store_true", help="--stream: keep empty rows and columns")
 
     args = parser.parse_args()
 
@@ -50,7 +186,32 @@ def main():
     else:
         output_path = input_path.with_suffix(".md")
 
-    convert_file(input_path, output_path, args.preview)
+    if not args.stream:
+        convert_file(input_path, output_path, args.preview)
+        return
+
+    if not input_path.exists():
+        print(f"[ERROR] File not found: {input_path}")
+        return
+    if input_path.suffix.lower() not in EXCEL_EXTENSIONS:
+        print(f"[ERROR] Unsupported extension: {input_path.suffix}")
+        return
+
+    try:
+        lines = convert_file_streaming(input_path, output_path, args.workers, not args.keep_empty)
+    except Exception as e:
+        print(f"[ERROR] Conversion failed: {e}")
+        return
+
+    for sheet_name, count in lines.items():
+        print(f"[INFO] {sheet_name}: {count} lines")
+    print(f"[OK] Markdown saved to: {output_path}")
+
+    if args.preview:
+        print("\n===== MARKDOWN PREVIEW =====\n")
+        with output_path.open(encoding="utf-8") as f:
+            print(f.read(2000))
+        print("\n===== END PREVIEW =====\n")
 
 
 if __name__ == "__main__":
@@ -61,4 +222,6 @@ if __name__ == "__main__":
         python parsing_excel_md.py test3.xltm
         python parsing_excel_md.py test3.xltm -o result.md
         python parsing_excel_md.py test3.xltm --preview
+        python parsing_excel_md.py finance_export.xlsx --stream --workers 4
+        python parsing_excel_md.py finance_export.xlsx --stream --keep-empty
 '''
\ No newline at end of file
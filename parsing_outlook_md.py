@@ -1,6 +1,29 @@
 import argparse
+import email
+import hashlib
+import io
+import mailbox
+import os
+import re
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from email import policy
+from functools import lru_cache
 from pathlib import Path
-from markitdown import MarkItDown
+
+from parsing_excel_md import EXCEL_EXTENSIONS, iter_markdown
+
+# Вложения, которые конвертирует MarkItDown; Excel идёт через потоковый конвертер parsing_excel_md.py
+MARKITDOWN_EXTENSIONS = {".pdf", ".docx", ".pptx", ".html", ".htm", ".xls"}
+TEXT_EXTENSIONS = {".txt", ".csv", ".md"}
+
+
+@lru_cache(maxsize=1)
+def get_markitdown():
+    """Один экземпляр MarkItDown на процесс (создание дорогое: регистрирует все конвертеры)"""
+    from markitdown import MarkItDown
+
+    return MarkItDown()
 
 
 def convert_email(input_path: Path, output_path: Path | None = None, preview: bool = False):
@@ -20,7 +43,7 @@ def convert_email(input_path: Path, output_path: Path | None = None, preview: bo
 
     try:
         # Инициализируем MarkItDown
-        md = MarkItDown()
+        md = get_markitdown()
         result = md.convert(str(input_path))
 
         markdown_text = result.text_content
@@ -44,16 +67,274 @@ def convert_email(input_path: Path, output_path: Path | None = None, preview: bo
         print("[TIP] Make sure you have installed: pip install \"markitdown[outlook]\"")
 
 
+# ---- почтовые ящики ------------------------------------------------------------
+
+def _eml_message(message, source):
+    """email.message.EmailMessage → dict сообщения; вложения — байты в памяти"""
+    body = message.get_body(preferencelist=("plain", "html"))
+    attachments = []
+    for part in message.iter_attachments():
+        data = part.get_payload(decode=True)
+        if data:
+            attachments.append((part.get_filename() or "attachment", data))
+
+    html = body is not None and body.get_content_type() == "text/html"
+    return {
+        "source": source,
+        "from": str(message.get("from", "")),
+        "to": str(message.get("to", "")),
+        "subject": str(message.get("subject", "")),
+        "date": str(message.get("date", "")),
+        "body": "" if body is None or html else body.get_content(),
+        "html_body": body.get_content().encode("utf-8") if html else None,
+        "attachments": attachments,
+    }
+
+
+def _msg_message(path: Path):
+    """
+    Outlook .msg (OLE-файл) → dict сообщения. Свойства MAPI читаются через olefile
+    (ставится с markitdown[outlook]); вложения — потоки __attach_version1.0_#XXXXXXXX.
+    """
+    import olefile
+
+    with olefile.OleFileIO(str(path)) as ole:
+        def read(name):
+            return ole.openstream(name).read() if ole.exists(name) else None
+
+        def text(prefix, tag):
+            data = read(f"{prefix}__substg1.0_{tag}001F")  # Unicode
+            if data is not None:
+                return data.decode("utf-16-le", errors="replace").rstrip("\0")
+            data = read(f"{prefix}__substg1.0_{tag}001E")  # 8-bit
+            return data.decode("cp1252", errors="replace").rstrip("\0") if data is not None else ""
+
+        headers = email.message_from_string(text("", "007D"), policy=policy.default)
+        attachments = []
+        storages = {entry[0] for entry in ole.listdir(streams=True, storages=True)
+                    if entry[0].startswith("__attach_version1.0_#")}
+        for storage in sorted(storages):
+            data = read(f"{storage}/__substg1.0_37010102")
+            if data:
+                name = text(f"{storage}/", "3707") or text(f"{storage}/", "3704") or "attachment"
+                attachments.append((name, data))
+
+        return {
+            "source": path.name,
+            "from": text("", "0C1F") or text("", "0C1A"),
+            "to": text("", "0E04"),
+            "subject": text("", "0037"),
+            "date": str(headers.get("date", "")),
+            "body": text("", "1000"),
+            "html_body": None,
+            "attachments": attachments,
+        }
+
+
+def _report_error(source, error):
+    print(f"[ERROR] {source}: {error}")
+
+
+def iter_messages(inputs, on_error=_report_error):
+    """
+    Сообщения по одному из файлов .msg / .eml, каталогов с ними (рекурсивно) и mbox-архивов
+    (любой другой файл). В памяти одновременно только текущее сообщение.
+    Ошибка в одном сообщении не прерывает остальные: вызывается on_error(source, exception).
+    """
+    def _eml_file(path):
+        with path.open("rb") as f:
+            return _eml_message(email.message_from_binary_file(f, policy=policy.default), path.name)
+
+    for item in inputs:
+        item = Path(item)
+        paths = sorted(p for p in item.rglob("*") if p.suffix.lower() in (".msg", ".eml")) if item.is_dir() else [item]
+        for path in paths:
+            suffix = path.suffix.lower()
+            if suffix in (".msg", ".eml"):
+                try:
+                    message = _msg_message(path) if suffix == ".msg" else _eml_file(path)
+                except Exception as e:
+                    on_error(path.name, e)
+                    continue
+                yield message
+                continue
+
+            try:
+                box = mailbox.mbox(path, factory=lambda f: email.message_from_binary_file(f, policy=policy.default),
+                                   create=False)
+                keys = box.iterkeys()
+            except Exception as e:
+                on_error(path.name, e)
+                continue
+            for key in keys:
+                source = f"{path.name}#{key}"
+                try:
+                    message = _eml_message(box[key], source)
+                except Exception as e:
+                    on_error(source, e)
+                    continue
+                yield message
+
+
+def convert_attachment(filename, data):
+    """Вложение (байты) → Markdown; конвертер выбирается по расширению. Выполняется в процессе пула"""
+    extension = Path(filename).suffix.lower()
+    if extension in EXCEL_EXTENSIONS:
+        return "".join(iter_markdown(io.BytesIO(data)))
+    if extension in TEXT_EXTENSIONS:
+        return data.decode("utf-8", errors="replace")
+    return get_markitdown().convert_stream(io.BytesIO(data), file_extension=extension).text_content
+
+
+def _file_name(text):
+    return re.sub(r"[^\w\-. ]+", "_", text).strip()[:60] or "message"
+
+
+class MailboxIngest:
+    """
+    Почтовый ящик → Markdown, по одному файлу на сообщение:
+    заголовки и текст письма, затем по разделу на каждое вложение.
+
+    Сообщения читаются потоком; вложения (и HTML-тела) конвертируются параллельно в пуле процессов.
+    Кэш по sha256 содержимого: одно и то же вложение, пересланное по всей цепочке писем,
+    конвертируется один раз (в памяти — последние cache_size результатов, cache_dir — между запусками).
+    До max_pending сообщений ждут своих вложений, файлы пишутся в исходном порядке.
+    """
+
+    def __init__(self, output_dir: Path, workers=None, cache_dir=None, max_pending=64, cache_size=4096):
+        self.output_dir = Path(output_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # key -> Future с Markdown, LRU первым
+        self.stats = {"messages": 0, "failed_messages": 0, "attachments": 0, "converted": 0, "cache_hits": 0,
+                      "skipped": 0, "failed": 0}
+
+    def _submit(self, filename, data):
+        extension = Path(filename).suffix.lower()
+        if extension not in MARKITDOWN_EXTENSIONS | TEXT_EXTENSIONS and extension not in EXCEL_EXTENSIONS:
+            self.stats["skipped"] += 1
+            return None, None
+
+        key = f"{hashlib.sha256(data).hexdigest()}{extension}"
+        future = self._cache.get(key)
+        if future is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return key, future
+
+        cache_path = self.cache_dir / f"{key}.md" if self.cache_dir else None
+        if cache_path is not None and cache_path.exists():
+            future = Future()
+            future.set_result(cache_path.read_text(encoding="utf-8"))
+            self.stats["cache_hits"] += 1
+        else:
+            future = self._pool.submit(convert_attachment, filename, data)
+            self.stats["converted"] += 1
+
+        self._cache[key] = future
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return key, future
+
+    def _result(self, key, future):
+        try:
+            markdown = future.result()
+        except Exception as e:
+            self.stats["failed"] += 1
+            return f"*[conversion failed: {type(e).__name__}: {e}]*"
+
+        if self.cache_dir is not None:
+            cache_path = self.cache_dir / f"{key}.md"
+            if not cache_path.exists():
+                tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+                tmp_path.write_text(markdown, encoding="utf-8")
+                os.replace(tmp_path, cache_path)
+        return markdown
+
+    def _write(self, number, message, body, attachments):
+        parts = [
+            "# Email Message\n",
+            f"**From:** {message['from']}",
+            f"**To:** {message['to']}",
+            f"**Subject:** {message['subject']}",
+            f"**Date:** {message['date']}",
+            f"**Source:** {message['source']}",
+            "\n## Content\n",
+            self._result(*body) if body else message["body"],
+        ]
+        for filename, key, future in attachments:
+            parts.append(f"\n## Attachment: {filename}\n")
+            parts.append(self._result(key, future) if future is not None else "*[unsupported attachment type]*")
+
+        output_path = self.output_dir / f"{number:06d}_{_file_name(message['subject'])}.md"
+        output_path.write_text("\n".join(parts), encoding="utf-8")
+
+    def _message_failed(self, source, error):
+        self.stats["failed_messages"] += 1
+        _report_error(source, error)
+
+    @staticmethod
+    def _ready(item):
+        """Все конвертации сообщения (HTML-тело и вложения) завершены: запись не будет ждать"""
+        _, _, body, attachments = item
+        futures = [future for _, _, future in attachments] + [body[1] if body else None]
+        return all(future.done() for future in futures if future is not None)
+
+    def run(self, inputs):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        pending = deque()
+        with ProcessPoolExecutor(self.workers) as self._pool:
+            for number, message in enumerate(iter_messages(inputs, self._message_failed), start=1):
+                body = self._submit("body.html", message["html_body"]) if message["html_body"] else None
+                attachments = [(filename, *self._submit(filename, data)) for filename, data in message["attachments"]]
+                self.stats["messages"] += 1
+                self.stats["attachments"] += len(attachments)
+                # Байты вложений больше не нужны: дальше живут только futures
+                message["attachments"] = message["html_body"] = None
+                pending.append((number, message, body, attachments))
+
+                # Пишем готовые сообщения; при переполнении очереди ждём самое старое
+                while pending and (len(pending) > self.max_pending or self._ready(pending[0])):
+                    self._write(*pending.popleft())
+
+            while pending:
+                self._write(*pending.popleft())
+        return self.stats
+
+
 def main():
     parser = argparse.ArgumentParser(description="Outlook (.msg/.eml) → Markdown tester using MarkItDown")
-    parser.add_argument("input", help="Path to Email file (.msg or .eml)")
-    parser.add_argument("-o", "--output", help="Output markdown file (.md)")
+    parser.add_argument("input", help="Path to Email file (.msg or .eml); with --mailbox: directory or mbox file")
+    parser.add_argument("-o", "--output", help="Output markdown file (.md); with --mailbox: output directory")
     parser.add_argument("--preview", action="store_true", help="Print preview to console")
+    parser.add_argument("--mailbox", action="store_true",
+                        help="Batch mode: every message of a directory of .msg/.eml files or an mbox archive, "
+                             "attachments converted in parallel")
+    parser.add_argument("--workers", type=int, help="--mailbox: attachment conversion processes (default: CPU count)")
+    parser.add_argument("--cache-dir", help="--mailbox: keep converted attachments between runs (by sha256)")
 
     args = parser.parse_args()
 
     input_path = Path(args.input)
 
+    if args.mailbox:
+        if not input_path.exists():
+            print(f"[ERROR] File not found: {input_path}")
+            return
+        output_dir = Path(args.output) if args.output else input_path.with_name(f"{input_path.name}_md")
+        stats = MailboxIngest(output_dir, args.workers, args.cache_dir).run([input_path])
+        print(f"[OK] {stats['messages']} message(s) saved to: {output_dir}")
+        if stats["failed_messages"]:
+            print(f"[WARNING] {stats['failed_messages']} message(s) could not be read")
+        print(f"[INFO] Attachments: {stats['attachments']}, converted {stats['converted']}, "
+              f"cache hits {stats['cache_hits']}, skipped {stats['skipped']}, failed {stats['failed']}")
+        return
+
     # Если выходной путь не указан, создаем .md файл рядом с оригиналом
     if args.output:
         output_path = Path(args.output)
@@ -71,4 +352,6 @@ if __name__ == "__main__":
         python parsing_outlook_md.py test_outlook.msg
         python parsing_outlook_md.py test_outlook.msg -o result.md
         python parsing_outlook_md.py test_outlook.eml --preview
-'''
\ No newline at end of file
+        python parsing_outlook_md.py support_mailbox/ --mailbox -o support_md --workers 8 --cache-dir attachments_cache
+        python parsing_outlook_md.py Inbox.mbox --mailbox
+'''
@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from graph_tester_docx import load_chunks
+from vector_search import VectorIndex, embed_texts
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Writes a file via a temporary name + os.replace, so readers never see a partial file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_json_atomic(path: Path, obj):
+    _write_atomic(path, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+
+def _read_json(path: Path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _empty_manifest():
+    return {
+        "version": 0,
+        "next_seq": 1,
+        "next_segment": 1,
+        "segments": [],      # [{"name", "seq", "rows"}], oldest first
+        "tombstones": None,  # name of the tombstone file: {doc_id: seq}
+        "retired": [],       # [{"name", "time"}] segments replaced by a merge, deleted after a grace period
+    }
+
+
+class IndexWriter:
+    """
+    Append-only writer of a segmented (LSM-style) vector index.
+
+    Layout of index_dir:
+        manifest.json               - current snapshot, swapped atomically with os.replace
+        seg-000001.npy / .json      - immutable segment: normalized vectors + chunk metadata
+        tombstones-000007.json      - {doc_id: seq}: rows of doc_id in segments older than seq are deleted
+
+    Every segment gets a sequence number. Re-ingesting a document writes a new segment and
+    a tombstone with the new segment's seq, so older rows of that document disappear while
+    the new ones stay visible. Only one writer process per index is expected.
+    """
+
+    def __init__(self, index_dir: Path, retire_grace_sec=300):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.retire_grace_sec = retire_grace_sec
+        self._lock = threading.Lock()
+        self._merger = None
+        self._stop = threading.Event()
+
+        if not (self.index_dir / MANIFEST_NAME).exists():
+            _write_json_atomic(self.index_dir / MANIFEST_NAME, _empty_manifest())
+
+    def _manifest(self):
+        return _read_json(self.index_dir / MANIFEST_NAME)
+
+    def _tombstones(self, manifest):
+        if not manifest["tombstones"]:
+            return {}
+        return _read_json(self.index_dir / manifest["tombstones"])
+
+    def _commit(self, manifest, tombstones=None):
+        """Publishes a new manifest version (and a new tombstone file, if changed)."""
+        manifest["version"] += 1
+        if tombstones is not None:
+            name = f"tombstones-{manifest['version']:06d}.json"
+            _write_json_atomic(self.index_dir / name, tombstones)
+            old_name = manifest["tombstones"]
+            manifest["tombstones"] = name
+            if old_name:
+                manifest["retired"].append({"name": old_name, "time": time.time()})
+        _write_json_atomic(self.index_dir / MANIFEST_NAME, manifest)
+
+    def _write_segment(self, name, vectors, chunks):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.clip(norms, 1e-12, None)
+
+        tmp_path = self.index_dir / f"{name}.tmp.npy"
+        np.save(tmp_path, vectors)
+        os.replace(tmp_path, self.index_dir / f"{name}.npy")
+        _write_json_atomic(self.index_dir / f"{name}.json", chunks)
+
+    def add_document(self, doc_id, chunks, vectors):
+        """Adds (or replaces) all chunks of one document as a new immutable segment."""
+        chunks = [dict(chunk, doc_id=doc_id) for chunk in chunks]
+
+        with self._lock:
+            manifest = self._manifest()
+            seq = manifest["next_seq"]
+            name = f"seg-{manifest['next_segment']:06d}"
+            manifest["next_seq"] += 1
+            manifest["next_segment"] += 1
+
+            if chunks:
+                self._write_segment(name, vectors, chunks)
+                manifest["segments"].append({"name": name, "seq": seq, "rows": len(chunks)})
+
+            tombstones = self._tombstones(manifest)
+            tombstones[doc_id] = seq
+            self._commit(manifest, tombstones)
+
+    def delete_document(self, doc_id):
+        with self._lock:
+            manifest = self._manifest()
+            seq = manifest["next_seq"]
+            manifest["next_seq"] += 1
+
+            tombstones = self._tombstones(manifest)
+            tombstones[doc_id] = seq
+            self._commit(manifest, tombstones)
+
+    def merge(self, min_segments=4, max_rows=1_000_000):
+        """
+        Compacts the oldest small segments into one, dropping deleted rows.
+
+        The heavy part (reading and writing vectors) runs without the writer lock,
+        so ingestion continues during a merge. Returns True if a merge was committed.
+        """
+        manifest = self._manifest()
+        candidates = [s for s in manifest["segments"] if s["rows"] < max_rows]
+        if len(candidates) < min_segments:
+            self._drop_retired(manifest)
+            return False
+
+        tombstones = self._tombstones(manifest)
+        merged_vectors = []
+        merged_chunks = []
+
+        for segment in candidates:
+            vectors = np.load(self.index_dir / f"{segment['name']}.npy", mmap_mode="r")
+            chunks = _read_json(self.index_dir / f"{segment['name']}.json")
+            live = _live_mask(chunks, segment["seq"], tombstones)
+            merged_vectors.append(vectors[live])
+            merged_chunks.extend(c for c, keep in zip(chunks, live) if keep)
+
+        # The merged segment keeps the newest seq of its inputs: tombstones written
+        # after the merge started have a larger seq and still apply to it.
+        seq = max(s["seq"] for s in candidates)
+        merged_names = {s["name"] for s in candidates}
+        name = f"seg-merged-{time.time_ns()}"
+
+        if merged_chunks:
+            self._write_segment(name, np.concatenate(merged_vectors), merged_chunks)
+
+        with self._lock:
+            manifest = self._manifest()
+            segments = [s for s in manifest["segments"] if s["name"] not in merged_names]
+            if merged_chunks:
+                segments.append({"name": name, "seq": seq, "rows": len(merged_chunks)})
+            manifest["segments"] = sorted(segments, key=lambda s: s["seq"])
+
+            now = time.time()
+            manifest["retired"].extend({"name": n, "time": now} for n in sorted(merged_names))
+
+            # Tombstones older than every remaining segment can no longer delete anything
+            tombstones = self._tombstones(manifest)
+            oldest_seq = min((s["seq"] for s in manifest["segments"]), default=manifest["next_seq"])
+            tombstones = {doc_id: s for doc_id, s in tombstones.items() if s > oldest_seq}
+
+            self._commit(manifest, tombstones)
+
+        self._drop_retired(manifest)
+        print(f"[INFO] Merged {len(candidates)} segments into {name} ({len(merged_chunks)} rows)")
+        return True
+
+    def _drop_retired(self, manifest):
+        """Deletes files of retired segments once readers had time to move to a newer snapshot."""
+        now = time.time()
+        expired = [r for r in manifest["retired"] if now - r["time"] >= self.retire_grace_sec]
+        if not expired:
+            return
+
+        for retired in expired:
+            for suffix in ("", ".npy", ".json"):
+                path = self.index_dir / f"{retired['name']}{suffix}"
+                if path.is_file():
+                    path.unlink()
+
+        with self._lock:
+            manifest = self._manifest()
+            expired_names = {r["name"] for r in expired}
+            manifest["retired"] = [r for r in manifest["retired"] if r["name"] not in expired_names]
+            self._commit(manifest)
+
+    def start_merger(self, interval_sec=30, min_segments=4):
+        """Starts a background thread that periodically compacts segments."""
+        def loop():
+            while not self._stop.wait(interval_sec):
+                try:
+                    self.merge(min_segments=min_segments)
+                except Exception as e:
+                    print(f"[ERROR] Merge failed: {e}")
+
+        self._stop.clear()
+        self._merger = threading.Thread(target=loop, name="segment-merger", daemon=True)
+        self._merger.start()
+
+    def stop_merger(self):
+        self._stop.set()
+        if self._merger:
+            self._merger.join()
+            self._merger = None
+
+
+def _live_mask(chunks, segment_seq, tombstones):
+    """Rows of a segment that are not deleted by a newer tombstone."""
+    return np.array(
+        [tombstones.get(c["doc_id"], 0) <= segment_seq for c in chunks],
+        dtype=bool
+    )
+
+
+class IndexReader:
+    """
+    Query side of a segmented index.
+
+    refresh() picks up a new manifest version, loading only segments it has not seen yet
+    (memory-mapped), and swaps the snapshot reference in one assignment. Searches that are
+    already running keep using the snapshot they started with.
+    """
+
+    def __init__(self, index_dir: Path):
+        self.index_dir = Path(index_dir)
+        self._segments = {}  # name -> VectorIndex, shared between snapshots
+        self._manifest_stat = None
+        self._snapshot = (0, [])  # (version, [(segment_index, allowed_bitset)])
+        self._refresh_lock = threading.Lock()
+        self.refresh()
+
+    @property
+    def version(self):
+        return self._snapshot[0]
+
+    def refresh(self):
+        """Loads a new snapshot if the manifest changed. Returns True if it did."""
+        manifest_path = self.index_dir / MANIFEST_NAME
+        with self._refresh_lock:
+            stat = manifest_path.stat()
+            stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if stat_key == self._manifest_stat:
+                return False
+
+            manifest = _read_json(manifest_path)
+            self._manifest_stat = stat_key
+            if manifest["version"] == self._snapshot[0]:
+                return False
+
+            tombstones = _read_json(self.index_dir / manifest["tombstones"]) if manifest["tombstones"] else {}
+
+            segments = {}
+            snapshot = []
+            for segment in manifest["segments"]:
+                index = self._segments.get(segment["name"])
+                if index is None:
+                    vectors = np.load(self.index_dir / f"{segment['name']}.npy", mmap_mode="r")
+                    chunks = _read_json(self.index_dir / f"{segment['name']}.json")
+                    index = VectorIndex(vectors, chunks, normalized=True)
+                segments[segment["name"]] = index
+
+                live = _live_mask(index.chunks, segment["seq"], tombstones)
+                allowed = None if live.all() else np.packbits(live)
+                snapshot.append((index, allowed))
+
+            self._segments = segments
+            self._snapshot = (manifest["version"], snapshot)
+            return True
+
+    def search(self, query_vec, k=5, **filters):
+        """Returns up to k (score, chunk) pairs from the current snapshot, best first."""
+        _, snapshot = self._snapshot
+        results = []
+        for index, allowed in snapshot:
+            for row, score in index.search(query_vec, k=k, allowed=allowed, **filters):
+                results.append((score, index.chunks[row]))
+
+        results.sort(key=lambda r: r[0], reverse=True)
+        return results[:k]
+
+    def start_auto_refresh(self, interval_sec=5):
+        """Polls the manifest in a background thread."""
+        def loop():
+            while True:
+                time.sleep(interval_sec)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"[ERROR] Index refresh failed: {e}")
+
+        threading.Thread(target=loop, name="index-refresh", daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segmented append-only vector index")
+    parser.add_argument("index_dir", help="Index directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = sub.add_parser("add", help="Add or replace a document from a .chunks.txt file")
+    add_parser.add_argument("input", help="Path to .chunks.txt file")
+    add_parser.add_argument("--doc-id", help="Document id (default: file name)")
+    add_parser.add_argument("--model", default="BAAI/bge-small-en-v1.5", help="fastembed model name")
+
+    delete_parser = sub.add_parser("delete", help="Delete a document")
+    delete_parser.add_argument("doc_id")
+
+    merge_parser = sub.add_parser("merge", help="Compact small segments")
+    merge_parser.add_argument("--min-segments", type=int, default=2)
+
+    search_parser = sub.add_parser("search", help="Search the current snapshot")
+    search_parser.add_argument("-q", "--query", required=True)
+    search_parser.add_argument("-k", type=int, default=5)
+    search_parser.add_argument("--model", default="BAAI/bge-small-en-v1.5", help="fastembed model name")
+    search_parser.add_argument("--section", help="Section path prefix")
+
+    args = parser.parse_args()
+    index_dir = Path(args.index_dir)
+
+    if args.command == "add":
+        input_path = Path(args.input)
+        chunks = load_chunks(input_path)
+        doc_id = args.doc_id or input_path.name.replace(".chunks.txt", "")
+        for chunk in chunks:
+            chunk["source"] = doc_id
+            chunk["file_type"] = "docx"
+
+        vectors, _ = embed_texts(args.model, [c["text"] for c in chunks])
+        IndexWriter(index_dir).add_document(doc_id, chunks, vectors)
+        print(f"[OK] Added {len(chunks)} chunks of '{doc_id}'")
+
+    elif args.command == "delete":
+        IndexWriter(index_dir).delete_document(args.doc_id)
+        print(f"[OK] Deleted '{args.doc_id}'")
+
+    elif args.command == "merge":
+        if not IndexWriter(index_dir).merge(min_segments=args.min_segments):
+            print("[INFO] Nothing to merge")
+
+    elif args.command == "search":
+        reader = IndexReader(index_dir)
+        query_vec = embed_texts(args.model, [args.query])[0][0]
+
+        start_time = time.perf_counter()
+        results = reader.search(query_vec, k=args.k, section_prefix=args.section)
+        execution_time = time.perf_counter() - start_time
+
+        for score, chunk in results:
+            print(f"[{score:.4f}] {chunk['doc_id']} | {chunk['section_path']}")
+            print(f"    {chunk['text'][:200]}")
+        print(f"\n  Snapshot version: {reader.version}")
+        print(f"  Search time: {execution_time:.6f} sec.")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python segmented_index.py index_dir add file.chunks.txt
+    python segmented_index.py index_dir add file.chunks.txt --doc-id file    # re-ingest replaces old chunks
+    python segmented_index.py index_dir delete file
+    python segmented_index.py index_dir merge
+    python segmented_index.py index_dir search -q "How to transfer money by phone number?"
+"""
@@ -0,0 +1,251 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+# Thread pools of the numeric libraries in a worker. A spawned worker imports this module (and numpy)
+# before _init_worker runs, so the parent puts them into the environment the workers are started with.
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+class SharedTextTable:
+    """
+    Texts in one shared memory block: (n + 1) int64 byte offsets, then all UTF-8 bytes.
+    Workers read index ranges from it instead of receiving pickled text lists.
+    """
+
+    def __init__(self, shm, n):
+        self.shm = shm
+        self.n = n
+        self.offsets = np.ndarray((n + 1,), dtype=np.int64, buffer=shm.buf)
+        self.data = shm.buf[(n + 1) * 8:]
+
+    @classmethod
+    def create(cls, texts):
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offsets.nbytes + int(offsets[-1]), 1))
+        table = cls(shm, len(encoded))
+        table.offsets[:] = offsets
+        table.data[:int(offsets[-1])] = b"".join(encoded)
+        return table
+
+    @classmethod
+    def attach(cls, name, n):
+        return cls(shared_memory.SharedMemory(name=name), n)
+
+    def get(self, start, end):
+        offsets = self.offsets
+        return [bytes(self.data[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in range(start, end)]
+
+    def close(self):
+        del self.offsets
+        self.data.release()
+        self.shm.close()
+
+
+# ---- worker process state ----------------------------------------------------
+
+_backend = None
+_ready = None     # barrier of all workers, see ShardedEmbeddingExecutor.__init__
+_attached = {}  # (texts shm name, output shm name) -> (SharedTextTable, output shm, output array)
+
+
+def _init_worker(spec, core_sets, threads, batch_size, ready):
+    """Takes a core set, pins the process to it and loads the model once."""
+    global _backend, _ready
+
+    cores = core_sets.get()
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    threads = threads or len(cores) or 1
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+
+    from embedding_backends import load_backend
+
+    _backend = load_backend(spec, threads=threads, batch_size=batch_size)
+    _ready = ready
+
+
+def _probe_dim():
+    """Warm-up inference; waits until every worker has got here, so each worker answers one probe."""
+    dim = int(_backend.embed(["dimension probe"]).shape[1])
+    _ready.wait()
+    return dim
+
+
+def _embed_range(texts_name, n, output_name, dim, start, end):
+    """Embeds texts[start:end] of the shared table straight into rows start:end of the shared output."""
+    key = (texts_name, output_name)
+    if key not in _attached:
+        # A worker serves one embed() call at a time: drop attachments of previous calls
+        while _attached:
+            _, (table, shm, output) = _attached.popitem()
+            del output  # the array must not reference the buffer when it is closed
+            table.close()
+            shm.close()
+
+        output_shm = shared_memory.SharedMemory(name=output_name)
+        output = np.ndarray((n, dim), dtype=np.float32, buffer=output_shm.buf)
+        _attached[key] = (SharedTextTable.attach(texts_name, n), output_shm, output)
+
+    table, _, output = _attached[key]
+    start_time = time.perf_counter()
+    output[start:end] = _backend.embed(table.get(start, end))
+    return os.getpid(), end - start, time.perf_counter() - start_time
+
+
+# ---- parent ------------------------------------------------------------------
+
+def available_cores():
+    """Cores this process may run on (affinity mask where the OS has one: Linux; else all CPUs)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def core_sets(workers, threads_per_worker=None):
+    """
+    Splits the available cores into `workers` contiguous sets (one per worker) of threads_per_worker cores.
+    When workers * threads_per_worker exceeds the cores, the sets wrap around and share cores evenly.
+    """
+    cores = available_cores()
+    size = min(threads_per_worker or max(len(cores) // workers, 1), len(cores))
+    return [[cores[(i * size + j) % len(cores)] for j in range(size)] for i in range(workers)]
+
+
+class ShardedEmbeddingExecutor:
+    """
+    Process pool where every worker holds its own model instance, pinned to its own cores.
+
+    embed(texts) puts the texts into a SharedTextTable and creates a float32 (n, dim) shared output;
+    workers get (start, end) ranges only and write their embeddings directly into the output,
+    so neither texts nor vectors are pickled.
+    """
+
+    def __init__(self, spec, workers=None, threads_per_worker=None, batch_size=32, chunk_size=256):
+        cpu_count = len(available_cores())
+        threads_per_worker = threads_per_worker or (max(cpu_count // workers, 1) if workers else 4)
+        self.workers = workers or max(cpu_count // threads_per_worker, 1)
+        self.chunk_size = chunk_size
+        self.worker_stats = {}
+
+        context = multiprocessing.get_context("spawn")
+        sets = context.Queue()
+        for cores in core_sets(self.workers, threads_per_worker):
+            sets.put(cores)
+        ready = context.Barrier(self.workers)
+
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker,
+                                         initargs=(spec, sets, threads_per_worker, batch_size, ready))
+
+        # The pool starts processes lazily, one per submit without an idle worker: one probe per worker,
+        # held at the barrier until all have loaded the model, starts and warms up every worker now
+        # instead of inside the first embed() call. Workers inherit the thread settings from os.environ.
+        saved_env = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+        os.environ.update({name: str(threads_per_worker) for name in THREAD_ENV_VARS})
+        try:
+            probes = [self._pool.submit(_probe_dim) for _ in range(self.workers)]
+        finally:
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+        self.dim = probes[0].result()
+        for probe in probes[1:]:
+            probe.result()
+
+    def embed(self, texts):
+        """Embeddings of texts, float32 (len(texts), dim), in input order."""
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        table = SharedTextTable.create(texts)
+        output_shm = shared_memory.SharedMemory(create=True, size=len(texts) * self.dim * 4)
+        try:
+            futures = [
+                self._pool.submit(_embed_range, table.shm.name, len(texts), output_shm.name, self.dim,
+                                  start, min(start + self.chunk_size, len(texts)))
+                for start in range(0, len(texts), self.chunk_size)
+            ]
+            for future in futures:
+                pid, count, seconds = future.result()
+                stats = self.worker_stats.setdefault(pid, {"texts": 0, "busy_sec": 0.0})
+                stats["texts"] += count
+                stats["busy_sec"] += seconds
+
+            return np.ndarray((len(texts), self.dim), dtype=np.float32, buffer=output_shm.buf).copy()
+        finally:
+            table.close()
+            table.shm.unlink()
+            output_shm.close()
+            output_shm.unlink()
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process sharded embedding: scaling benchmark")
+    parser.add_argument("model", help="Backend spec (see embedding_backends.py)")
+    parser.add_argument("--chunks", default="file.chunks.txt", help="Chunks file with texts to embed")
+    parser.add_argument("--repeat", type=int, default=10, help="Repeat the chunk list N times")
+    parser.add_argument("--workers", default="1,2,4", help="Worker counts to measure")
+    parser.add_argument("--threads-per-worker", type=int, help="Cores (and intra-op threads) per worker")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--chunk-size", type=int, default=256, help="Texts per task")
+
+    args = parser.parse_args()
+
+    from graph_tester_docx import load_chunks
+
+    texts = [c["text"] for c in load_chunks(Path(args.chunks))] * args.repeat
+    if not texts:
+        print("[ERROR] No texts to embed")
+        return
+
+    print(f"[INFO] {len(texts)} texts, {len(available_cores())} cores\n")
+    print(f"{'workers':>7} {'threads':>7} {'texts/sec':>10} {'speedup':>8}")
+    base = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        with ShardedEmbeddingExecutor(args.model, workers, args.threads_per_worker,
+                                      args.batch_size, args.chunk_size) as executor:
+            executor.embed(texts[:workers * args.chunk_size])  # warm-up: at least one task per worker
+            start_time = time.perf_counter()
+            executor.embed(texts)
+            throughput = len(texts) / (time.perf_counter() - start_time)
+
+        base = base or throughput
+        threads = args.threads_per_worker or max(len(available_cores()) // workers, 1)
+        print(f"{workers:>7} {threads:>7} {throughput:>10.1f} {throughput / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python sharded_executor.py BAAI/bge-small-en-v1.5 --workers 1,2,4,8
+    python sharded_executor.py onnx:models/e5-small-v2.onnx@intfloat/e5-small-v2 --workers 8,16 --threads-per-worker 4
+    python sharded_executor.py fasttext:300 --workers 1,4,16 --threads-per-worker 1
+
+    from sharded_executor import ShardedEmbeddingExecutor
+    with ShardedEmbeddingExecutor("BAAI/bge-small-en-v1.5", workers=16, threads_per_worker=4) as executor:
+        vectors = executor.embed(texts)
+"""
@@ -0,0 +1,153 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Rows per block: a (QUERY_BLOCK x MATRIX_BLOCK) float32 score tile is ~16 MB and stays cache/L3 friendly
+QUERY_BLOCK = 256
+MATRIX_BLOCK = 16384
+
+_executor = None
+
+
+def _pool():
+    """Shared thread pool (numpy releases the GIL inside matmul, so blocks really run in parallel)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="similarity")
+    return _executor
+
+
+def normalize(matrix, dtype=np.float32):
+    """L2-normalizes rows (a single vector is treated as one row). Zero rows stay zero."""
+    matrix = np.asarray(matrix, dtype=dtype)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None).astype(dtype)
+
+
+def cosine_similarity_score(vec1, vec2):
+    """Cosine similarity of two vectors (no 2-D wrapping or input validation as in sklearn)."""
+    vec1 = np.asarray(vec1, dtype=np.float32).ravel()
+    vec2 = np.asarray(vec2, dtype=np.float32).ravel()
+    denominator = float(np.linalg.norm(vec1) * np.linalg.norm(vec2))
+    if denominator == 0.0:
+        return 0.0
+    return float(np.dot(vec1, vec2) / denominator)
+
+
+def _blocks(size, block):
+    return [(start, min(start + block, size)) for start in range(0, size, block)]
+
+
+def rowwise(a, b, normalized=False, block_rows=MATRIX_BLOCK):
+    """Cosine similarity of a[i] and b[i] for every row i."""
+    if len(a) != len(b):
+        raise ValueError(f"Row count mismatch: {len(a)} vs {len(b)}")
+
+    out = np.empty(len(a), dtype=np.float32)
+
+    def run(start, stop):
+        block_a = np.asarray(a[start:stop], dtype=np.float32)
+        block_b = np.asarray(b[start:stop], dtype=np.float32)
+        if not normalized:
+            block_a, block_b = normalize(block_a), normalize(block_b)
+        out[start:stop] = np.einsum("ij,ij->i", block_a, block_b)
+
+    list(_pool().map(lambda span: run(*span), _blocks(len(a), block_rows)))
+    return out
+
+
+def pairwise(a, b, normalized=False, block_rows=QUERY_BLOCK):
+    """Full (len(a), len(b)) cosine similarity matrix. Use query_topk() when only the best matches are needed."""
+    if not normalized:
+        a, b = normalize(a), normalize(b)
+    a = np.asarray(a)
+    b = np.asarray(b, dtype=np.float32)
+    out = np.empty((len(a), len(b)), dtype=np.float32)
+
+    def run(start, stop):
+        out[start:stop] = np.asarray(a[start:stop], dtype=np.float32) @ b.T
+
+    list(_pool().map(lambda span: run(*span), _blocks(len(a), block_rows)))
+    return out
+
+
+def _merge_topk(best_scores, best_ids, scores, ids, k):
+    """Keeps the k best of (current best) + (new block candidates) for every query row."""
+    scores = np.concatenate([best_scores, scores], axis=1)
+    ids = np.concatenate([best_ids, ids], axis=1)
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        ids = np.take_along_axis(ids, part, axis=1)
+    return scores, ids
+
+
+def _inverse_norms(matrix, block_rows=MATRIX_BLOCK):
+    """1 / L2 norm of every matrix row, computed once in blocks (float16/mmap inputs are never copied whole)."""
+    out = np.empty(len(matrix), dtype=np.float32)
+
+    def run(start, stop):
+        norms = np.linalg.norm(np.asarray(matrix[start:stop], dtype=np.float32), axis=1)
+        out[start:stop] = 1.0 / np.clip(norms, 1e-12, None)
+
+    list(_pool().map(lambda span: run(*span), _blocks(len(matrix), block_rows)))
+    return out
+
+
+def query_topk(queries, matrix, k=10, normalized=False,
+               query_block=QUERY_BLOCK, matrix_block=MATRIX_BLOCK):
+    """
+    Top-k cosine matches of every query row against matrix rows.
+
+    The matrix is scanned in blocks; each (query block x matrix block) score tile is reduced
+    to its top-k right away, so the full (queries x matrix) result is never materialized.
+    float16 inputs are up-cast to float32 one block at a time. Matrix row norms are computed once
+    and applied to the tiles; pass normalized=True when both inputs are already unit length.
+
+    Many queries are split into query blocks that run in parallel; a single query block
+    (the usual retrieval case) is parallelized over matrix blocks instead.
+
+    Returns (scores, indices), both of shape (len(queries), k), best first.
+    """
+    queries = np.atleast_2d(queries)
+    if not normalized:
+        queries = normalize(queries)
+    k = min(k, len(matrix))
+
+    scores_out = np.empty((len(queries), k), dtype=np.float32)
+    ids_out = np.empty((len(queries), k), dtype=np.int64)
+    if k == 0:
+        return scores_out, ids_out
+
+    inverse_norms = None if normalized else _inverse_norms(matrix, matrix_block)
+    matrix_blocks = _blocks(len(matrix), matrix_block)
+
+    def block_topk(query, m_start, m_stop):
+        tile = query @ np.asarray(matrix[m_start:m_stop], dtype=np.float32).T
+        if inverse_norms is not None:
+            tile *= inverse_norms[m_start:m_stop]
+        block_k = min(k, tile.shape[1])
+        part = np.argpartition(-tile, block_k - 1, axis=1)[:, :block_k]
+        return np.take_along_axis(tile, part, axis=1), part + m_start
+
+    def store(q_start, q_stop, candidates):
+        best_scores = np.empty((q_stop - q_start, 0), dtype=np.float32)
+        best_ids = np.empty((q_stop - q_start, 0), dtype=np.int64)
+        for scores, ids in candidates:
+            best_scores, best_ids = _merge_topk(best_scores, best_ids, scores, ids, k)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        scores_out[q_start:q_stop] = np.take_along_axis(best_scores, order, axis=1)
+        ids_out[q_start:q_stop] = np.take_along_axis(best_ids, order, axis=1)
+
+    if len(queries) <= query_block:
+        query = np.asarray(queries, dtype=np.float32)
+        store(0, len(queries), _pool().map(lambda span: block_topk(query, *span), matrix_blocks))
+    else:
+        def run(q_start, q_stop):
+            query = np.asarray(queries[q_start:q_stop], dtype=np.float32)
+            store(q_start, q_stop, (block_topk(query, *span) for span in matrix_blocks))
+
+        list(_pool().map(lambda span: run(*span), _blocks(len(queries), query_block)))
+    return scores_out, ids_out
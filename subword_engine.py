@@ -0,0 +1,163 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+FNV_OFFSET = np.uint32(2166136261)
+FNV_PRIME = np.uint32(16777619)
+
+
+def fnv1a_hashes(byte_strings):
+    """
+    FNV-1a hashes of many byte strings at once, exactly as fastText computes them
+    (every byte is sign-extended from int8 before the XOR).
+
+    The strings are packed into one padded (n, max_len) byte matrix and hashed column by column,
+    so the Python loop runs max_len times instead of once per byte of every string.
+    """
+    lengths = np.fromiter((len(b) for b in byte_strings), dtype=np.int64, count=len(byte_strings))
+    hashes = np.full(len(byte_strings), FNV_OFFSET, dtype=np.uint32)
+    if not len(byte_strings):
+        return hashes
+
+    data = np.frombuffer(b"".join(byte_strings), dtype=np.uint8)
+    starts = np.cumsum(lengths) - lengths
+    max_len = int(lengths.max())
+
+    for j in range(max_len):
+        active = lengths > j
+        idx = np.flatnonzero(active)
+        byte = data[starts[idx] + j].astype(np.int8).astype(np.int32).astype(np.uint32)
+        hashes[idx] = (hashes[idx] ^ byte) * FNV_PRIME
+
+    return hashes
+
+
+def char_ngrams(word, minn, maxn):
+    """Character n-grams of '<word>' (same rules as Dictionary::computeSubwords in fastText)"""
+    extended = f"<{word}>"
+    size = len(extended)
+    return [
+        extended[i:i + n]
+        for i in range(size)
+        for n in range(minn, min(maxn, size - i) + 1)
+        if not (n == 1 and (i == 0 or i + n == size))
+    ]
+
+
+class SubwordEngine:
+    """
+    Composes FastText vectors from character n-grams for a whole batch of tokens.
+
+    For a batch: n-grams of all uncached tokens are hashed in one vectorized pass,
+    their bucket rows are gathered with a single fancy-indexing operation and summed per token
+    with np.add.reduceat. Composed vectors are kept in an LRU cache, so typos and transliterations
+    that repeat across requests are hashed only once.
+    """
+
+    def __init__(self, ngram_vectors, minn, maxn, bucket, word_vectors=None, cache_size=100_000):
+        self.ngram_vectors = ngram_vectors
+        self.word_vectors = word_vectors  # optional raw word rows, added to the n-grams of in-vocab words
+        self.minn = minn
+        self.maxn = maxn
+        self.bucket = bucket
+        self.dim = ngram_vectors.shape[1]
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ngram_buckets(self, tokens):
+        """Returns (buckets, counts): bucket ids of all n-grams of all tokens, and n-gram count per token."""
+        ngrams_per_token = [char_ngrams(t, self.minn, self.maxn) for t in tokens]
+        counts = np.fromiter((len(n) for n in ngrams_per_token), dtype=np.int64, count=len(tokens))
+        encoded = [n.encode("utf-8") for ngrams in ngrams_per_token for n in ngrams]
+        buckets = fnv1a_hashes(encoded).astype(np.int64) % self.bucket
+        return buckets, counts
+
+    def compose(self, tokens, word_ids=None):
+        """
+        Vectors of the tokens, float32 array (len(tokens), dim).
+
+        word_ids (optional, -1 for OOV) adds the token's own row from word_vectors,
+        as fastText does for in-vocabulary words.
+        """
+        result = np.zeros((len(tokens), self.dim), dtype=np.float32)
+        missing = []
+
+        with self._lock:
+            for i, token in enumerate(tokens):
+                cached = self._cache.get(token)
+                if cached is not None:
+                    self._cache.move_to_end(token)
+                    result[i] = cached
+                else:
+                    missing.append(i)
+
+        if not missing:
+            return result
+
+        # Duplicated tokens inside one batch are composed once
+        unique_tokens = list(dict.fromkeys(tokens[i] for i in missing))
+        buckets, counts = self.ngram_buckets(unique_tokens)
+
+        composed = np.zeros((len(unique_tokens), self.dim), dtype=np.float32)
+        has_ngrams = counts > 0
+        if has_ngrams.any():
+            gathered = self.ngram_vectors[buckets]
+            starts = (np.cumsum(counts) - counts)[has_ngrams]
+            composed[has_ngrams] = np.add.reduceat(gathered, starts, axis=0, dtype=np.float32)
+
+        totals = counts.astype(np.float32)
+        if word_ids is not None and self.word_vectors is not None:
+            ids_by_token = {tokens[i]: word_ids[i] for i in missing}
+            unique_ids = np.array([ids_by_token[t] for t in unique_tokens], dtype=np.int64)
+            in_vocab = unique_ids >= 0
+            if in_vocab.any():
+                composed[in_vocab] += self.word_vectors[unique_ids[in_vocab]]
+                totals[in_vocab] += 1
+
+        nonzero = totals > 0
+        composed[nonzero] /= totals[nonzero, None]
+
+        positions = {token: row for row, token in enumerate(unique_tokens)}
+        for i in missing:
+            result[i] = composed[positions[tokens[i]]]
+
+        with self._lock:
+            for token, vector in zip(unique_tokens, composed):
+                self._cache[token] = vector
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return result
+
+    def cache_info(self):
+        with self._lock:
+            return {"size": len(self._cache), "max_size": self.cache_size}
+
+
+class GensimSubwordVectors:
+    """
+    Batched lookup over gensim FastTextKeyedVectors: in-vocabulary tokens come straight
+    from model.vectors, OOV tokens are composed by SubwordEngine (same result as model[token]).
+    """
+
+    def __init__(self, model, cache_size=100_000):
+        self.model = model
+        self.engine = SubwordEngine(model.vectors_ngrams, model.min_n, model.max_n, model.bucket,
+                                    cache_size=cache_size)
+
+    def word_vectors(self, tokens):
+        key_to_index = self.model.key_to_index
+        ids = np.array([key_to_index.get(t, -1) for t in tokens], dtype=np.int64)
+        result = np.zeros((len(tokens), self.model.vector_size), dtype=np.float32)
+
+        in_vocab = ids >= 0
+        if in_vocab.any():
+            result[in_vocab] = self.model.vectors[ids[in_vocab]]
+
+        oov = np.flatnonzero(~in_vocab)
+        if len(oov):
+            result[oov] = self.engine.compose([tokens[i] for i in oov])
+
+        return result
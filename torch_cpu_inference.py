@@ -0,0 +1,169 @@
+import argparse
+import time
+
+import numpy as np
+
+import similarity
+
+
+def configure_threads(threads=None, interop_threads=None):
+    """torch intra-op / inter-op thread pools. Inter-op can only be set before the first parallel op."""
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            print("[WARNING] Inter-op threads are already initialized, keeping "
+                  f"{torch.get_num_interop_threads()}")
+
+
+def optimize_model(model, quantize=False):
+    """eval() + optional dynamic INT8 quantization of all nn.Linear layers (weights int8, activations on the fly)."""
+    import torch
+
+    model.eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+class TorchEmbeddingRunner:
+    """
+    CPU inference of a transformers AutoModel with masked mean pooling.
+
+    - torch.inference_mode (no autograd bookkeeping at all, cheaper than no_grad);
+    - texts are tokenized once, sorted by length and padded per batch (dynamic padding);
+    - pooling is one bmm of the (batch, 1, seq) mask with the hidden states:
+      no (batch, seq, hidden) expanded mask copy;
+    - optional bf16 autocast (fast on CPUs with AVX512-BF16/AMX, otherwise usually slower).
+
+    Same tokenize()/run_encoded() interface as OnnxEmbeddingRunner, so it plugs into EmbeddingPipeline.
+    """
+
+    def __init__(self, model, tokenizer, max_length=512, bf16=False, pad_to_multiple_of=8):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.bf16 = bf16
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def tokenize(self, texts):
+        return self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                              pad_to_multiple_of=self.pad_to_multiple_of, return_tensors="pt")
+
+    def run_encoded(self, encoded):
+        """Inference + masked mean pooling for one tokenized batch. Returns float32 numpy (batch, hidden_size)."""
+        import torch
+
+        with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16):
+            hidden = self.model(**encoded).last_hidden_state
+
+        with torch.inference_mode():
+            hidden = hidden.float()
+            mask = encoded["attention_mask"].to(hidden.dtype)
+            summed = torch.bmm(mask.unsqueeze(1), hidden).squeeze(1)
+            pooled = summed / mask.sum(dim=1, keepdim=True).clamp(min=1e-9)
+        return pooled.numpy()
+
+    def embed(self, texts, batch_size=32):
+        """Embeddings of texts (in input order), float32 (len(texts), hidden_size)."""
+        if not texts:
+            return np.empty((0, self.model.config.hidden_size), dtype=np.float32)
+
+        ids = self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+        order = np.argsort([len(i) for i in ids], kind="stable")
+
+        result = None
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            encoded = self.tokenizer.pad({"input_ids": [ids[i] for i in batch]}, return_tensors="pt",
+                                         pad_to_multiple_of=self.pad_to_multiple_of)
+            pooled = self.run_encoded(encoded)
+            if result is None:
+                result = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            result[batch] = pooled
+        return result
+
+
+def load_torch_runner(model_name, threads=None, interop_threads=None, quantize=False, bf16=False, max_length=512):
+    from transformers import AutoTokenizer, AutoModel
+
+    configure_threads(threads, interop_threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = optimize_model(AutoModel.from_pretrained(model_name), quantize)
+    return TorchEmbeddingRunner(model, tokenizer, max_length, bf16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Before/after benchmark of CPU torch inference (embedding_sberbank)")
+    parser.add_argument("--model", default="ai-forever/sbert_large_nlu_ru")
+    parser.add_argument("--chunks", default="file.chunks.txt", help="Chunks file with texts to embed")
+    parser.add_argument("--limit", type=int, default=256, help="Max texts")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, help="torch.set_num_threads")
+    parser.add_argument("--interop-threads", type=int, help="torch.set_num_interop_threads")
+    parser.add_argument("--bf16", action="store_true", help="Also measure bf16 autocast")
+
+    args = parser.parse_args()
+
+    from pathlib import Path
+    from transformers import AutoTokenizer, AutoModel
+    from embedding_sberbank import get_embeddings as baseline_embeddings
+    from graph_tester_docx import load_chunks
+
+    texts = [c["text"] for c in load_chunks(Path(args.chunks))][:args.limit]
+    if not texts:
+        print("[ERROR] No texts to embed")
+        return
+
+    configure_threads(args.threads, args.interop_threads)
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModel.from_pretrained(args.model).eval()
+
+    variants = [("baseline (no_grad, expanded mask)", None)]
+    variants.append(("fp32 (inference_mode, sorted, bmm)", TorchEmbeddingRunner(model, tokenizer)))
+    variants.append(("int8 dynamic Linear", TorchEmbeddingRunner(optimize_model(
+        AutoModel.from_pretrained(args.model), quantize=True), tokenizer)))
+    if args.bf16:
+        variants.append(("bf16 autocast", TorchEmbeddingRunner(model, tokenizer, bf16=True)))
+
+    reference = None
+    print(f"[INFO] {len(texts)} texts, batch {args.batch_size}\n")
+    print(f"{'variant':<36} {'latency ms':>11} {'texts/sec':>10} {'cosine':>7}")
+    for name, runner in variants:
+        def embed(batch_texts, batch_size=args.batch_size):
+            if runner is None:
+                return baseline_embeddings(model, tokenizer, batch_texts, batch_size, optimized=False)
+            return runner.embed(batch_texts, batch_size)
+
+        embed(texts[:2])  # warm-up
+
+        single_texts = texts[:min(len(texts), 20)]
+        start_time = time.perf_counter()
+        for text in single_texts:
+            embed([text], 1)
+        latency_ms = (time.perf_counter() - start_time) / len(single_texts) * 1000
+
+        start_time = time.perf_counter()
+        embeddings = embed(texts)
+        throughput = len(texts) / (time.perf_counter() - start_time)
+
+        if reference is None:
+            reference = embeddings
+        cosine = float(similarity.rowwise(reference, embeddings).mean())
+        print(f"{name:<36} {latency_ms:>11.2f} {throughput:>10.1f} {cosine:>7.4f}")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python torch_cpu_inference.py
+    python torch_cpu_inference.py --threads 16 --interop-threads 1 --batch-size 64
+    python torch_cpu_inference.py --model ai-forever/sbert_large_nlu_ru --bf16 --limit 512
+"""
@@ -0,0 +1,221 @@
+import os
+# Set cache folder for fastembed before import
+os.environ.setdefault("FASTEMBED_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fastembed_cache'))
+
+import argparse
+import bisect
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from graph_tester_docx import load_chunks
+
+
+def _bitset(ids, size):
+    """Packs a list of row ids into a bitset (1 bit per chunk)."""
+    mask = np.zeros(size, dtype=bool)
+    mask[np.asarray(ids, dtype=np.int64)] = True
+    return np.packbits(mask)
+
+
+class VectorIndex:
+    """
+    Brute-force vector index over chunk embeddings with metadata filters.
+
+    Every filterable attribute is precomputed once at build time:
+        - source / file_type / section_path → one packed bitset per value
+        - section_index                     → row ids sorted by value (range lookups via searchsorted)
+
+    A filtered query combines the bitsets with vectorized AND/OR and scores
+    only the selected rows, so a scoped query touches fewer vectors than
+    an unscoped one.
+    """
+
+    def __init__(self, vectors, chunks, normalized=False):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) != len(chunks):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(chunks)} chunks")
+
+        # Pre-normalize, so that the dot product is the cosine similarity.
+        # Already normalized vectors (e.g. memory-mapped segments) are used as is, without a copy.
+        if not normalized:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.clip(norms, 1e-12, None)
+        self.vectors = vectors
+        self.chunks = chunks
+        self.size = len(chunks)
+
+        self._bitsets = {
+            "source": self._build_bitsets("source"),
+            "file_type": self._build_bitsets("file_type"),
+            "section_path": self._build_bitsets("section_path"),
+        }
+
+        # Sorted section paths for prefix lookups (bisect over the sorted list)
+        self._sorted_paths = sorted(self._bitsets["section_path"])
+
+        # Row ids ordered by section_index for range lookups
+        section_index = np.array([c.get("section_index", 0) for c in chunks], dtype=np.int64)
+        self._section_order = np.argsort(section_index, kind="stable")
+        self._section_sorted = section_index[self._section_order]
+
+    def _build_bitsets(self, attribute):
+        ids_by_value = {}
+        for row, chunk in enumerate(self.chunks):
+            ids_by_value.setdefault(chunk.get(attribute, ""), []).append(row)
+        return {value: _bitset(ids, self.size) for value, ids in ids_by_value.items()}
+
+    def _empty(self):
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _values_bitset(self, attribute, values):
+        """OR of the bitsets of all listed attribute values."""
+        if isinstance(values, str):
+            values = [values]
+        bitsets = [self._bitsets[attribute][v] for v in values if v in self._bitsets[attribute]]
+        if not bitsets:
+            return self._empty()
+        return np.bitwise_or.reduce(bitsets)
+
+    def _prefix_bitset(self, prefix):
+        lo = bisect.bisect_left(self._sorted_paths, prefix)
+        hi = bisect.bisect_left(self._sorted_paths, prefix + "\uffff")
+        return self._values_bitset("section_path", self._sorted_paths[lo:hi])
+
+    def _range_bitset(self, section_range):
+        start, stop = section_range  # inclusive start, exclusive stop
+        lo = np.searchsorted(self._section_sorted, start, side="left")
+        hi = np.searchsorted(self._section_sorted, stop, side="left")
+        return _bitset(self._section_order[lo:hi], self.size)
+
+    def select(self, section_prefix=None, section_range=None, source=None, file_type=None, allowed=None):
+        """
+        Returns sorted row ids matching all given predicates,
+        or None if no predicate is set (the whole index).
+
+        allowed is an optional packed bitset of rows the caller permits (e.g. rows not deleted).
+        """
+        bitsets = [] if allowed is None else [allowed]
+        if section_prefix is not None:
+            bitsets.append(self._prefix_bitset(section_prefix))
+        if section_range is not None:
+            bitsets.append(self._range_bitset(section_range))
+        if source is not None:
+            bitsets.append(self._values_bitset("source", source))
+        if file_type is not None:
+            bitsets.append(self._values_bitset("file_type", file_type))
+
+        if not bitsets:
+            return None
+
+        combined = np.bitwise_and.reduce(bitsets)
+        return np.flatnonzero(np.unpackbits(combined, count=self.size))
+
+    def search(self, query_vec, k=5, **filters):
+        """
+        Returns up to k (row, score) pairs, best first.
+        Filters are applied before scoring, so they never reduce the number of results below k
+        unless fewer than k chunks match.
+        """
+        query = np.asarray(query_vec, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        rows = self.select(**filters)
+        if rows is None:
+            scores = self.vectors @ query
+        else:
+            scores = self.vectors[rows] @ query
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        if rows is not None:
+            return [(int(rows[i]), float(scores[i])) for i in top]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def save(self, output_path: Path):
+        np.save(output_path.with_suffix(".npy"), self.vectors)
+        output_path.with_suffix(".json").write_text(
+            json.dumps(self.chunks, ensure_ascii=False), encoding="utf-8"
+        )
+
+    @classmethod
+    def load(cls, input_path: Path):
+        vectors = np.load(input_path.with_suffix(".npy"))
+        chunks = json.loads(input_path.with_suffix(".json").read_text(encoding="utf-8"))
+        return cls(vectors, chunks)
+
+
+def embed_texts(model_name, texts):
+    from fastembed.embedding import TextEmbedding
+
+    embedder = TextEmbedding(model_name=model_name, normalize=True, cache_dir=os.environ["FASTEMBED_CACHE_DIR"])
+    return np.array(list(embedder.embed(texts))), embedder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtered vector search over a .chunks.txt file")
+    parser.add_argument("input", help="Path to .chunks.txt file (see graph_tester_docx.py)")
+    parser.add_argument("-q", "--query", required=True, help="Search query")
+    parser.add_argument("-k", type=int, default=5, help="Number of results")
+    parser.add_argument("--model", default="BAAI/bge-small-en-v1.5", help="fastembed model name")
+    parser.add_argument("--section", help="Section path prefix, e.g. 'Transfers within BNB-Bank'")
+    parser.add_argument("--sections", nargs=2, type=int, metavar=("FROM", "TO"),
+                        help="section_index range [FROM, TO)")
+    parser.add_argument("--source", help="Source document name")
+    parser.add_argument("--file-type", help="Source file type, e.g. docx")
+
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print("[ERROR] File not found")
+        return
+
+    chunks = load_chunks(input_path)
+    source_name = input_path.name.replace(".chunks.txt", "")
+    for chunk in chunks:
+        chunk["source"] = source_name
+        chunk["file_type"] = "docx"  # graph_tester_docx.py only splits .docx files
+
+    print(f"[INFO] Embedding {len(chunks)} chunks with {args.model}...")
+    vectors, embedder = embed_texts(args.model, [c["text"] for c in chunks])
+    index = VectorIndex(vectors, chunks)
+
+    query_vec = np.array(list(embedder.embed([args.query]))[0])
+
+    start_time = time.perf_counter()
+    results = index.search(
+        query_vec,
+        k=args.k,
+        section_prefix=args.section,
+        section_range=tuple(args.sections) if args.sections else None,
+        source=args.source,
+        file_type=args.file_type,
+    )
+    execution_time = time.perf_counter() - start_time
+
+    for row, score in results:
+        chunk = chunks[row]
+        print(f"[{score:.4f}] #{row} {chunk['section_path']}")
+        print(f"    {chunk['text'][:200]}")
+
+    print(f"\n  Search time: {execution_time:.6f} sec.")
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+USAGE:
+    python vector_search.py file.chunks.txt -q "How to transfer money by phone number?"
+    python vector_search.py file.chunks.txt -q "transfer by card" --section "Transfers within BNB-Bank"
+    python vector_search.py file.chunks.txt -q "transfer by card" --sections 0 5 --file-type docx
+"""